@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Camera configuration service
+
+Cameras take their configuration from the master instead of the command
+line. A camera's id is its MQTT client id, "<host name>-<instance>".
+
+Settings are published, as JSON, to retained topics when the service starts
+and again whenever they change: the settings for every camera to
+CONFIG_TOPIC.format(camera="*") and each camera's own settings to
+CONFIG_TOPIC.format(camera=id). A camera subscribes to both, so it gets them
+at boot, whether or not the master has seen it before, and picks up every
+change; a new setting for every camera is a single set.
+
+Requests and replies are JSON datagrams on CONFIG_PORT:
+
+    {"op": "get", "camera": "cam1-1"}
+        -> {"op": "config", "camera": "cam1-1", "generation": 7, "config": {...}}
+    {"op": "set", "camera": "cam1-1", "config": {"left": 5}}
+    {"op": "set", "camera": "*", "config": {"bitrate": 2000}}
+        -> {"op": "ok", "generation": 8}
+
+A "set" is only accepted from the master itself, so nothing else on the
+venue network can change what the cameras run.
+
+A camera's configuration is its command line, overlaid with the settings
+for every camera ("*"), overlaid with its own settings. Only settings that
+have been set are published, so anything else is left to the command line.
+A camera that asks for its configuration gets a blank entry, listing it in
+cameras().
+
+Settings are kept in a shelve (dbm) file keyed by camera id, with the
+configurations served from an in-memory cache.
+
+Change settings, on the master, from the command line with:
+
+    python3 CameraConfigService.py set [--camera ID] key=value ...
+    python3 CameraConfigService.py get ID
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import shelve
+import socket
+
+import discovery
+
+CONFIG_PORT = 54547
+CONFIG_TOPIC = "swimcam/camera/{camera}/config"
+DEFAULT_STORE = os.path.join(os.path.expanduser("~"), ".config", "swimcam", "cameras")
+ALL_CAMERAS = "*"
+_GENERATION = "#generation"
+_MAX_REQUEST = 8192
+
+
+class CameraConfigStore:
+    """
+    Camera settings on disk, with effective configurations cached in memory
+
+    Parameters:
+        filename: The shelve file to keep the settings in
+    """
+    def __init__(self, filename):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self._shelf = shelve.open(filename)
+        self._cache = {}
+        self.generation = self._shelf.get(_GENERATION, 0)
+
+    def cameras(self):
+        """Ids of all cameras with an entry"""
+        return sorted(k for k in self._shelf.keys() if k not in (_GENERATION, ALL_CAMERAS))
+
+    def settings(self, camera):
+        """The settings stored for camera (or ALL_CAMERAS)"""
+        return dict(self._shelf.get(camera, {}))
+
+    def get(self, camera):
+        """The settings that apply to camera, creating its entry if needed"""
+        config = self._cache.get(camera)
+        if config is None:
+            if camera not in self._shelf:
+                self._shelf[camera] = {}
+                self._shelf.sync()
+            config = dict(self._shelf.get(ALL_CAMERAS, {}))
+            config.update(self._shelf[camera])
+            self._cache[camera] = config
+        return config
+
+    def set(self, camera, settings):
+        """
+        Update the settings of camera (or ALL_CAMERAS)
+
+        A setting of None removes it. Returns the cameras whose configuration
+        changed.
+        """
+        before = {c: self.get(c) for c in self.cameras()}
+        stored = self.settings(camera)
+        for key, value in settings.items():
+            if value is None:
+                stored.pop(key, None)
+            else:
+                stored[key] = value
+        self.generation += 1
+        self._shelf[camera] = stored
+        self._shelf[_GENERATION] = self.generation
+        self._shelf.sync()
+        self._cache.clear()
+        # A camera set for the first time is new, so changed too
+        return sorted(c for c in self.cameras() if c not in before or self.get(c) != before[c])
+
+    def close(self):
+        self._shelf.close()
+
+
+class _ConfigProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            request = json.loads(data)
+            reply = self.service.handle(request, addr)
+        except (ValueError, TypeError, KeyError, AttributeError, PermissionError) as err:
+            reply = {"op": "error", "error": str(err)}
+        self.transport.sendto(json.dumps(reply).encode("utf-8"), addr)
+
+    def error_received(self, exc):
+        pass  # the camera will ask again
+
+
+class CameraConfigService:
+    """
+    Serves camera configurations on the master's event loop
+
+    Parameters:
+        filename: The store's shelve file
+        listen_address: Address to listen on
+        port: Port to listen on
+        publish: Called with (topic, payload, retain) to publish a configuration
+    """
+    def __init__(self, filename, listen_address="0.0.0.0", port=CONFIG_PORT, publish=None):
+        self.filename = filename
+        self.listen_address = listen_address
+        self.port = port
+        self.publish = publish
+        self.store = None
+        self._transport = None
+
+    def _config_message(self, camera, config):
+        return {"op": "config", "camera": camera, "generation": self.store.generation,
+                "config": config}
+
+    def handle(self, request, addr):
+        """Reply to a request from addr"""
+        op = request["op"]
+        camera = str(request["camera"])
+        if op == "get":
+            if camera == ALL_CAMERAS:
+                raise ValueError("get needs a camera id")
+            return self._config_message(camera, self.store.get(camera))
+        if op == "set":
+            if not ipaddress.ip_address(addr[0]).is_loopback:
+                raise PermissionError("settings can only be changed on the master")
+            settings = request["config"]
+            if not isinstance(settings, dict):
+                raise TypeError("config must be an object")
+            self.store.set(camera, settings)
+            self.push(camera)
+            return {"op": "ok", "generation": self.store.generation}
+        raise ValueError(f"unknown op {op}")
+
+    def push(self, camera):
+        """Publish the settings of camera (or ALL_CAMERAS)"""
+        if self.publish is not None:
+            message = self._config_message(camera, self.store.settings(camera))
+            self.publish(CONFIG_TOPIC.format(camera=camera), json.dumps(message), retain=True)
+
+    async def start(self):
+        self.store = CameraConfigStore(self.filename)
+        for camera in [ALL_CAMERAS] + self.store.cameras():
+            self.push(camera)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ConfigProtocol(self), local_addr=(self.listen_address, self.port))
+
+    async def stop(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+def mqtt_publish(port, username="swimcam", password="swimming"):
+    """
+    A publish function for the master's broker
+
+    The connection is made, and kept up, in the background; paho holds the
+    (QoS 1) configurations until it is.
+    """
+    import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+    client = mqtt.Client("swimcam-camera-config")
+    client.username_pw_set(username=username, password=password)
+    client.connect_async("localhost", port)
+    client.loop_start()
+    return lambda topic, payload, retain=False: client.publish(topic, payload, qos=1,
+                                                               retain=retain)
+
+
+def request(host, message, timeout=2.0, port=CONFIG_PORT):
+    """Send a request to the configuration service and return the reply"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(json.dumps(message).encode("utf-8"), (host, port))
+        data, _ = sock.recvfrom(_MAX_REQUEST)
+    return json.loads(data)
+
+
+def _parse_setting(setting):
+    key, sep, value = setting.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected key=value, got {setting}")
+    if value == "":
+        return key, None
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Camera configuration")
+    parser.add_argument("--host", default="",
+                        help="Master (default: discover it, this host for set)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    get_cmd = commands.add_parser("get", help="Show a camera's configuration")
+    get_cmd.add_argument("camera")
+    set_cmd = commands.add_parser("set", help="Change settings (key= removes a setting)")
+    set_cmd.add_argument("--camera", default=ALL_CAMERAS,
+                         help="Camera to change (default: every camera)")
+    set_cmd.add_argument("settings", nargs="+", type=_parse_setting, metavar="key=value")
+    args = parser.parse_args()
+
+    host = args.host
+    if host == "" and args.command == "set":
+        host = "localhost"
+    elif host == "":
+        master = discovery.wait_for_core(5)
+        if master is None:
+            parser.error("no master found, use --host")
+        host = master.host
+    if args.command == "get":
+        reply = request(host, {"op": "get", "camera": args.camera})
+    else:
+        reply = request(host, {"op": "set", "camera": args.camera,
+                               "config": dict(args.settings)})
+    print(json.dumps(reply, indent=2))
+
+if __name__ == '__main__':
+    main()
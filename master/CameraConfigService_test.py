@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+#
+
+"""Tests for CameraConfigService.py"""
+
+import asyncio
+import json
+
+import pytest
+
+import CameraConfigService
+from CameraConfigService import ALL_CAMERAS, CameraConfigStore
+
+
+def test_store_layers(tmp_path):
+    """Settings for every camera, then the camera's own"""
+    store = CameraConfigStore(str(tmp_path / "cameras"))
+    # Nothing set: the camera keeps its command line
+    assert store.get("cam1-1") == {}
+    assert store.cameras() == ["cam1-1"]
+    assert store.set(ALL_CAMERAS, {"bitrate": 2000, "right": 4}) == ["cam1-1"]
+    assert store.set("cam2-1", {"left": 3, "right": 5}) == ["cam2-1"]
+    assert store.get("cam1-1") == {"bitrate": 2000, "right": 4}
+    assert store.get("cam2-1") == {"bitrate": 2000, "left": 3, "right": 5}
+    # Only the cameras whose configuration changed
+    assert store.set(ALL_CAMERAS, {"right": 6}) == ["cam1-1"]
+    assert store.set("cam2-1", {"right": 5}) == []
+    # None removes a setting, falling back to the next layer
+    assert store.set("cam2-1", {"right": None}) == ["cam2-1"]
+    assert store.get("cam2-1")["right"] == 6
+    assert store.settings("cam2-1") == {"left": 3}
+    assert store.set(ALL_CAMERAS, {"bitrate": None, "right": None}) == ["cam1-1", "cam2-1"]
+    assert store.get("cam1-1") == {}
+    generation = store.generation
+    store.close()
+    store = CameraConfigStore(str(tmp_path / "cameras"))
+    assert store.generation == generation
+    assert store.get("cam2-1") == {"left": 3}
+    store.close()
+
+
+def test_service_loopback(tmp_path):
+    """Get and set over UDP, settings published as they change"""
+    published = {}
+    def publish(topic, payload, retain=False):
+        assert retain
+        published[topic] = json.loads(payload)
+
+    store = CameraConfigStore(str(tmp_path / "cameras"))
+    store.set("cam1-1", {"left": 4})
+    store.close()
+
+    async def exercise():
+        service = CameraConfigService.CameraConfigService(
+            str(tmp_path / "cameras"), "127.0.0.1", 0, publish=publish)
+        await service.start()
+        # Every layer is published at start
+        assert published["swimcam/camera/*/config"]["config"] == {}
+        assert published["swimcam/camera/cam1-1/config"]["config"] == {"left": 4}
+        port = service._transport.get_extra_info("sockname")[1]
+        loop = asyncio.get_running_loop()
+        def request(message):
+            return loop.run_in_executor(None, CameraConfigService.request, "127.0.0.1",
+                                        message, 2.0, port)
+        try:
+            reply = await request({"op": "get", "camera": "cam2-1"})
+            assert reply["config"] == {}
+            # A camera the master has never seen gets settings for every camera
+            reply = await request({"op": "set", "camera": ALL_CAMERAS,
+                                   "config": {"right": 7}})
+            assert reply == {"op": "ok", "generation": 2}
+            message = published["swimcam/camera/*/config"]
+            assert (message["generation"], message["config"]) == (2, {"right": 7})
+            assert published["swimcam/camera/cam1-1/config"]["config"] == {"left": 4}
+            reply = await request({"op": "get", "camera": "cam1-1"})
+            assert reply["config"] == {"left": 4, "right": 7}
+            await request({"op": "set", "camera": "cam3-1", "config": {"frames": True}})
+            assert published["swimcam/camera/cam3-1/config"]["config"] == {"frames": True}
+            reply = await request({"op": "set", "camera": "cam1-1", "config": "left"})
+            assert reply["op"] == "error"
+            reply = await request({"op": "bogus", "camera": "cam1-1"})
+            assert reply["op"] == "error"
+        finally:
+            await service.stop()
+
+    asyncio.run(exercise())
+
+
+def test_set_only_from_master(tmp_path):
+    """Settings can't be changed from another host"""
+    service = CameraConfigService.CameraConfigService(str(tmp_path / "cameras"))
+    service.store = CameraConfigStore(str(tmp_path / "cameras"))
+    with pytest.raises(PermissionError):
+        service.handle({"op": "set", "camera": ALL_CAMERAS, "config": {"pipeline": "evil"}},
+                       ("192.168.1.50", 40000))
+    assert service.handle({"op": "get", "camera": "cam1-1"},
+                          ("192.168.1.50", 40000))["config"] == {}
+    service.store.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Network clock quality of every device
+
+Devices publish a summary of their clock synchronisation to
+swimcam/clock/<device> (see simulator/clock_monitor.py). This shows the latest
+summary of each device, how far its offset has drifted over the summaries
+kept, and flags devices that have stopped reporting or have problems.
+
+    python3 ClockMonitorView.py [--host localhost]
+"""
+
+import argparse
+import collections
+import json
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+TOPIC = "swimcam/clock/"
+# Summaries kept per device
+HISTORY = 60
+# A device that hasn't reported for this long is flagged (seconds)
+STALE_AFTER = 30
+RTT_WARNING = 20_000_000
+
+
+def problems(summary, now):
+    found = []
+    if now - summary.get("received", now) > STALE_AFTER:
+        found.append("stale")
+    if not summary.get("synced"):
+        found.append("unsynced")
+    expected = summary.get("expected", 0)
+    if expected > 0 and summary.get("samples", 0) < expected * 0.8:
+        found.append("loss")
+    if summary.get("rtt_ns", {}).get("p95", 0) > RTT_WARNING:
+        found.append("slow")
+    return found
+
+
+class ClockMonitorView:
+    def __init__(self):
+        self.history = {}
+        self.lock = threading.Lock()
+
+    def on_message(self, client, userdata, message):
+        try:
+            summary = json.loads(message.payload)
+        except ValueError:
+            return
+        summary["received"] = time.time()
+        device = message.topic[len(TOPIC):]
+        with self.lock:
+            self.history.setdefault(device, collections.deque(maxlen=HISTORY)).append(summary)
+
+    def render(self):
+        now = time.time()
+        lines = [f"{'device':<16} {'offset us':>10} {'jitter us':>10} {'drift us':>9} "
+                 f"{'rtt us':>8} {'p95 us':>8} {'samples':>8}  problems"]
+        with self.lock:
+            for device in sorted(self.history):
+                history = self.history[device]
+                last = history[-1]
+                offset = last.get("offset_ns", {})
+                rtt = last.get("rtt_ns", {})
+                first_mean = history[0].get("offset_ns", {}).get("mean", 0)
+                drift = offset.get("mean", 0) - first_mean
+                lines.append(f"{device:<16} {offset.get('mean', 0) / 1000:>10.1f} "
+                             f"{offset.get('jitter', 0) / 1000:>10.1f} {drift / 1000:>9.1f} "
+                             f"{rtt.get('mean', 0) / 1000:>8.1f} {rtt.get('p95', 0) / 1000:>8.1f} "
+                             f"{last.get('samples', 0):>3}/{last.get('expected', 0):<4}  "
+                             f"{' '.join(problems(last, now))}")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network clock quality of every device")
+    parser.add_argument("--host", default="localhost", help="MQTT broker")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--refresh", type=float, default=2.0, help="Seconds between updates")
+    args = parser.parse_args()
+
+    view = ClockMonitorView()
+    client = mqtt.Client("swimcam-clock-monitor")
+    client.username_pw_set(username="swimcam", password="swimming")
+    client.on_message = view.on_message
+    client.on_connect = lambda c, userdata, flags, rc: c.subscribe(TOPIC + "+")
+    client.connect(args.host, args.port)
+    client.loop_start()
+    try:
+        while True:
+            # Clear the screen and redraw
+            print("\033[H\033[J" + view.render(), flush=True)
+            time.sleep(args.refresh)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == '__main__':
+    main()
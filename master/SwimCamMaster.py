@@ -20,62 +20,109 @@
 """
 Swim Cam Master Server
 
-Master mode operation - 2 main functions
+Master mode operation - everything runs as a service on one asyncio event loop
 
-    Creates and runs the master GStreamer network clock
+    Serves the master GStreamer network clock (the NetTimeProvider answers
+    on its own GStreamer thread, the service only owns its lifecycle)
     
-    Create an Advertisement service allong remotes to find the master server on a separate thread
+    Advertises the master so remotes can find it
     
-    FUTURE:
-    Listens for element configuration requests.
-    	For configuration request
-    	    Retrieve the configuration
-    	    If none exists, create a blank entry and use defaults
-    	    Send the configuration to the remote device
-   
-    This is quite lazy in its approach but it works for testing!
- 	        
+    Serves camera configurations (see CameraConfigService.py)
+
+A service is any object with start() and stop() coroutines. Services are
+started in order and stopped in reverse on SIGINT/SIGTERM.
 """
 
 import argparse
+import asyncio
+import signal
 
-from threading import Thread
 import gi
 gi.require_version('Gst', '1.0')
 gi.require_version('GstNet', '1.0')
-from gi.repository import Gst, GstNet, GObject, GLib
+from gi.repository import Gst, GstNet
 
+import CameraConfigService
 from SwimCamMasterAdvertisementService import SwimCamMasterAdvertisementService
 
-mainloop = 0
-master = 0
-myserver = 0
 
-def exit_master():
-    global mainloop, master 
-    print("Cleaning Up master")
-    master.stop()
-    mainloop.quit()
+class ClockService:
+    """Serves the master network clock"""
+    def __init__(self, port=9998):
+        self.port = port
+        self.provider = None
+
+    async def start(self):
+        sysClock = Gst.SystemClock.obtain()
+        sysClock.set_property('clock-type',Gst.ClockType.REALTIME)
+        self.provider = GstNet.NetTimeProvider.new(sysClock,None,self.port)
+        if self.provider is None:
+            raise OSError(f"Unable to serve the network clock on port {self.port}")
+
+    async def stop(self):
+        if self.provider is not None:
+            self.provider.set_property('active', False)
+            self.provider = None
+
+
+class SwimCamMaster:
+    """The master runtime"""
+    def __init__(self):
+        self.services = []
+        self._stopping = None
+
+    def add_service(self, service):
+        """Add a service, services start in the order they were added"""
+        self.services.append(service)
+        return service
+
+    def stop(self):
+        """Ask run() to stop the services and return"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        """Start the services and run until stopped or signalled"""
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+        started = []
+        try:
+            for service in self.services:
+                await service.start()
+                started.append(service)
+            print("Services started...")
+            await self._stopping.wait()
+        finally:
+            print("Cleaning Up master")
+            for service in reversed(started):
+                await service.stop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
 
 
 def main():
-    global mainloop, master, NetTimeProvider
+    parser = argparse.ArgumentParser(description="SwimCam master server")
+    parser.add_argument("--id", default="", help="Master id (default: host name)")
+    parser.add_argument("--priority", type=int, default=0,
+                        help="Remotes prefer the lowest priority master (e.g. 1 for a standby)")
+    parser.add_argument("--clock-port", type=int, default=9998, help="Network clock port")
+    parser.add_argument("--broker-port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--config-store", default=CameraConfigService.DEFAULT_STORE,
+                        help="Where camera configurations are kept")
+    args = parser.parse_args()
     Gst.init(None)
-    # Start serving the master clock
-    sysClock = Gst.SystemClock.obtain()
-    sysClock.set_property('clock-type',Gst.ClockType.REALTIME)
-    NetTimeProvider = GstNet.NetTimeProvider.new(sysClock,None,9998)
-    # Start the master advertisement
-    master = SwimCamMasterAdvertisementService('0.0.0.0',54545)
-    master.daemon = True
-    master.start()
-    print("Threads started...")
 
-if __name__ == '__main__':
-    mainloop = GLib.MainLoop()
+    master = SwimCamMaster()
+    master.add_service(ClockService(args.clock_port))
+    master.add_service(SwimCamMasterAdvertisementService('0.0.0.0', master_id=args.id,
+                                                         clock_port=args.clock_port,
+                                                         broker_port=args.broker_port,
+                                                         priority=args.priority))
+    master.add_service(CameraConfigService.CameraConfigService(
+        args.config_store, publish=CameraConfigService.mqtt_publish(args.broker_port)))
+    asyncio.run(master.run())
 
-    try:
-        main()
-        mainloop.run()
-    except KeyboardInterrupt:
-        exit_master()
+if __name__ == '__main__':
+    main()
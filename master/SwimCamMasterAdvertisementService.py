@@ -18,32 +18,153 @@
 #
 # Master server advertisement.  
 # 
-# Push a "hello" packet every 5 seconds to allow the network to auto-configure
+# Broadcast an advertisement (see discovery.py) to allow the network to
+# auto-configure. Remotes that don't want to wait for it send a "Query" to
+# QUERY_PORT and get the advertisement back straight away.
 #
-# Runs as a separate thread
+# Advertisements go out in a burst when the master starts or its settings
+# change, when remotes are most likely waiting for it, then back off once
+# the network has settled. The cameras (swimutil.c) only listen for the
+# advertisement and never query, so the settled interval is what a camera
+# started later waits for the core; keep it short.
+#
+# Runs as a service on the master's event loop
 #
 
-from threading import Thread
+import asyncio
+import os
 import socket
 import time
 
-class SwimCamMasterAdvertisementService(Thread):
-    _should_continue = 1 
+import discovery
+from discovery import ADVERTISE_PORT, QUERY_PORT, Advertisement
+
+# First interval of a burst (seconds)
+BURST_INTERVAL = 0.25
+# Interval once settled (seconds)
+SETTLED_INTERVAL = 8
+
+class AdvertisementSchedule:
+    """
+    When to advertise next
+
+    The interval starts at BURST_INTERVAL and doubles after every
+    advertisement up to SETTLED_INTERVAL; reset() starts a new burst.
+    """
+    def __init__(self, burst=BURST_INTERVAL, settled=SETTLED_INTERVAL):
+        self.burst = burst
+        self.settled = settled
+        self.interval = burst
+
+    def reset(self):
+        """Start a new burst"""
+        self.interval = self.burst
+
+    def advance(self):
+        """Called after each advertisement, returns the delay until the next one"""
+        delay = self.interval
+        self.interval = min(self.interval * 2, self.settled)
+        return delay
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    """Answers discovery queries with the current advertisement"""
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if data == discovery.QUERY:
+            self.transport.sendto(self.service.advertisement(), addr)
+
+    def error_received(self, exc):
+        pass  # the remote will ask again
+
+class SwimCamMasterAdvertisementService:
+    def __init__(self,listen_address,port=ADVERTISE_PORT,query_port=QUERY_PORT,
+                 master_id="",clock_port=discovery.DEFAULT_CLOCK_PORT,
+                 broker_port=discovery.DEFAULT_BROKER_PORT,priority=0,
+                 schedule=None):
+        self.listen_address = listen_address
+        self.port = port
+        self.query_port = query_port
+        self.master_id = master_id or socket.gethostname()
+        self.clock_port = clock_port
+        self.broker_port = broker_port
+        self.priority = priority
+        self.schedule = schedule or AdvertisementSchedule()
+        self.start_time = time.monotonic()
+        self._broadcast = None
+        self._query = None
+        self._task = None
+        self._wake = None
+
+    def advertisement(self):
+        """The advertisement as it stands now"""
+        try:
+            load = int(os.getloadavg()[0] * 100)
+        except OSError:
+            load = 0
+        # Valid until well after the next one is due
+        ttl = int(3 * max(self.schedule.interval, 5))
+        return discovery.encode_advert(Advertisement(
+            master_id=self.master_id, clock_port=self.clock_port,
+            broker_port=self.broker_port, priority=self.priority, load=load,
+            uptime=int(time.monotonic() - self.start_time), ttl=ttl))
 
-    def __init__(self,listen_address,port):
-        Thread.__init__(self)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind((listen_address,54545))
+    def configure(self, **settings):
+        """
+        Change what is advertised (master_id, ports, priority) and start a new burst
 
-    def run(self):
-        while self._should_continue:
-            self.socket.sendto(bytes("Hello",'UTF-8'), ('<broadcast>', 54545))
-            time.sleep(5)
+        Must be called from the event loop's thread.
+        """
+        for name, value in settings.items():
+            if name not in ("master_id", "clock_port", "broker_port", "priority"):
+                raise TypeError(f"unknown advertisement setting {name}")
+            setattr(self, name, value)
+        self.schedule.reset()
+        if self._wake is not None:
+            self._wake.set()
 
-    def stop(self):
-        self.socket.close()
-        self._should_continue = 0 
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.listen_address,self.port))
+        self._broadcast, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, sock=sock)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.listen_address,self.query_port))
+        self._query, _ = await loop.create_datagram_endpoint(
+            lambda: _QueryProtocol(self), sock=sock)
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._advertise())
 
+    async def _advertise(self):
+        while True:
+            try:
+                self._broadcast.sendto(self.advertisement(), ('<broadcast>', self.port))
+            except OSError as err:
+                # e.g. the network isn't up yet, try again next time
+                print("Advertisement failed:", err)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.schedule.advance())
+                self._wake.clear()
+            except asyncio.TimeoutError:
+                pass
 
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for transport in (self._broadcast, self._query):
+            if transport is not None:
+                transport.close()
+        self._task = self._broadcast = self._query = self._wake = None
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+#
+
+"""Tests for SwimCamMasterAdvertisementService.py"""
+
+import discovery
+from SwimCamMasterAdvertisementService import (
+    AdvertisementSchedule, SwimCamMasterAdvertisementService)
+
+
+def test_schedule_backs_off():
+    """A burst doubles up to the settled interval, reset() starts another"""
+    schedule = AdvertisementSchedule(burst=0.25, settled=8)
+    delays = [schedule.advance() for _ in range(8)]
+    assert delays == [0.25, 0.5, 1, 2, 4, 8, 8, 8]
+    schedule.reset()
+    assert schedule.advance() == 0.25
+    assert schedule.interval == 0.5
+
+
+def test_settled_interval_suits_passive_cameras():
+    """A camera that only listens hears the core within seconds"""
+    schedule = AdvertisementSchedule()
+    for _ in range(20):
+        schedule.advance()
+    assert 5 <= schedule.interval <= 10
+
+
+def test_advertisement_outlives_interval():
+    """An advertisement stays valid until after the next one is due"""
+    service = SwimCamMasterAdvertisementService("127.0.0.1", master_id="master1",
+                                                priority=2)
+    for _ in range(20):
+        service.schedule.advance()
+    advert = discovery.decode_advert(service.advertisement())
+    assert (advert.master_id, advert.priority) == ("master1", 2)
+    assert advert.ttl > service.schedule.interval
+    service.configure(priority=3)
+    assert service.schedule.interval == service.schedule.burst
@@ -15,7 +15,6 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import socket
 import gi
 gi.require_version('Gst','1.0')
 gi.require_version('GstNet','1.0')
@@ -23,21 +22,26 @@ from gi.repository import Gst, GstNet
 import functools
 import time
 
+import CameraConfigService
+import discovery
+
    
 class Util:
-    def get_core_clock(core_ip="localhost", core_clock_port=9998):
+    def get_core_clock(core_ip="localhost", core_clock_port=9998, timeout=None):
+        """The network clock, after waiting up to timeout seconds (None for ever) for sync"""
         clock = GstNet.NetClientClock.new('swimcam',core_ip, core_clock_port,0)
-        clock.wait_for_sync(Gst.CLOCK_TIME_NONE)
+        clock.wait_for_sync(Gst.CLOCK_TIME_NONE if timeout is None
+                            else int(timeout * Gst.SECOND))
         return clock
         
-    def wait_for_core():
-        _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        _socket.bind(('', 54545))
-        while True:
-            data, addr = _socket.recvfrom(2048)
-            break
-        _socket.close()
-        return addr
-                 
+    def wait_for_core(timeout=None, cache_file=discovery.CORE_CACHE, preferred=""):
+        """Find the core, returns the discovery.Master or None after timeout seconds"""
+        return discovery.wait_for_core(timeout, cache_file, preferred)
 
+    def get_camera_config(core_ip, camera, timeout=2.0):
+        """Ask the core for a camera's configuration, returns the settings"""
+        reply = CameraConfigService.request(core_ip, {"op": "get", "camera": str(camera)},
+                                            timeout)
+        if reply.get("op") != "config":
+            raise ValueError(reply.get("error", "unexpected reply"))
+        return reply["config"]
@@ -0,0 +1 @@
+../simulator/discovery.py
\ No newline at end of file
@@ -19,10 +19,71 @@
 Orignal work by :
    Wahoo! Results - https://github.com/JohnStrunk/wahoo-results 
    Copyright (C) 2020 - John D. Strunk
+
+Truncation uses a binary search over the prefix length, so a label costs
+O(log n) font measurements instead of O(n). Results are kept in an LRU cache
+keyed by (font, text, width) that is shared by every BoundedText on a canvas,
+so resizing the window or changing the font only measures each distinct label
+once.
+
+Benchmark:  bounded_text_bench.py
 '''
 
 import tkinter as tk
 import tkinter.font as tkfont
+import weakref
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+# Number of truncated strings remembered per canvas
+CACHE_SIZE = 1024
+
+# (font, text, width) -> truncated text
+_CacheKey = Tuple[Hashable, str, int]
+_caches: "weakref.WeakKeyDictionary[tk.Canvas, OrderedDict[_CacheKey, str]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def fit_text(measure: Callable[[str], int], text: str, max_width: int) -> str:
+    '''
+    The longest prefix of text that measure() says fits in max_width
+
+    >>> fit_text(lambda s: 10 * len(s), "SWIMMER, SOME", 45)
+    'SWIM'
+    >>> fit_text(lambda s: 10 * len(s), "SWIM", 45)
+    'SWIM'
+    '''
+    if measure(text) <= max_width:
+        return text
+    # Invariant: text[:low] fits, text[:high] doesn't
+    low, high = 0, len(text)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if measure(text[:mid]) <= max_width:
+            low = mid
+        else:
+            high = mid
+    return text[:low]
+
+
+# Tk font name -> _font_key(), so a font is only queried once
+_font_keys: "OrderedDict[str, Hashable]" = OrderedDict()
+
+
+def _font_key(font: tkfont.Font) -> Hashable:
+    '''
+    Identify a font by what it looks like, not by its Tk name
+
+    The scoreboard builds a new Font object on every resize, so keying the
+    cache on the name alone would never hit.
+    '''
+    key = _font_keys.get(font.name)
+    if key is None:
+        key = tuple(sorted(font.actual().items()))
+        _font_keys[font.name] = key
+        if len(_font_keys) > 64:
+            _font_keys.popitem(last=False)
+    return key
 
 class BoundedText:
     '''
@@ -33,14 +94,18 @@ class BoundedText:
     _max_width: int
     _canvas: tk.Canvas
     _id: int
+    _shown: str  # The (truncated) text currently on the canvas
 
     def __init__(self, canvas: tk.Canvas, xpos: int, ypos: int, **kwargs):
         self._canvas = canvas
         self._font = kwargs.setdefault("font", tkfont.Font())
+        self._font_key = _font_key(self._font)
         self._full_text = kwargs.setdefault("text", "")
         self._max_width = kwargs.get("width", 0)
+        self._shown = self._full_text
         kwargs["width"] = 0
         self._id = canvas.create_text(xpos, ypos, kwargs)
+        self._cache = _caches.setdefault(canvas, OrderedDict())
         self.update()
 
     @property
@@ -78,6 +143,7 @@ class BoundedText:
     @font.setter
     def font(self, font):
         self._font = font
+        self._font_key = _font_key(font)
         self._canvas.itemconfigure(self._id, font=font)
         self.update()
 
@@ -88,15 +154,19 @@ class BoundedText:
 
     def update(self):
         '''Update the widget's size'''
-        self._canvas.itemconfigure(self._id, text=self._full_text)
-        if self._max_width == 0:
-            return
-        chars = len(self._full_text)
         text = self._full_text
-        for i in range(chars, 0, -1):
-            if self._font.measure(text) > self._max_width:
-                text = text[0:i]
+        if self._max_width != 0 and text != "":
+            key = (self._font_key, text, self._max_width)
+            fitted = self._cache.get(key)
+            if fitted is None:
+                fitted = fit_text(self._font.measure, text, self._max_width)
+                self._cache[key] = fitted
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
             else:
-                break
-        self._canvas.itemconfigure(self._id, text=text)
+                self._cache.move_to_end(key)
+            text = fitted
+        if text != self._shown:
+            self._shown = text
+            self._canvas.itemconfigure(self._id, text=text)
 
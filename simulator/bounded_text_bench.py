@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+'''
+Micro-benchmark for BoundedText truncation
+
+Compares the number of font measurements (Tk round-trips) and the time taken
+by the old one-character-at-a-time truncation, the binary search, and the
+binary search with the shared cache, for a scoreboard's worth of labels over
+a series of window resizes.
+
+Run with a display to measure with a real Tk font:
+
+    python3 bounded_text_bench.py
+'''
+
+import time
+import tkinter as tk
+import tkinter.font as tkfont
+
+from bounded_text import BoundedText, fit_text
+
+NAMES = ["SWIMMER, FIRST", "REALLYREALLYLONGNAME, IMA", "BIGBIGBIGLY, NAMENAM",
+         "TIME, INCONSISTENT", "FITZPATRICK, LOREN", "UNDERWOOD, FINN",
+         "MONROE, REISS", "MARTINEZ, RYLEY", "WARDLE, ESME", "AVILA, JILL"]
+# Window widths seen while dragging the window edge
+WIDTHS = list(range(40, 300, 4)) * 3
+
+
+def linear_fit(measure, text, max_width):
+    '''The original truncation loop'''
+    for i in range(len(text), 0, -1):
+        if measure(text) > max_width:
+            text = text[0:i]
+        else:
+            break
+    return text
+
+
+def run(label, fit, font):
+    '''Truncate every name at every width'''
+    calls = 0
+    def measure(text):
+        nonlocal calls
+        calls += 1
+        return font.measure(text)
+    start = time.perf_counter()
+    for width in WIDTHS:
+        for name in NAMES:
+            fit(measure, name, width)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {calls:>8} measurements {elapsed * 1000:>9.1f} ms")
+
+
+def main():
+    '''Run the benchmark'''
+    root = tk.Tk()
+    root.withdraw()
+    font = tkfont.Font(family="Helvetica", weight="bold", size=-24)
+    print(f"{len(NAMES)} labels x {len(WIDTHS)} resizes")
+    run("linear", linear_fit, font)
+    run("binary search", fit_text, font)
+
+    canvas = tk.Canvas(root)
+    items = [BoundedText(canvas, 0, 0, font=font, text=name, width=1) for name in NAMES]
+    start = time.perf_counter()
+    for width in WIDTHS:
+        for item in items:
+            item.width = width
+    elapsed = time.perf_counter() - start
+    print(f"{'cached BoundedText':<20} {'':>8}              {elapsed * 1000:>9.1f} ms")
+    root.destroy()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Network clock synchronisation quality
+
+A GStreamer NetClientClock posts a statistics message on its bus after every
+exchange with the master (roughly once a second). The monitor collects them
+into a ring buffer and periodically publishes a summary, as JSON, to
+swimcam/clock/<device>. master/ClockMonitorView.py shows the summaries of
+every device.
+
+A summary holds:
+    device, time       who and when (wall clock seconds)
+    synced             the clock is synchronised
+    samples, expected  samples received in the last period and how many
+                       there should have been; a shortfall means lost packets
+    offset_ns          mean, min, max and jitter (standard deviation) of the
+                       local clock's offset from the master
+    rtt_ns             mean, p95 and max round trip time
+    rate               the latest rate correction
+"""
+
+import collections
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional
+
+TOPIC = "swimcam/clock/"
+# Samples kept per device
+RING_SIZE = 300
+# Seconds between published summaries
+PUBLISH_INTERVAL = 10.0
+# The master's clock is polled about this often (NetClientClock default)
+SAMPLE_INTERVAL = 1.0
+# A round trip this slow (ns) makes the timestamps suspect
+RTT_WARNING = 20_000_000
+
+Publish = Callable[[str, str], Any]
+
+
+class ClockSample(NamedTuple):
+    '''One NetClientClock statistics message'''
+    time: float
+    synced: bool
+    offset: int
+    rtt: int
+    rate: float
+
+
+def sample_from_stats(stats: Mapping[str, Any], when: float) -> ClockSample:
+    '''Build a sample from the fields of a gst-netclock-statistics structure'''
+    return ClockSample(time=when, synced=bool(stats.get("synchronised", False)),
+                       offset=int(stats.get("local-clock-offset", 0)),
+                       rtt=int(stats.get("rtt", stats.get("rtt-average", 0))),
+                       rate=float(stats.get("rate", 1.0)))
+
+
+class SampleRing:
+    '''The latest samples of one device'''
+    def __init__(self, size: int = RING_SIZE):
+        self._samples: "collections.deque[ClockSample]" = collections.deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, sample: ClockSample) -> None:
+        '''Add a sample, dropping the oldest if full'''
+        self._samples.append(sample)
+
+    def since(self, when: float) -> List[ClockSample]:
+        '''The samples taken at or after when'''
+        return [s for s in self._samples if s.time >= when]
+
+    def summary(self, device: str, since: float, now: float,
+                interval: float = SAMPLE_INTERVAL) -> Dict[str, Any]:
+        '''Summarise the samples taken since since'''
+        samples = self.since(since)
+        summary: Dict[str, Any] = {
+            "device": device, "time": time.time(),
+            "synced": bool(self._samples) and self._samples[-1].synced,
+            "samples": len(samples),
+            "expected": int((now - since) / interval),
+        }
+        if samples:
+            offsets = [s.offset for s in samples]
+            rtts = sorted(s.rtt for s in samples)
+            mean = sum(offsets) / len(offsets)
+            summary["offset_ns"] = {
+                "mean": int(mean), "min": min(offsets), "max": max(offsets),
+                "jitter": int(math.sqrt(sum((o - mean) ** 2 for o in offsets) / len(offsets))),
+            }
+            summary["rtt_ns"] = {
+                "mean": int(sum(rtts) / len(rtts)),
+                "p95": rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))],
+                "max": rtts[-1],
+            }
+            summary["rate"] = samples[-1].rate
+        return summary
+
+
+def summary_problems(summary: Mapping[str, Any]) -> List[str]:
+    '''
+    Why a summary suggests the timestamps can't be trusted
+
+    >>> summary_problems({"synced": True, "samples": 10, "expected": 10})
+    []
+    >>> summary_problems({"synced": False, "samples": 4, "expected": 10})
+    ['not synchronised', 'lost 60% of samples']
+    '''
+    problems = []
+    if not summary.get("synced"):
+        problems.append("not synchronised")
+    expected = summary.get("expected", 0)
+    if expected > 0 and summary.get("samples", 0) < expected * 0.8:
+        problems.append(f"lost {100 - 100 * summary['samples'] // expected}% of samples")
+    rtt = summary.get("rtt_ns", {}).get("p95", 0)
+    if rtt > RTT_WARNING:
+        problems.append(f"slow link (p95 rtt {rtt / 1e6:.1f} ms)")
+    return problems
+
+
+class ClockMonitor(threading.Thread):
+    '''
+    Samples a NetClientClock's statistics in the background
+
+    Parameters:
+        clock: The GstNet.NetClientClock to watch
+        device: Name to publish the summaries under
+        publish: Called with (topic, payload) for every summary
+        interval: Seconds between summaries
+    '''
+    def __init__(self, clock, device: str, publish: Optional[Publish] = None,
+                 interval: float = PUBLISH_INTERVAL):
+        super().__init__(name="clock-monitor", daemon=True)
+        # Only needed once there is a clock to watch
+        from gi.repository import Gst  # pylint: disable=import-outside-toplevel
+        self._gst = Gst
+        self._bus = Gst.Bus.new()
+        clock.set_property("bus", self._bus)
+        self.device = device
+        self.ring = SampleRing()
+        self.last_summary: Dict[str, Any] = {}
+        self._publish = publish
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def _structure_fields(self, structure) -> Dict[str, Any]:
+        return {structure.nth_field_name(i): structure.get_value(structure.nth_field_name(i))
+                for i in range(structure.n_fields())}
+
+    def publish_summary(self, since: float) -> Dict[str, Any]:
+        '''Publish (and log problems with) the samples since since'''
+        summary = self.ring.summary(self.device, since, time.monotonic())
+        self.last_summary = summary
+        problems = summary_problems(summary)
+        if problems:
+            logging.warning("Network clock: %s", ", ".join(problems))
+        if self._publish is not None:
+            self._publish(TOPIC + self.device, json.dumps(summary))
+        return summary
+
+    def run(self) -> None:
+        gst = self._gst
+        period_start = time.monotonic()
+        while not self._stopped.is_set():
+            msg = self._bus.timed_pop_filtered(250 * gst.MSECOND, gst.MessageType.ELEMENT)
+            if msg is not None:
+                structure = msg.get_structure()
+                if structure is not None and structure.get_name() == "gst-netclock-statistics":
+                    self.ring.add(sample_from_stats(self._structure_fields(structure),
+                                                    time.monotonic()))
+            if time.monotonic() - period_start >= self._interval:
+                self.publish_summary(period_start)
+                period_start = time.monotonic()
+
+    def stop(self) -> None:
+        '''Ask the monitor thread to exit'''
+        self._stopped.set()
@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+#
+
+"""Tests for clock_monitor.py"""
+
+import clock_monitor
+from clock_monitor import ClockSample, SampleRing
+
+
+def test_summary():
+    """Offsets, round trips and lost samples are summarised"""
+    ring = SampleRing(size=5)
+    for i in range(8):
+        ring.add(ClockSample(time=float(i), synced=True, offset=1000 * (i % 2),
+                             rtt=(i + 1) * 1_000_000, rate=1.0))
+    assert len(ring) == 5
+    summary = ring.summary("lane-3", since=4.0, now=10.0)
+    assert summary["device"] == "lane-3"
+    assert summary["synced"]
+    assert (summary["samples"], summary["expected"]) == (4, 6)
+    assert summary["offset_ns"] == {"mean": 500, "min": 0, "max": 1000, "jitter": 500}
+    assert summary["rtt_ns"] == {"mean": 6_500_000, "p95": 8_000_000, "max": 8_000_000}
+    assert clock_monitor.summary_problems(summary) == ["lost 34% of samples"]
+
+
+def test_sample_from_stats():
+    """Statistics fields map onto a sample"""
+    sample = clock_monitor.sample_from_stats(
+        {"synchronised": True, "local-clock-offset": -250, "rtt": 1500, "rate": 0.999}, 3.0)
+    assert sample == ClockSample(3.0, True, -250, 1500, 0.999)
+    assert not clock_monitor.sample_from_stats({}, 0.0).synced
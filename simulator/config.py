@@ -36,6 +36,9 @@ class StarterConfig:
     # Configuration defaults if not present in the config file
     _CONFIG_DEFAULTS = {_INI_HEADING: {
         "start_list_dir": ".",  # Location of Start List files
+        "start_list_cache": "startlists.cache", # Parsed start list cache ("" to disable)
+        "start_list_db": "",    # Meet Manager database to read instead of .scb files
+        "start_list_session": "0", # Meet Manager session to load (0 = all)
         "num_lanes": "10",      # Number of lanes on the board
         "color_bg": "black",    # Window background
         "color_fg": "white",    # Main text color
@@ -47,8 +50,21 @@ class StarterConfig:
         "font_scale": 0.67,     # scale of font relative to line height
         "fullscreen": "False",  # Run in fullscreen mode
         "GPIO_pin": 13,         # Starter GPIO PIN
+        "legacy_start": "True", # Also send the text start message for older cameras
+        "start_input": "",      # Start signal: "" none, "gpio" for GPIO_pin, or a named pipe
         "lane10iszero": "False",# Lane numbering starts at 0
         "core_host": "localhost", # default core host
+        "core_timeout": "10",   # Seconds to look for the core before using core_host
+        "core_preferred": "",   # Id of the master to use when several are found
+        "core_clock_port": "9998",   # Core network clock port
+        "core_broker_port": "1883",  # Core MQTT broker port
+        "broker_username": "swimcam",  # MQTT credentials ("" for none)
+        "broker_password": "swimming",
+        "qos_start": "1",       # MQTT QoS of starts and resets
+        "qos_heat": "1",        # MQTT QoS of the staged heat and lanes
+        "qos_status": "0",      # MQTT QoS of status (network clock quality)
+        "publish_queue": "100", # Messages held while the broker is unavailable
+        "journal": "races.swj", # Journal of every start and reset ("" for none)
     }}
 
     def __init__(self):
@@ -0,0 +1,287 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Finding the SwimCam master (core)
+
+The master broadcasts an advertisement to ADVERTISE_PORT and answers a query
+sent to QUERY_PORT with the same advertisement. It tells remotes where the
+clock and MQTT broker are and lets them choose between several masters (two
+pools, or a hot standby).
+
+Advertisement (network byte order):
+    magic      "SWCM"
+    version    1
+    clock      clock port
+    broker     MQTT broker port
+    priority   lower is preferred (a standby advertises a higher value)
+    load       load average x 100
+    uptime     seconds
+    ttl        seconds the advertisement stays valid
+    id         length prefixed UTF-8 master id
+Later versions only append fields, so any version can be read as version 1.
+
+A bare "Hello" from an older master is read as an advertisement with the
+default ports.
+
+This module is shared by the master and the simulator; master/discovery.py is
+a symlink to it.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Port the advertisement is broadcast to
+ADVERTISE_PORT = 54545
+# Port discovery queries are answered on
+QUERY_PORT = 54546
+DEFAULT_CLOCK_PORT = 9998
+DEFAULT_BROKER_PORT = 1883
+DEFAULT_TTL = 15
+QUERY = b"Query"
+# Where the last core found is remembered, so it can be tried first
+CORE_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "swimcam", "core")
+# How long to wait for other masters once the first has answered
+SETTLE_TIME = 0.25
+
+_LEGACY_HELLO = b"Hello"
+_MAGIC = b"SWCM"
+_VERSION = 1
+_ADVERT = struct.Struct("!4sBHHBHIHB")
+_MAX_ID = 255
+
+Address = Tuple[str, int]
+
+
+class Advertisement(NamedTuple):
+    '''What a master says about itself'''
+    master_id: str = ""
+    clock_port: int = DEFAULT_CLOCK_PORT
+    broker_port: int = DEFAULT_BROKER_PORT
+    priority: int = 0
+    load: int = 0
+    uptime: int = 0
+    ttl: int = DEFAULT_TTL
+
+
+class Master(NamedTuple):
+    '''A master seen on the network'''
+    host: str
+    advert: Advertisement
+    expires: float
+
+
+def encode_advert(advert: Advertisement) -> bytes:
+    '''The advertisement as sent on the wire'''
+    master_id = advert.master_id.encode("utf-8")[:_MAX_ID]
+    return _ADVERT.pack(_MAGIC, _VERSION, advert.clock_port, advert.broker_port,
+                        min(advert.priority, 255), min(advert.load, 0xffff),
+                        min(advert.uptime, 0xffffffff), min(advert.ttl, 0xffff),
+                        len(master_id)) + master_id
+
+
+def decode_advert(data: bytes) -> Optional[Advertisement]:
+    '''
+    Read an advertisement, None if data isn't one
+
+    >>> decode_advert(encode_advert(Advertisement("pool-a", load=25))).master_id
+    'pool-a'
+    >>> decode_advert(b"Hello").clock_port
+    9998
+    '''
+    if data == _LEGACY_HELLO:
+        return Advertisement()
+    if len(data) < _ADVERT.size or not data.startswith(_MAGIC):
+        return None
+    _, version, clock, broker, priority, load, uptime, ttl, id_len = _ADVERT.unpack_from(data)
+    master_id = data[_ADVERT.size:_ADVERT.size + id_len]
+    if version < 1 or len(master_id) != id_len:
+        return None
+    return Advertisement(str(master_id, "utf-8", errors="replace"), clock, broker,
+                         priority, load, uptime, ttl)
+
+
+class MasterTable:
+    '''
+    The masters seen recently
+
+    A master is forgotten once its advertisement's ttl has passed without
+    hearing from it again.
+    '''
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._masters: Dict[str, Master] = {}
+
+    def update(self, host: str, advert: Advertisement) -> Master:
+        '''Record an advertisement from host'''
+        master = Master(host, advert, self._clock() + advert.ttl)
+        # Older masters have no id, so tell them apart by address
+        self._masters[advert.master_id or host] = master
+        return master
+
+    def masters(self) -> List[Master]:
+        '''The masters that are still alive'''
+        now = self._clock()
+        self._masters = {k: m for k, m in self._masters.items() if m.expires > now}
+        return list(self._masters.values())
+
+    def best(self, preferred: str = "") -> Optional[Master]:
+        '''The preferred master if it's alive, otherwise the least loaded'''
+        masters = self.masters()
+        for master in masters:
+            if preferred != "" and master.advert.master_id == preferred:
+                return master
+        if not masters:
+            return None
+        return min(masters, key=lambda m: (m.advert.priority, m.advert.load, m.host))
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    '''Passes every advertisement received to a callback'''
+    def __init__(self, received: Callable[[str, Advertisement], None]):
+        self._received = received
+
+    def datagram_received(self, data, addr):
+        advert = decode_advert(data)
+        if advert is not None:
+            self._received(addr[0], advert)
+
+
+def _read_cache(cache_file: str) -> str:
+    try:
+        with open(cache_file, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return ""
+
+
+def _write_cache(cache_file: str, host: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, "w") as file:
+            file.write(host)
+    except OSError:
+        pass  # only an optimization
+
+
+async def discover_core(timeout: Optional[float] = None, cache_file: str = CORE_CACHE,
+                        preferred: str = "", table: Optional[MasterTable] = None
+                        ) -> Optional[Master]:
+    '''
+    Find the core
+
+    Listens for the masters' periodic advertisements and, so we don't have to
+    wait for them, actively queries: first at the last known core address,
+    then by broadcast. Queries are repeated with backoff until a master
+    answers or the timeout (seconds, None for no limit) expires. Once one
+    master has answered, others get SETTLE_TIME to answer too unless the
+    preferred master was found.
+
+    Parameters:
+        timeout: Seconds to look for, None to wait for ever
+        cache_file: Where the last core is remembered ("" for nowhere)
+        preferred: Id of the master to use if it's available
+        table: Table to record the masters seen in
+
+    Returns the chosen master, or None on timeout.
+    '''
+    # pylint: disable=too-many-locals
+    loop = asyncio.get_running_loop()
+    if table is None:
+        table = MasterTable()
+    seen = asyncio.Event()
+    seen_preferred = asyncio.Event()
+
+    def received(host: str, advert: Advertisement) -> None:
+        table.update(host, advert)  # type: ignore
+        seen.set()
+        if preferred != "" and advert.master_id == preferred:
+            seen_preferred.set()
+
+    transports = []
+    try:
+        # Passive: the periodic broadcast (optional, the port may be taken)
+        listen = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listen.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            listen.bind(('', ADVERTISE_PORT))
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DiscoveryProtocol(received), sock=listen)
+            transports.append(transport)
+        except OSError:
+            listen.close()
+        # Active: ask, and get the answer on our own port
+        query = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            query.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            query.bind(('', 0))
+            prober, _ = await loop.create_datagram_endpoint(
+                lambda: _DiscoveryProtocol(received), sock=query)
+        except BaseException:
+            query.close()
+            raise
+        transports.append(prober)
+
+        targets: List[Address] = []
+        last_core = _read_cache(cache_file) if cache_file else ""
+        if last_core != "":
+            targets.append((last_core, QUERY_PORT))
+        targets.append(('<broadcast>', QUERY_PORT))
+
+        async def probe():
+            delay = 0.1
+            while True:
+                for target in targets:
+                    try:
+                        prober.sendto(QUERY, target)
+                    except OSError:
+                        pass  # e.g. the cached core no longer resolves
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+        async def choose():
+            await seen.wait()
+            try:
+                await asyncio.wait_for(seen_preferred.wait(), SETTLE_TIME)
+            except asyncio.TimeoutError:
+                pass
+            return table.best(preferred)  # type: ignore
+
+        probe_task = loop.create_task(probe())
+        try:
+            master = await asyncio.wait_for(choose(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            probe_task.cancel()
+        if master is not None and cache_file:
+            _write_cache(cache_file, master.host)
+        return master
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+def wait_for_core(timeout: Optional[float] = None, cache_file: str = CORE_CACHE,
+                  preferred: str = "") -> Optional[Master]:
+    '''Look for the core, returns None if it wasn't found within timeout'''
+    return asyncio.run(discover_core(timeout, cache_file, preferred))
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+#
+
+"""Tests for discovery.py"""
+
+import asyncio
+import socket
+
+import pytest
+
+import discovery
+from discovery import Advertisement, MasterTable
+
+
+def test_advert_round_trip():
+    """Every field survives encoding and older masters are understood"""
+    advert = Advertisement("pool-b", clock_port=9999, broker_port=1884, priority=2,
+                           load=150, uptime=3600, ttl=30)
+    assert discovery.decode_advert(discovery.encode_advert(advert)) == advert
+    assert discovery.decode_advert(b"Hello") == Advertisement()
+    assert discovery.decode_advert(b"Query") is None
+    assert discovery.decode_advert(discovery.encode_advert(advert)[:-1]) is None
+    # Fields added by a later version are skipped
+    newer = bytearray(discovery.encode_advert(advert))
+    newer[4] = 2
+    assert discovery.decode_advert(bytes(newer) + b"\x01\x02") == advert
+
+
+def test_master_table():
+    """Masters expire and the preferred or least loaded one is chosen"""
+    now = [100.0]
+    table = MasterTable(clock=lambda: now[0])
+    table.update("10.0.0.1", Advertisement("a", load=200, ttl=10))
+    table.update("10.0.0.2", Advertisement("b", load=50, ttl=20))
+    table.update("10.0.0.3", Advertisement("standby", load=0, priority=1, ttl=10))
+    assert table.best().host == "10.0.0.2"
+    assert table.best("a").host == "10.0.0.1"
+    now[0] = 115.0
+    assert [m.advert.master_id for m in table.masters()] == ["b"]
+    assert table.best("a").host == "10.0.0.2"
+    now[0] = 121.0
+    assert table.best() is None
+
+
+def test_discover_answering_master(tmp_path):
+    """A query to the cached address is answered"""
+    responder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    responder.bind(("127.0.0.1", discovery.QUERY_PORT))
+    responder.setblocking(False)
+    advert = discovery.encode_advert(Advertisement("test", broker_port=1999))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        def answer():
+            try:
+                data, addr = responder.recvfrom(2048)
+            except BlockingIOError:
+                return
+            if data == discovery.QUERY:
+                responder.sendto(advert, addr)
+        loop.add_reader(responder.fileno(), answer)
+        try:
+            return await discovery.discover_core(2, str(tmp_path / "core"))
+        finally:
+            loop.remove_reader(responder.fileno())
+
+    cache = tmp_path / "core"
+    cache.write_text("127.0.0.1")
+    try:
+        master = asyncio.run(run())
+    finally:
+        responder.close()
+    assert master.advert.master_id == "test"
+    assert master.advert.broker_port == 1999
+    assert cache.read_text() == master.host
+
+
+def test_discover_closes_sockets(monkeypatch):
+    """Nothing is left open when the query socket can't be bound"""
+    opened = []
+    class _Socket(socket.socket):
+        # pylint: disable=too-few-public-methods
+        def __init__(self, *args):
+            super().__init__(*args)
+            opened.append(self)
+
+        def bind(self, address):
+            if address[1] == 0:
+                raise OSError("no ports")
+            super().bind(address)
+
+    monkeypatch.setattr(discovery.socket, "socket", _Socket)
+    with pytest.raises(OSError):
+        asyncio.run(discovery.discover_core(1, ""))
+    # Ignoring the event loop's own sockets
+    udp = [sock for sock in opened if sock.type == socket.SOCK_DGRAM]
+    assert len(udp) == 2
+    assert all(sock.fileno() == -1 for sock in udp)
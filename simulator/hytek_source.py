@@ -0,0 +1,306 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Read start lists straight from a Hy-Tek Meet Manager database
+
+The database (.mdb) is read with the pure-Python access_parser package if it
+is installed, otherwise with the mdb-export tool from mdbtools. Heats and
+lanes are built the same way Meet Manager exports them for a CTS scoreboard,
+so a reseed shows up without going through an export.
+
+Query results are cached per table. Every data page in an Access database
+records which table owns it, so when the file changes the pages are hashed per
+table and only the tables whose pages changed are read again.
+"""
+
+import csv
+import hashlib
+import io
+import os
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import startlists
+from startlist_loader import FileKey, file_key
+
+try:
+    from access_parser import AccessParser  #type: ignore
+except ImportError:
+    AccessParser = None
+
+Row = Dict[str, Any]
+
+# Tables (and the columns we use) needed to build the start lists
+_TABLES = {
+    "Event": ["Event_ptr", "Event_no", "Event_ltr", "Ind_rel", "Event_sex",
+              "Event_dist", "Event_stroke", "Low_age", "High_Age"],
+    "Entry": ["Event_ptr", "Ath_no", "Scr_stat", "Pre_heat", "Pre_lane",
+              "Sem_heat", "Sem_lane", "Fin_heat", "Fin_lane"],
+    "Relay": ["Event_ptr", "Team_no", "Team_ltr", "Scr_stat", "Pre_heat", "Pre_lane",
+              "Sem_heat", "Sem_lane", "Fin_heat", "Fin_lane"],
+    "Athlete": ["Ath_no", "Last_name", "First_name", "Team_no"],
+    "Team": ["Team_no", "Team_abbr"],
+    "Session": ["Sess_ptr", "Sess_no"],
+    "Sessitem": ["Sess_ptr", "Event_ptr", "Sess_rnd"],
+}
+
+_SEX = {"W": "WOMEN", "M": "MEN", "F": "GIRLS", "B": "BOYS", "X": "MIXED"}
+_STROKE = {"A": "FREE", "B": "BACK", "C": "BREAST", "D": "FLY", "E": "IM"}
+# Heat/lane columns for each round of an event
+_ROUND = {"P": ("Pre_heat", "Pre_lane"), "S": ("Sem_heat", "Sem_lane"),
+          "F": ("Fin_heat", "Fin_lane")}
+# Field widths used by the CTS export
+_NAME_WIDTH = 20
+_TEAM_WIDTH = 16
+# "open" age range, not shown in the description
+_MAX_AGE = 109
+
+
+class _AccessParserReader:
+    '''Read tables with access_parser'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, filename: str):
+        self._db = AccessParser(filename)
+
+    def table_pages(self) -> Dict[str, int]:
+        '''Table definition page of each table'''
+        return dict(self._db.catalog)
+
+    def read(self, table: str) -> List[Row]:
+        '''All rows of a table'''
+        columns = self._db.parse_table(table)
+        names = [c for c in _TABLES[table] if c in columns]
+        count = len(columns[names[0]]) if names else 0
+        return [{c: columns[c][i] for c in names} for i in range(count)]
+
+
+class _MdbToolsReader:
+    '''Read tables with mdb-export from mdbtools'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, filename: str):
+        self._filename = filename
+
+    @staticmethod
+    def table_pages() -> Dict[str, int]:
+        '''Table pages aren't available, so every table is always re-read'''
+        return {}
+
+    def read(self, table: str) -> List[Row]:
+        '''All rows of a table'''
+        output = subprocess.run(["mdb-export", self._filename, table], check=True,
+                                capture_output=True, text=True).stdout
+        rows = []
+        for rec in csv.DictReader(io.StringIO(output)):
+            rows.append({c: _convert(rec.get(c, "")) for c in _TABLES[table]})
+        return rows
+
+
+def _convert(value: str) -> Any:
+    '''mdb-export gives text; turn numbers back into numbers'''
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def table_digests(filename: str, table_pages: Dict[str, int]) -> Dict[str, str]:
+    '''
+    Fingerprint each table by hashing the pages it owns
+
+    Jet data pages (type 0x01) hold the page number of their table
+    definition at offset 4, so the pages can be grouped without parsing them.
+    '''
+    with open(filename, "rb") as file:
+        data = file.read()
+    page_size = 2048 if data[0x14] == 0 else 4096
+    owners = {page: table for table, page in table_pages.items()}
+    digests = {table: hashlib.blake2b(digest_size=16) for table in table_pages}
+    for offset in range(0, len(data) - page_size + 1, page_size):
+        page = data[offset:offset + page_size]
+        if page[0] == 0x01:
+            owner = int.from_bytes(page[4:8], "little")
+        elif page[0] == 0x02:
+            owner = offset // page_size
+        else:
+            continue
+        table = owners.get(owner)
+        if table is not None:
+            digests[table].update(page)
+    return {table: digest.hexdigest() for table, digest in digests.items()}
+
+
+def event_description(event: Row) -> str:
+    '''
+    The CTS style description of an event
+
+    >>> event_description({"Event_sex": "W", "Low_age": 0, "High_Age": 109,
+    ...     "Event_dist": 200.0, "Event_stroke": "E", "Ind_rel": "R"})
+    'WOMEN 200 MEDLEY RELAY'
+    >>> event_description({"Event_sex": "B", "Low_age": 0, "High_Age": 10,
+    ...     "Event_dist": 50.0, "Event_stroke": "D", "Ind_rel": "I"})
+    'BOYS 10&U 50 FLY'
+    '''
+    parts = [_SEX.get(str(event["Event_sex"]).strip(), "")]
+    low, high = int(event["Low_age"] or 0), int(event["High_Age"] or _MAX_AGE)
+    if low > 0 and high >= _MAX_AGE:
+        parts.append(f"{low}&O")
+    elif low == 0 and high < _MAX_AGE:
+        parts.append(f"{high}&U")
+    elif low > 0:
+        parts.append(f"{low}-{high}")
+    parts.append(str(int(event["Event_dist"])))
+    relay = str(event["Ind_rel"]).strip() == "R"
+    stroke = str(event["Event_stroke"]).strip()
+    parts.append("MEDLEY" if relay and stroke == "E" else _STROKE.get(stroke, ""))
+    if relay:
+        parts.append("RELAY")
+    return " ".join(p for p in parts if p)
+
+
+class HyTekSource(startlists.StartListSource):
+    '''
+    A Hy-Tek Meet Manager database
+
+    Parameters:
+        filename: The meet database (.mdb)
+        session: Session number to load (0 for every session)
+    '''
+    def __init__(self, filename: str, session: int = 0):
+        if AccessParser is None and not _have_mdbtools():
+            raise startlists.FileParseError(filename, "Reading a Meet Manager database "
+                                            "requires access_parser or mdbtools")
+        self._filename = filename
+        self._session = session
+        self._key: Optional[FileKey] = None
+        self._digests: Dict[str, str] = {}
+        self._tables: Dict[str, List[Row]] = {}
+        self._events: Dict[str, startlists.Event] = {}
+
+    def _refresh(self) -> bool:
+        '''Re-read the tables that changed, returns True if any did'''
+        key = file_key(os.stat(self._filename))
+        if key == self._key:
+            return False
+        self._key = key
+        try:
+            reader: Any = _AccessParserReader(self._filename) if AccessParser is not None \
+                else _MdbToolsReader(self._filename)
+            digests = table_digests(self._filename, reader.table_pages())
+            stale = [t for t in _TABLES
+                     if t not in self._tables or digests.get(t, "") == ""
+                     or digests[t] != self._digests.get(t)]
+            for table in stale:
+                self._tables[table] = reader.read(table)
+        except (OSError, KeyError, ValueError, IndexError,
+                subprocess.CalledProcessError) as err:
+            # Meet Manager may be in the middle of writing, try again later
+            self._key = None
+            raise startlists.FileParseError(self._filename, str(err)) from err
+        self._digests = digests
+        return bool(stale)
+
+    def _build(self) -> Dict[str, startlists.Event]:
+        '''Build the events from the cached tables'''
+        tables = self._tables
+        teams = {t["Team_no"]: str(t["Team_abbr"] or "").strip() for t in tables["Team"]}
+        athletes = {}
+        for ath in tables["Athlete"]:
+            name = f"{str(ath['Last_name'] or '').strip()}, {str(ath['First_name'] or '').strip()}"
+            athletes[ath["Ath_no"]] = (name.upper()[:_NAME_WIDTH],
+                                       teams.get(ath["Team_no"], "")[:_TEAM_WIDTH])
+        sessions = {s["Sess_ptr"]: s["Sess_no"] for s in tables["Session"]}
+        rounds: Dict[Any, str] = {}
+        for item in tables["Sessitem"]:
+            if self._session in (0, sessions.get(item["Sess_ptr"])):
+                rounds[item["Event_ptr"]] = str(item["Sess_rnd"] or "F").strip() or "F"
+
+        # Event_ptr -> heat -> lane -> (name, team)
+        seeded: Dict[Any, Dict[int, Dict[int, Tuple[str, str]]]] = {}
+        def seed(row: Row, entry: Tuple[str, str]) -> None:
+            rnd = rounds.get(row["Event_ptr"])
+            if rnd is None or row["Scr_stat"] in (True, 1, "1"):
+                return
+            heat_col, lane_col = _ROUND.get(rnd, _ROUND["F"])
+            heat, lane = int(row[heat_col] or 0), int(row[lane_col] or 0)
+            if heat > 0 and 0 < lane <= 10:
+                seeded.setdefault(row["Event_ptr"], {}).setdefault(heat, {})[lane] = entry
+        for row in tables["Entry"]:
+            seed(row, athletes.get(row["Ath_no"], ("", "")))
+        for row in tables["Relay"]:
+            team = teams.get(row["Team_no"], "")
+            seed(row, (f"{team} {str(row['Team_ltr'] or '').strip()}"[:_NAME_WIDTH],
+                       team[:_TEAM_WIDTH]))
+
+        events = {}
+        for row in tables["Event"]:
+            heats = seeded.get(row["Event_ptr"])
+            if not heats:
+                continue
+            code = f"{row['Event_no']}{str(row['Event_ltr'] or '').strip()}"
+            desc = event_description(row)
+            event = startlists.Event(event=code, event_desc=desc, num_heats=max(heats),
+                                     filename=f"{self._filename}#{row['Event_ptr']}")
+            event.heats = []
+            for heat_num in range(1, max(heats) + 1):
+                lanes = [startlists.EMPTY_LANE] * 10
+                for lane, (name, team) in heats.get(heat_num, {}).items():
+                    lanes[lane - 1] = startlists.Lane(name=name, team=team)
+                event.heats.append(startlists.Heat(event=code, event_desc=desc,
+                                                   heat=heat_num, lanes=lanes))
+            events[event.filename] = event
+        return events
+
+    def load(self) -> List[startlists.Event]:
+        self._key = None
+        self._refresh()
+        self._events = self._build()
+        return sorted(self._events.values(),
+                      key=lambda e: startlists.event_sort_key(e.event))
+
+    def poll(self) -> Optional[startlists.StartListChanges]:
+        try:
+            if not self._refresh():
+                return None
+        except startlists.FileParseError:
+            return None
+        events = self._build()
+        changed = [e for f, e in events.items()
+                   if f not in self._events or _signature(self._events[f]) != _signature(e)]
+        removed = [f for f in self._events if f not in events]
+        self._events = events
+        if changed or removed:
+            return startlists.StartListChanges(changed, removed)
+        return None
+
+
+def _signature(event: startlists.Event) -> Tuple:
+    return (event.event, event.event_desc,
+            tuple(tuple((l.name, l.team) for l in h.lanes) for h in event.heats))
+
+
+def _have_mdbtools() -> bool:
+    try:
+        subprocess.run(["mdb-export", "--version"], check=False, capture_output=True)
+    except OSError:
+        return False
+    return True
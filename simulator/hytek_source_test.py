@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+#
+
+"""Tests for hytek_source.py"""
+
+import os
+
+import pytest
+
+import hytek_source
+import startlist_loader
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "..", "hytek-sample")
+
+
+def test_event_description():
+    """Descriptions match the CTS export"""
+    event = {"Event_sex": "M", "Low_age": 0, "High_Age": 109,
+             "Event_dist": 1500.0, "Event_stroke": "A", "Ind_rel": "I"}
+    assert hytek_source.event_description(event) == "MEN 1500 FREE"
+    event.update(Low_age=11, High_Age=12, Event_stroke="E")
+    assert hytek_source.event_description(event) == "MEN 11-12 1500 IM"
+    event.update(Low_age=13, High_Age=109, Event_sex="F", Event_stroke="C")
+    assert hytek_source.event_description(event) == "GIRLS 13&O 1500 BREAST"
+
+
+def test_matches_scb_export():
+    """The database gives the same start lists as Meet Manager's export"""
+    pytest.importorskip("access_parser")
+    source = hytek_source.HyTekSource(os.path.join(SAMPLE, "SwimDemoMeet-HyTek.mdb"), 2)
+    events = source.load()
+    exported = startlist_loader.load_cts_startlists(os.path.join(SAMPLE, "SCB_Session2"))
+    assert [e.event for e in events] == [e.event for e in exported]
+    for db_evt, scb_evt in zip(events, exported):
+        assert db_evt.event_desc == scb_evt.event_desc
+        assert [[(l.name, l.team) for l in h.lanes] for h in db_evt.heats] == \
+               [[(l.name, l.team) for l in h.lanes] for h in scb_evt.heats]
+    assert source.poll() is None
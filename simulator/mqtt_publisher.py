@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Publishing to the core's MQTT broker
+
+The Publisher connects in the background and, if the broker goes away,
+reconnects with a growing delay (paho's own backoff). Messages published
+while disconnected are held in a bounded queue, oldest dropped first, and
+sent in order once the broker is back; paho itself only keeps QoS 1 and 2
+messages across a reconnect.
+
+Each topic is published at the QoS of the longest matching prefix in qos, so
+starts can be acknowledged while the clock summaries are not. The time from
+publishing to the broker's acknowledgement (for QoS 0, to the message being
+written to the socket) is kept for ack_latency().
+"""
+
+import collections
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Union
+
+try:
+    import paho.mqtt.client as mqtt  #type: ignore
+except ImportError:
+    mqtt = None
+
+# Messages held while disconnected
+QUEUE_SIZE = 100
+# Acknowledgement latencies kept
+LATENCY_SAMPLES = 1000
+# Messages waiting for an acknowledgement that are timed, oldest forgotten first
+PENDING_ACKS = 1000
+# Seconds between reconnection attempts, doubling up to the max
+RECONNECT_MIN = 1
+RECONNECT_MAX = 30
+# paho's MQTT_ERR_SUCCESS and MQTT_ERR_NO_CONN
+_ERR_SUCCESS = 0
+_ERR_NO_CONN = 4
+
+Payload = Union[str, bytes]
+
+
+class PublisherError(Exception):
+    """Exception for a publisher that can't be created."""
+
+
+class Queued(NamedTuple):
+    '''What publish() returns for a message held until the broker is back'''
+    mid: Optional[int] = None
+    rc: int = _ERR_NO_CONN
+
+
+class Publisher:
+    '''
+    A connection to the broker that survives the broker going away
+
+    Parameters:
+        host, port: The broker
+        username, password: Credentials, none if username is empty
+        client_id: The MQTT client id
+        qos: Topic prefix -> QoS; topics that match none are sent at QoS 0
+        queue_size: Messages held while disconnected
+        client: The paho client to use instead of creating one
+    '''
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 client_id: str = "", qos: Optional[Mapping[str, int]] = None,
+                 queue_size: int = QUEUE_SIZE, client: Any = None):
+        if client is None:
+            if mqtt is None:
+                raise PublisherError("Publishing requires paho-mqtt")
+            client = mqtt.Client(client_id)
+        self._client = client
+        self._host = host
+        self._port = port
+        if username:
+            client.username_pw_set(username=username, password=password)
+        client.reconnect_delay_set(min_delay=RECONNECT_MIN, max_delay=RECONNECT_MAX)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        # Longest prefix first
+        self._qos = sorted((qos or {}).items(), key=lambda item: -len(item[0]))
+        self._connected = False
+        self._queue: "collections.deque[tuple]" = collections.deque(maxlen=queue_size)
+        self.dropped = 0
+        # Never held while calling the client, whose callbacks take their own locks
+        self._lock = threading.Lock()
+        # mid -> time (perf_counter_ns) published, or acknowledged if that came first
+        self._sent: Dict[int, int] = {}
+        self._acked: Dict[int, int] = {}
+        self._latency: "collections.deque[int]" = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._ack_lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        '''Connected to the broker, with nothing left to replay'''
+        return self._connected
+
+    def start(self) -> None:
+        '''Connect in the background'''
+        self._client.connect_async(self._host, self._port)
+        self._client.loop_start()
+
+    def stop(self) -> None:
+        '''Disconnect, anything still queued is dropped'''
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def qos(self, topic: str) -> int:
+        '''The QoS topic is published at'''
+        for prefix, qos in self._qos:
+            if topic.startswith(prefix):
+                return qos
+        return 0
+
+    def publish(self, topic: str, payload: Payload, retain: bool = False,
+                qos: Optional[int] = None):
+        '''
+        Publish now, or once the broker is back
+
+        Returns paho's MQTTMessageInfo, or Queued (with no mid) if the message
+        is waiting for the broker.
+        '''
+        if qos is None:
+            qos = self.qos(topic)
+        message = (topic, payload, qos, retain)
+        with self._lock:
+            if not self._connected:
+                self._enqueue(message)
+                return Queued()
+        info = self._send(message)
+        # paho keeps QoS 1 and 2 messages for the reconnect itself
+        if info.rc == _ERR_NO_CONN and qos == 0:
+            with self._lock:
+                self._enqueue(message)
+            return Queued()
+        return info
+
+    def ack_latency(self) -> Dict[str, float]:
+        '''p50/p99/max of the acknowledgement latency (microseconds), {} before any'''
+        with self._ack_lock:
+            ordered = sorted(self._latency)
+        if not ordered:
+            return {}
+        def pick(fraction: float) -> float:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] / 1000
+        return {"count": len(ordered), "p50_us": pick(0.50), "p99_us": pick(0.99),
+                "max_us": ordered[-1] / 1000}
+
+    def _enqueue(self, message: tuple) -> None:
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+            logging.warning("MQTT broker unavailable, dropped message for %s",
+                            self._queue[0][0])
+        self._queue.append(message)
+
+    def _send(self, message: tuple):
+        topic, payload, qos, retain = message
+        sent = time.perf_counter_ns()
+        info = self._client.publish(topic, payload, qos=qos, retain=retain)
+        if info.rc == _ERR_SUCCESS:
+            with self._ack_lock:
+                acked = self._acked.pop(info.mid, None)
+                if acked is None:
+                    self._sent[info.mid] = sent
+                    if len(self._sent) > PENDING_ACKS:
+                        del self._sent[next(iter(self._sent))]
+                else:
+                    self._latency.append(acked - sent)
+        return info
+
+    def _on_connect(self, _client, _userdata, _flags, rc) -> None:
+        if rc != 0:
+            logging.warning("MQTT broker %s:%d refused the connection (%d)",
+                            self._host, self._port, rc)
+            return
+        logging.info("MQTT connected to %s:%d", self._host, self._port)
+        replayed = 0
+        # Anything published meanwhile is queued behind, so order is kept
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._connected = True
+                    break
+                message = self._queue.popleft()
+            self._send(message)
+            replayed += 1
+        if replayed:
+            logging.info("MQTT sent %d queued messages", replayed)
+
+    def _on_disconnect(self, _client, _userdata, rc) -> None:
+        with self._lock:
+            self._connected = False
+        # Messages lost with the connection are never acknowledged, and paho
+        # may reuse their mids
+        with self._ack_lock:
+            self._sent.clear()
+            self._acked.clear()
+        if rc != 0:
+            logging.warning("MQTT connection lost (%d), reconnecting", rc)
+
+    def _on_publish(self, _client, _userdata, mid) -> None:
+        acked = time.perf_counter_ns()
+        with self._ack_lock:
+            sent = self._sent.pop(mid, None)
+            if sent is None:
+                # Acknowledged before publish() returned
+                self._acked[mid] = acked
+            else:
+                self._latency.append(acked - sent)
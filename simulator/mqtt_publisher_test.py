@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+#
+
+"""Tests for mqtt_publisher.py"""
+
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+import mqtt_publisher
+
+
+class _Info:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, mid, rc):
+        self.mid = mid
+        self.rc = rc
+
+
+class _Client:
+    '''Records what would have been sent, connected or not'''
+    def __init__(self):
+        self.connected = False
+        self.sent = []
+        self.mid = 0
+        self.on_connect = self.on_disconnect = self.on_publish = None
+
+    def username_pw_set(self, username, password):
+        self.credentials = (username, password)
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        pass
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.mid += 1
+        if not self.connected:
+            return _Info(self.mid, 4)
+        self.sent.append((topic, payload, qos, retain))
+        # Acknowledged before publish returns, like a QoS 0 message
+        self.on_publish(self, None, self.mid)
+        return _Info(self.mid, 0)
+
+    def up(self):
+        self.connected = True
+        self.on_connect(self, None, {}, 0)
+
+    def down(self):
+        self.connected = False
+        self.on_disconnect(self, None, 1)
+
+
+def test_queue_and_replay():
+    """Messages published while down are sent in order once the broker is back"""
+    client = _Client()
+    publisher = mqtt_publisher.Publisher("core", 1883, "swimcam", "swimming",
+                                         qos={"swimcam/": 1, "swimcam/clock/": 0},
+                                         queue_size=3, client=client)
+    assert client.credentials == ("swimcam", "swimming")
+    assert publisher.qos("swimcam/race/start") == 1
+    assert publisher.qos("swimcam/clock/starter") == 0
+    assert publisher.qos("other") == 0
+    for i in range(4):
+        assert publisher.publish("swimcam/race/start", str(i), retain=True).mid is None
+    assert publisher.dropped == 1
+    assert publisher.ack_latency() == {}
+    client.up()
+    assert publisher.connected
+    assert client.sent == [("swimcam/race/start", str(i), 1, True) for i in (1, 2, 3)]
+    assert publisher.publish("swimcam/clock/starter", "{}").mid == 4
+    assert client.sent[-1] == ("swimcam/clock/starter", "{}", 0, False)
+    assert publisher.ack_latency()["count"] == 4
+    # Lost before the client noticed: only QoS 0 needs queueing here
+    client.connected = False
+    assert publisher.publish("swimcam/clock/starter", "lost").mid is None
+    assert publisher.publish("swimcam/race/start", "kept by paho").mid is not None
+    client.down()
+    client.up()
+    assert client.sent[-1] == ("swimcam/clock/starter", "lost", 0, False)
+
+
+def test_unacknowledged_forgotten():
+    """Messages that are never acknowledged aren't timed for ever"""
+    client = _Client()
+    publisher = mqtt_publisher.Publisher("core", 1883, client=client)
+    client.up()
+    # A broker that stopped acknowledging
+    client.on_publish = lambda *_: None
+    for _ in range(mqtt_publisher.PENDING_ACKS + 10):
+        publisher.publish("swimcam/race/start", "lost")
+    assert len(publisher._sent) == mqtt_publisher.PENDING_ACKS  # pylint: disable=protected-access
+    client.down()
+    assert not publisher._sent  # pylint: disable=protected-access
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _mosquitto(path: str, port: int) -> subprocess.Popen:
+    broker = subprocess.Popen([path, "-p", str(port)], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    return broker
+
+
+def test_mosquitto_restart():
+    """Messages published while the broker restarts are delivered"""
+    mqtt = pytest.importorskip("paho.mqtt.client")
+    mosquitto = shutil.which("mosquitto")
+    if mosquitto is None:
+        pytest.skip("mosquitto is not installed")
+    port = _free_port()
+    received = {}
+    got_all = threading.Event()
+    def on_message(_client, _userdata, message):
+        received[message.topic] = message.payload
+        if len(received) == 3:
+            got_all.set()
+    broker = _mosquitto(mosquitto, port)
+    publisher = mqtt_publisher.Publisher("127.0.0.1", port, client_id="test-starter",
+                                         qos={"swimcam/": 1})
+    camera = mqtt.Client("test-camera")
+    # The restarted broker has forgotten the subscription
+    camera.on_connect = lambda client, *_: client.subscribe("swimcam/#", qos=1)
+    camera.on_message = on_message
+    try:
+        publisher.start()
+        camera.connect("127.0.0.1", port)
+        camera.loop_start()
+        publisher.publish("swimcam/one", b"1", retain=True)
+        time.sleep(0.5)
+        broker.terminate()
+        broker.wait()
+        publisher.publish("swimcam/two", b"2", retain=True)
+        publisher.publish("swimcam/three", b"3", retain=True)
+        broker = _mosquitto(mosquitto, port)
+        assert got_all.wait(mqtt_publisher.RECONNECT_MAX)
+        assert received == {"swimcam/one": b"1", "swimcam/two": b"2", "swimcam/three": b"3"}
+        assert publisher.ack_latency()["count"] >= 1
+    finally:
+        camera.loop_stop()
+        publisher.stop()
+        broker.terminate()
+        broker.wait()
@@ -0,0 +1,398 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Race journal
+
+Every START and RESET the starter sends is appended to a binary journal,
+with the heat it was for, the network clock offset and the MQTT message id.
+Records are written as they happen and synced to disk in batches, at most
+SYNC_INTERVAL seconds apart, so the starter never waits on the disk. A record
+left half written by a crash is detected by its checksum and dropped the
+next time the journal is opened.
+
+List or replay a session with:
+
+    python3 race_journal.py list <journal> [--event 18A] [--heat 2]
+    python3 race_journal.py replay <journal> [--speed 10] [--retime] [--legacy]
+                                             [--host localhost]
+
+Replay publishes the heats and starts as the starter did, with the same time
+between them (or speed times faster, 0 for no waiting).
+
+Layout (little endian):
+    header    magic, version
+    records   length and CRC-32 of the body, then the body:
+                  kind, flags, recorded (wall clock ns), start time (ns on the
+                  core's clock), clock offset (ns), MQTT message id, heat id,
+                  heat number, lane count
+                  event, description, (name, team) for each lane
+              strings are a length followed by UTF-8
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import start_message
+import startlists
+
+# The starter's journal, in the directory it is run from
+JOURNAL_NAME = "races.swj"
+# Most seconds between a record being written and it being on disk
+SYNC_INTERVAL = 0.5
+
+START = 1
+RESET = 2
+
+_MAGIC = b"SWRJ"
+_VERSION = 1
+_FLAG_PROVISIONAL = 0x01
+# magic, version
+_HEADER = struct.Struct("<4sH")
+# length, crc32 of the body
+_FRAME = struct.Struct("<II")
+# kind, flags, recorded, time, offset, mid, heat id, heat, lane count
+_BODY = struct.Struct("<BBqqqiIHB")
+_STRING = struct.Struct("<H")
+_MAX_STRING = 0xFFFF
+
+
+class JournalError(Exception):
+    """Exception for a file that isn't a race journal."""
+
+
+class JournalRecord(NamedTuple):
+    '''A START or RESET and the heat it was for'''
+    kind: int
+    # When it was recorded, wall clock ns
+    recorded: int
+    # ns on the core's clock, 0 for a RESET
+    time: int
+    provisional: bool
+    # core clock - local real time clock (ns), 0 before the clock synchronised
+    offset: int
+    # -1 if the message was queued for the broker
+    mid: int
+    heat_id: int
+    heat: startlists.Heat
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8")[:_MAX_STRING]
+    return _STRING.pack(len(data)) + data
+
+
+def encode_record(record: JournalRecord) -> bytes:
+    '''A record as written to the journal'''
+    heat = record.heat
+    parts = [_BODY.pack(record.kind, _FLAG_PROVISIONAL if record.provisional else 0,
+                        record.recorded, record.time, record.offset, record.mid,
+                        record.heat_id, heat.heat, len(heat.lanes)),
+             _string(heat.event), _string(heat.event_desc)]
+    for lane in heat.lanes:
+        parts += [_string(lane.name), _string(lane.team)]
+    body = b"".join(parts)
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def _decode_body(body: bytes) -> JournalRecord:
+    kind, flags, recorded, stamp, offset, mid, heat_id, heat_num, count = \
+        _BODY.unpack_from(body)
+    pos = _BODY.size
+    strings = []
+    for _ in range(2 + 2 * count):
+        length, = _STRING.unpack_from(body, pos)
+        pos += _STRING.size
+        strings.append(str(body[pos:pos + length], "utf-8", errors="replace"))
+        pos += length
+    lanes = [startlists.Lane(name=strings[i], team=strings[i + 1]) if strings[i]
+             else startlists.EMPTY_LANE for i in range(2, len(strings), 2)]
+    heat = startlists.Heat(event=strings[0], event_desc=strings[1], heat=heat_num, lanes=lanes)
+    return JournalRecord(kind, recorded, stamp, bool(flags & _FLAG_PROVISIONAL), offset, mid,
+                         heat_id, heat)
+
+
+def _frames(data) -> Iterator[Tuple[int, int]]:
+    '''(offset, end) of every intact record in a journal's contents'''
+    if len(data) < _HEADER.size:
+        raise JournalError("Not a race journal")
+    magic, version = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise JournalError("Not a race journal")
+    pos = _HEADER.size
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        end = pos + _FRAME.size + length
+        if end > len(data) or zlib.crc32(data[pos + _FRAME.size:end]) != crc:
+            return
+        yield pos, end
+        pos = end
+
+
+class RaceJournal:
+    '''
+    Appends records to a journal, creating it if needed
+
+    Parameters:
+        path: The journal file
+        sync_interval: Most seconds between a record being written and synced
+    '''
+    def __init__(self, path: str, sync_interval: float = SYNC_INTERVAL):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                os.write(self._fd, _HEADER.pack(_MAGIC, _VERSION))
+                self._end = _HEADER.size
+            else:
+                self._end = _HEADER.size
+                for _, self._end in _frames(os.pread(self._fd, size, 0)):
+                    pass
+                if self._end < size:
+                    logging.warning("Race journal %s: dropping %d bytes of a damaged record",
+                                    path, size - self._end)
+                    os.ftruncate(self._fd, self._end)
+            os.lseek(self._fd, self._end, os.SEEK_SET)
+        except (OSError, JournalError):
+            os.close(self._fd)
+            raise
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._sync_interval = sync_interval
+        self._stopped = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_loop, name="journal-sync",
+                                        daemon=True)
+        self._syncer.start()
+
+    def append(self, record: JournalRecord) -> int:
+        '''Write a record, returns its offset'''
+        data = encode_record(record)
+        with self._lock:
+            offset = self._end
+            os.write(self._fd, data)
+            self._end += len(data)
+            self._dirty = True
+        return offset
+
+    # pylint: disable=too-many-arguments
+    def record_start(self, stamp: int, provisional: bool, heat: startlists.Heat,
+                     heat_id: int, offset: int, mid: Optional[int]) -> int:
+        '''Record a START'''
+        return self.append(JournalRecord(START, time.time_ns(), stamp, provisional, offset,
+                                         -1 if mid is None else mid, heat_id, heat))
+
+    def record_reset(self, heat: startlists.Heat, heat_id: int, offset: int,
+                     mid: Optional[int]) -> int:
+        '''Record a RESET, with the heat shown at the time'''
+        return self.append(JournalRecord(RESET, time.time_ns(), 0, False, offset,
+                                         -1 if mid is None else mid, heat_id, heat))
+
+    def sync(self) -> None:
+        '''Make sure everything written is on disk'''
+        with self._lock:
+            dirty, self._dirty = self._dirty, False
+        # Not holding the lock, so appends don't wait on the disk
+        if dirty:
+            os.fsync(self._fd)
+
+    def _sync_loop(self) -> None:
+        while not self._stopped.wait(self._sync_interval):
+            self.sync()
+
+    def close(self) -> None:
+        '''Sync and close the journal'''
+        self._stopped.set()
+        self._syncer.join()
+        self.sync()
+        os.close(self._fd)
+
+
+class JournalIndex:
+    '''
+    The records of a journal, by event and heat
+
+    The journal is memory mapped and a record is only decoded when read.
+    '''
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as err:
+                raise JournalError("Not a race journal") from err
+        self._frames: Dict[int, int] = {}
+        # (event code as SessionIndex.normalize() has it, heat) -> offsets
+        self.heats: Dict[Tuple[str, int], List[int]] = {}
+        # Only the heat number and event are needed to index a record
+        for offset, end in _frames(self._map):
+            self._frames[offset] = end
+            body = offset + _FRAME.size
+            heat_num = _BODY.unpack_from(self._map, body)[7]
+            length, = _STRING.unpack_from(self._map, body + _BODY.size)
+            start = body + _BODY.size + _STRING.size
+            event = str(self._map[start:start + length], "utf-8")
+            self.heats.setdefault((startlists.SessionIndex.normalize(event), heat_num),
+                                  []).append(offset)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def read(self, offset: int) -> JournalRecord:
+        '''The record at offset'''
+        return _decode_body(self._map[offset + _FRAME.size:self._frames[offset]])
+
+    def records(self) -> Iterator[JournalRecord]:
+        '''Every record, in the order recorded'''
+        for offset in self._frames:
+            yield self.read(offset)
+
+    def find(self, event: str, heat: Optional[int] = None) -> List[JournalRecord]:
+        '''
+        The records of an event, or one heat of it, in the order recorded
+
+        The event is matched as a start list lookup is, so "018" and "18a"
+        find event "18A".
+        '''
+        event = startlists.SessionIndex.normalize(event)
+        if heat is not None:
+            return [self.read(offset) for offset in self.heats.get((event, heat), [])]
+        offsets = sorted(offset for (evt, _), offsets in self.heats.items() if evt == event
+                         for offset in offsets)
+        return [self.read(offset) for offset in offsets]
+
+    def close(self) -> None:
+        '''Unmap the journal'''
+        self._map.close()
+
+
+def replay(records: Iterable[JournalRecord], publish: Callable[..., Any], speed: float = 1.0,
+           retime: bool = False, legacy: bool = False,
+           sleep: Callable[[float], None] = time.sleep) -> int:
+    '''
+    Publish records as the starter did, returns how many were published
+
+    Parameters:
+        records: What to publish, in order
+        publish: Called with (topic, payload, retain)
+        speed: How much faster than recorded to go, 0 for no waiting
+        retime: Move start times to when they are replayed (keeping how long
+            before being recorded they were taken), so a camera sees them as
+            current
+        legacy: Also publish the text messages
+    '''
+    stager = start_message.HeatStager(publish)
+    first: Optional[int] = None
+    began = 0.0
+    count = 0
+    for record in records:
+        if first is None:
+            first, began = record.recorded, time.monotonic()
+        elif speed > 0:
+            wait = began + (record.recorded - first) / 1e9 / speed - time.monotonic()
+            if wait > 0:
+                sleep(wait)
+        if record.kind == START:
+            stamp = record.time
+            if retime:
+                stamp += time.time_ns() - record.recorded
+            heat_id = stager.stage(record.heat)
+            publish(start_message.RACE_TOPIC,
+                    start_message.encode_start(stamp, heat_id, record.provisional), retain=True)
+            if legacy:
+                publish(start_message.START_TOPIC,
+                        start_message.start_text(stamp, start_message.heat_text(record.heat)),
+                        retain=True)
+        else:
+            publish(start_message.RACE_TOPIC, start_message.encode_reset(), retain=True)
+            if legacy:
+                publish(start_message.START_TOPIC, start_message.RESET, retain=True)
+        count += 1
+    return count
+
+
+def _describe(record: JournalRecord) -> str:
+    recorded = datetime.fromtimestamp(record.recorded / 1e9).strftime('%Y-%m-%d %H:%M:%S.%f')
+    heat = f"event {record.heat.event} heat {record.heat.heat}"
+    if record.kind == RESET:
+        return f"{recorded}  RESET  ({heat})  mid {record.mid}"
+    flag = " provisional" if record.provisional else ""
+    return (f"{recorded}  START  {heat}  time {record.time}{flag}  "
+            f"offset {record.offset / 1e6:.3f} ms  mid {record.mid}")
+
+
+def main():
+    '''List or replay a journal'''
+    parser = argparse.ArgumentParser(description="List or replay a race journal")
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument("journal", nargs="?", default=JOURNAL_NAME, help="The journal")
+    parser.add_argument("--event", default="", help="Only this event")
+    parser.add_argument("--heat", type=int, help="Only this heat of the event")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay this many times faster, 0 for no waiting")
+    parser.add_argument("--retime", action="store_true",
+                        help="Move start times to when they are replayed")
+    parser.add_argument("--legacy", action="store_true", help="Also send the text messages")
+    parser.add_argument("--host", default="localhost", help="MQTT broker")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--username", default="swimcam", help="MQTT user")
+    parser.add_argument("--password", default="swimming", help="MQTT password")
+    args = parser.parse_args()
+    if args.heat is not None and not args.event:
+        parser.error("--heat requires --event")
+
+    try:
+        index = JournalIndex(args.journal)
+    except (OSError, JournalError) as err:
+        raise SystemExit(f"{args.journal}: {err}")
+    records = index.find(args.event, args.heat) if args.event else list(index.records())
+    if args.command == "list":
+        for record in records:
+            print(_describe(record))
+        return
+
+    from mqtt_publisher import Publisher  # pylint: disable=import-outside-toplevel
+    publisher = Publisher(args.host, args.port, args.username, args.password,
+                          "swimcam-journal-replay", qos={"swimcam/": 1})
+    publisher.start()
+    for _ in range(100):
+        if publisher.connected:
+            break
+        time.sleep(0.1)
+    else:
+        raise SystemExit(f"Unable to connect to the broker at {args.host}:{args.port}")
+    sent = []
+    def publish(topic, payload, retain=False):
+        sent.append(publisher.publish(topic, payload, retain=retain))
+    try:
+        count = replay(records, publish, args.speed, args.retime, args.legacy)
+        # Acknowledged in order, so the last one means all of them
+        if sent and hasattr(sent[-1], "wait_for_publish"):
+            sent[-1].wait_for_publish()
+    finally:
+        publisher.stop()
+    print(f"Replayed {count} of {len(index)} records")
+
+if __name__ == "__main__":
+    main()
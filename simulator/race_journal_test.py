@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+#
+
+"""Tests for race_journal.py"""
+
+import pytest
+
+import race_journal
+import start_message
+import startlists
+
+
+def _heat(event: str, heat: int) -> startlists.Heat:
+    lanes = [startlists.EMPTY_LANE] * 10
+    lanes[heat] = startlists.Lane(name=f"SWIMMER, HEAT {heat}", team="TÉAM")
+    return startlists.Heat(event=event, event_desc="GIRLS 50 FREE", heat=heat, lanes=lanes)
+
+
+def _session(path) -> None:
+    journal = race_journal.RaceJournal(str(path))
+    journal.record_start(1_000_000_000, True, _heat("1", 1), 7, 0, None)
+    journal.record_start(3_000_000_000, False, _heat("1", 2), 8, -250_000, 12)
+    journal.record_reset(_heat("1", 2), 8, -250_000, 13)
+    journal.record_start(9_000_000_000, False, _heat("2", 1), 9, -250_000, 14)
+    journal.close()
+
+
+def test_journal_round_trip(tmp_path):
+    """Records come back as written, looked up by event and heat"""
+    path = tmp_path / "races.swj"
+    _session(path)
+    index = race_journal.JournalIndex(str(path))
+    assert len(index) == 4
+    first = next(index.records())
+    assert (first.kind, first.time, first.provisional, first.mid, first.heat_id) == \
+        (race_journal.START, 1_000_000_000, True, -1, 7)
+    assert first.heat.lanes[1].name == "SWIMMER, HEAT 1"
+    assert first.heat.lanes[0] is startlists.EMPTY_LANE
+    heat = index.find("1", 2)
+    assert [(r.kind, r.offset, r.mid) for r in heat] == \
+        [(race_journal.START, -250_000, 12), (race_journal.RESET, -250_000, 13)]
+    assert [r.heat.heat for r in index.find("1")] == [1, 2, 2]
+    assert index.find("3") == []
+    assert [r.heat.heat for r in index.find(" 01", 2)] == [2, 2]
+    index.close()
+
+
+def test_find_event_code(tmp_path):
+    """Events are found however their code is written"""
+    path = tmp_path / "races.swj"
+    journal = race_journal.RaceJournal(str(path))
+    journal.record_start(1_000_000_000, False, _heat("18A", 3), 7, 0, 1)
+    journal.close()
+    index = race_journal.JournalIndex(str(path))
+    for event in ("18A", "018A", "18a", " 018a"):
+        assert [r.heat.event for r in index.find(event, 3)] == ["18A"], event
+    assert len(index.find("018a")) == 1
+    assert index.find("018") == []
+    index.close()
+
+
+def test_journal_damaged(tmp_path):
+    """A record torn by a crash is dropped and appending carries on after it"""
+    path = tmp_path / "races.swj"
+    _session(path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+    assert len(race_journal.JournalIndex(str(path))) == 3
+    journal = race_journal.RaceJournal(str(path))
+    journal.record_reset(_heat("2", 1), 9, 0, 15)
+    journal.close()
+    index = race_journal.JournalIndex(str(path))
+    assert [r.kind for r in index.records()] == [race_journal.START] * 2 + [race_journal.RESET] * 2
+    path.write_bytes(b"not a journal")
+    with pytest.raises(race_journal.JournalError):
+        race_journal.RaceJournal(str(path))
+    (tmp_path / "empty.swj").touch()
+    with pytest.raises(race_journal.JournalError):
+        race_journal.JournalIndex(str(tmp_path / "empty.swj"))
+
+
+def test_replay(tmp_path):
+    """Heats and starts are published with the recorded gaps, scaled by speed"""
+    path = tmp_path / "races.swj"
+    _session(path)
+    index = race_journal.JournalIndex(str(path))
+    records = list(index.records())
+    # Spread the session out
+    records = [r._replace(recorded=r.recorded + i * 10_000_000_000)
+               for i, r in enumerate(records)]
+    sent = []
+    waits = []
+    count = race_journal.replay(records, lambda topic, payload, retain: sent.append(
+        (topic, payload)), speed=10, legacy=True, sleep=waits.append)
+    assert count == 4
+    assert [round(w) for w in waits] == [1, 2, 3]
+    starts = [start_message.decode(payload) for topic, payload in sent
+              if topic == start_message.RACE_TOPIC]
+    assert starts[1] == start_message.StartMessage(3_000_000_000, starts[1].heat_id)
+    assert starts[2] == start_message.ResetMessage()
+    heats = [start_message.decode(payload) for topic, payload in sent
+             if topic == start_message.HEAT_TOPIC]
+    assert [(h.event, h.heat) for h in heats] == [("1", 1), ("1", 2), ("2", 1)]
+    assert heats[1].heat_id == starts[1].heat_id
+    assert ("swimcam/start", start_message.RESET) in sent
+    index.close()
@@ -58,7 +58,29 @@ class _StartList(ttk.LabelFrame):   # pylint: disable=too-many-ancestors
         btn1.grid(column=0, row=0)
         ToolTip(btn1, text="Select the directory containing start list files "
                 "that have been exported from Meet Manager")   # pylint: disable=C0330
-        # row 2: status line
+        # row 2: Meet Manager database (used instead of the directory if set)
+        fr2 = ttk.Frame(self)
+        fr2.grid(column=0, row=2, sticky="news")
+        fr2.rowconfigure(0, weight=1)
+        fr2.columnconfigure(3, weight=1)
+        ttk.Label(fr2, text="Meet Manager database:").grid(column=0, row=0, sticky="ws")
+        db_text = os.path.basename(self._config.get_str("start_list_db"))
+        self._db_btn = ttk.Button(fr2, text=db_text[0:20] if db_text else "-None-",
+                                  command=self._handle_db_browse)
+        self._db_btn.grid(column=1, row=0, sticky="news")
+        ToolTip(self._db_btn, text="Read start lists directly from a Meet Manager "
+                "database (.mdb) instead of exported files")   # pylint: disable=C0330
+        db_clear_btn = ttk.Button(fr2, text="Clear", command=self._handle_db_clear)
+        db_clear_btn.grid(column=2, row=0, sticky="news")
+        ToolTip(db_clear_btn, text="Use the start list directory instead of a database")
+        ttk.Label(fr2, text="Session:").grid(column=3, row=0, sticky="es")
+        self._session_var = StringVar(fr2, value=str(self._config.get_int("start_list_session")))
+        self._session_var.trace_add("write", self._handle_session_spin)
+        session_spin = ttk.Spinbox(fr2, from_=0, to=99, increment=1, width=3,
+                                   textvariable=self._session_var)
+        session_spin.grid(column=4, row=0, sticky="news")
+        ToolTip(session_spin, text="Meet Manager session to load (0 for all sessions)")
+        # row 3: status line
         lbl2 = ttk.Label(self, textvariable=self._starter_status, borderwidth=2,
                          relief="sunken", padding=2)
         lbl2.grid(column=0, row=3, sticky="news")
@@ -73,6 +95,26 @@ class _StartList(ttk.LabelFrame):   # pylint: disable=too-many-ancestors
         self._scb_directory.set(directory)
 #        self._csv_status.set("") # clear status line if we change directory
 
+    def _handle_db_browse(self) -> None:
+        database = filedialog.askopenfilename(filetypes=[("Meet Manager database", "*.mdb")])
+        if len(database) == 0:
+            return
+        database = os.path.normpath(database)
+        self._config.set_str("start_list_db", database)
+        self._db_btn.configure(text=os.path.basename(database)[0:20])
+
+    def _handle_db_clear(self) -> None:
+        self._config.set_str("start_list_db", "")
+        self._db_btn.configure(text="-None-")
+
+    def _handle_session_spin(self, *_arg):
+        try:
+            value = int(self._session_var.get())
+            if 0 <= value <= 99:
+                self._config.set_int("start_list_session", value)
+        except ValueError:
+            pass
+
 class _GeneralSettings(ttk.LabelFrame):  # pylint: disable=too-many-ancestors,too-many-instance-attributes
     '''Miscellaneous settings'''
     def __init__(self, container: tkContainer, config: StarterConfig):
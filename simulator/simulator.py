@@ -25,37 +25,32 @@ Based on orignal work:
 '''
 
 
-import os
-
 from tkinter import Tk
-from typing import List
-from PIL import Image, UnidentifiedImageError  #type: ignore
-from PIL.ImageEnhance import Brightness  #type: ignore
+from typing import List, Optional
+from PIL import UnidentifiedImageError  #type: ignore
 
 import swimcamutil
 import startlists
+from startlist_source import open_source
 import settings
 from config import StarterConfig
-from startlist_display import Starter
+from startlist_display import Starter, load_bg_image
 
 import gi
 gi.require_version('Gst', '1.0')
 gi.require_version('GstBase', '1.0')
 from gi.repository import GObject, Gst, GstBase, GLib
 
-def load_cts_startlists(directory: str) -> List[startlists.Event]:
+def open_startlists(options: StarterConfig) -> startlists.StartListSource:
     """
-    Load and pre-process all of the CTS formatted start lists
+    Open the configured start list source: the Meet Manager database if one
+    is set, otherwise the directory of CTS start lists
     """
-    files = os.scandir(directory)
-    events = []
-    for file in files:
-        if file.name.endswith(".scb"):
-            event = startlists.Event()
-            event.from_scb(file.path)
-            events.append(event)
-    events.sort(key=lambda e: e.event)
-    return events
+    if options.get_str("start_list_db") != "":
+        return open_source(options.get_str("start_list_db"),
+                           session=options.get_int("start_list_session"))
+    return open_source(options.get_str("start_list_dir"),
+                       options.get_str("start_list_cache"))
 
 def settings_window(root: Tk, options: StarterConfig) -> None:
     '''Display the settings window'''
@@ -67,8 +62,8 @@ def settings_window(root: Tk, options: StarterConfig) -> None:
     root.geometry("")  # allow automatic size
 
     def sb_run_cb():
-        event_list = load_cts_startlists(options.get_str("start_list_dir"))
-        board = starter_window(root, options, event_list)
+        source = open_startlists(options)
+        board = starter_window(root, options, source.load(), source)
 
     # TODO: Fix testing
     def sb_test_cb():
@@ -79,8 +74,9 @@ def settings_window(root: Tk, options: StarterConfig) -> None:
     content = settings.Settings(root, sb_run_cb, sb_test_cb, options)
     content.grid(column=0, row=0, sticky="news")
 
-def starter_window(root: Tk, options: StarterConfig, 
-                   events: List[startlists.Event]) -> Starter:
+def starter_window(root: Tk, options: StarterConfig,
+                   events: List[startlists.Event],
+                   source: Optional[startlists.StartListSource] = None) -> Starter:
     """Displays the starter simulator window."""
 
     if options.get_bool("fullscreen"):
@@ -90,14 +86,16 @@ def starter_window(root: Tk, options: StarterConfig,
     else:
         # Simulator is varible size
         root.resizable(True, True)
-    content = Starter(root, options, events)
+    content = Starter(root, options, events, source)
     content.grid(column=0, row=0, sticky="news")
-    # FIXME: Background images need fixing
     if options.get_str("image_bg") != "":
         try:
-            image = Image.open(options.get_str("image_bg"))
-            content.bg_image(Brightness(image).enhance(options.get_float("image_bright")),
-                            options.get_str("image_scale"))
+            max_size = None
+            if options.get_str("image_scale") != "none":
+                max_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+            image = load_bg_image(options.get_str("image_bg"), max_size)
+            content.startlist.bg_image(image, options.get_str("image_scale"),
+                                       options.get_float("image_bright"))
         except FileNotFoundError:
             pass
         except UnidentifiedImageError:
@@ -131,17 +129,22 @@ def starter_window(root: Tk, options: StarterConfig,
 def main():
     '''Runs the Starter Simulator'''
 
+    config = StarterConfig()
+
     print("Waiting for core...")
-    _core = swimcamutil.wait_for_core()
-    _coreHost, _corePort = _core
-    print("Core aquired (", _coreHost, ")")
+    _core = swimcamutil.wait_for_core(config.get_float("core_timeout"),
+                                      preferred=config.get_str("core_preferred"))
+    if _core is not None:
+        print("Core aquired (", _core.host, _core.advert.master_id, ")")
+        config.set_str("core_host", _core.host)
+        config.set_int("core_clock_port", _core.advert.clock_port)
+        config.set_int("core_broker_port", _core.advert.broker_port)
+    else:
+        print("Core not found, using", config.get_str("core_host"))
 
     Gst.init(None)
     root = Tk()
 
-    config = StarterConfig()
-    config.set_str("core_host", _coreHost)
-
     screen_size = f"{root.winfo_screenwidth()}x{root.winfo_screenheight()}"
 
     root.title("SwimCam Starter Simulator")
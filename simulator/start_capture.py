@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Capture starts from a physical start signal
+
+The capture thread waits on a start input and, the moment it fires, reads the
+clock before doing anything else. The start is then sent straight from the
+thread; everything else (logging, the display) is queued for the Tk thread.
+
+Start inputs:
+    GpioInput   an edge on a Raspberry Pi GPIO pin (needs RPi.GPIO)
+    FifoInput   anything written to a named pipe, for testing without a
+                start system, e.g.  echo > /tmp/swimcam-start
+"""
+
+import logging
+import os
+import queue
+import select
+import stat
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import RPi.GPIO as GPIO  #type: ignore
+except ImportError:
+    GPIO = None
+
+# Starts within this many seconds of the last are contact bounce, ignored
+HOLDOFF = 1.0
+
+
+class StartInputError(Exception):
+    """Exception for a start input that can't be used."""
+
+
+class StartInput(ABC):
+    '''A source of start signals'''
+
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        '''Wait up to timeout seconds for a start, returns True on a start'''
+
+    def close(self) -> None:
+        '''Release the input'''
+
+
+class GpioInput(StartInput):
+    '''
+    A start on the falling edge of a GPIO pin (BCM numbering)
+
+    The pin is pulled up, so the start system closes a contact to ground.
+    '''
+    def __init__(self, pin: int):
+        if GPIO is None:
+            raise StartInputError("A GPIO start input requires RPi.GPIO")
+        self._pin = pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+    def wait(self, timeout: float) -> bool:
+        return GPIO.wait_for_edge(self._pin, GPIO.FALLING,
+                                  timeout=max(1, int(timeout * 1000))) is not None
+
+    def close(self) -> None:
+        GPIO.cleanup(self._pin)
+
+
+class FifoInput(StartInput):
+    '''A start for every write to a named pipe, which is created if needed'''
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        elif not stat.S_ISFIFO(os.stat(path).st_mode):
+            raise StartInputError(f"{path} is not a named pipe")
+        # Opened for writing too so the pipe never reads as closed
+        self._fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            os.read(self._fd, 4096)
+        except BlockingIOError:
+            return False
+        return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def open_start_input(spec: str, gpio_pin: int) -> Optional[StartInput]:
+    '''
+    Open the start input named by spec
+
+    Parameters:
+        spec: "" for none, "gpio" for gpio_pin, otherwise the path of a pipe
+        gpio_pin: The GPIO pin the start system is wired to
+    '''
+    if spec == "":
+        return None
+    if spec.lower() == "gpio":
+        return GpioInput(gpio_pin)
+    return FifoInput(spec)
+
+
+class StartCapture(threading.Thread):
+    '''
+    Waits for starts on its own thread
+
+    Parameters:
+        start_input: Where starts come from
+        now: Reads the clock
+        send: Sends the start, called on the capture thread with the time;
+            returns whatever should be passed on with it
+        holdoff: Seconds after a start during which the input is ignored
+
+    Every start is queued on captured as (time, what send returned) for the
+    Tk thread to pick up. A start that send fails on is logged and dropped,
+    and capturing carries on.
+    '''
+
+    captured: "queue.Queue[Tuple[Any, Any]]"
+
+    def __init__(self, start_input: StartInput, now: Callable[[], Any],
+                 send: Callable[[Any], Any], holdoff: float = HOLDOFF):
+        super().__init__(name="start-capture", daemon=True)
+        self._input = start_input
+        self._now = now
+        self._send = send
+        self._holdoff = holdoff
+        self._stopped = threading.Event()
+        self.captured = queue.Queue()
+
+    def run(self) -> None:
+        try:
+            while not self._stopped.is_set():
+                if not self._input.wait(0.25):
+                    continue
+                stamp = self._now()
+                try:
+                    self.captured.put((stamp, self._send(stamp)))
+                except Exception:  # pylint: disable=broad-except
+                    # The next start must still be captured
+                    logging.exception("Unable to send the start captured at %r", stamp)
+                # Ignore contact bounce (or a second press)
+                if self._stopped.wait(self._holdoff):
+                    break
+                while self._input.wait(0):
+                    pass
+        finally:
+            self._input.close()
+
+    def stop(self) -> None:
+        '''Ask the capture thread to exit'''
+        self._stopped.set()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+#
+
+"""Tests for start_capture.py"""
+
+import os
+
+import pytest
+
+import start_capture
+
+
+def test_fifo_start(tmp_path):
+    """A write to the pipe is timestamped before it is sent, bounce is ignored"""
+    path = str(tmp_path / "start")
+    events = []
+    capture = start_capture.StartCapture(
+        start_capture.open_start_input(path, 13),
+        now=lambda: events.append("now") or len(events),
+        send=lambda stamp: events.append(("send", stamp)) or "sent",
+        holdoff=0.2)
+    capture.start()
+    try:
+        with open(path, "w") as pipe:
+            pipe.write("\n")
+            pipe.flush()
+            assert capture.captured.get(timeout=2) == (1, "sent")
+            # Bounce within the holdoff
+            pipe.write("\n")
+            pipe.flush()
+            capture.join(0.5)
+            assert capture.captured.empty()
+            pipe.write("\n")
+            pipe.flush()
+            assert capture.captured.get(timeout=2) == (3, "sent")
+    finally:
+        capture.stop()
+        capture.join(2)
+    assert events == ["now", ("send", 1), "now", ("send", 3)]
+    assert not capture.is_alive()
+
+
+def test_send_failure_keeps_capturing(tmp_path, caplog):
+    """A start that can't be sent is logged and the next one still captured"""
+    path = str(tmp_path / "start")
+    stamps = iter(range(1, 10))
+    def send(stamp):
+        if stamp == 1:
+            raise ValueError("bad payload")
+        return "sent"
+    capture = start_capture.StartCapture(start_capture.open_start_input(path, 13),
+                                         now=lambda: next(stamps), send=send, holdoff=0)
+    capture.start()
+    try:
+        with open(path, "w") as pipe:
+            pipe.write("\n")
+            pipe.flush()
+            capture.join(0.5)
+            assert capture.is_alive()
+            assert capture.captured.empty()
+            pipe.write("\n")
+            pipe.flush()
+            assert capture.captured.get(timeout=2) == (2, "sent")
+    finally:
+        capture.stop()
+        capture.join(2)
+    assert "Unable to send the start captured at 1" in caplog.text
+
+
+def test_not_a_pipe(tmp_path):
+    """A regular file can't be used as a start input"""
+    path = tmp_path / "start"
+    path.write_text("")
+    with pytest.raises(start_capture.StartInputError):
+        start_capture.FifoInput(str(path))
+    assert start_capture.open_start_input("", 13) is None
+    assert os.path.exists(str(path))
@@ -0,0 +1,315 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+'''
+Start latency benchmark
+
+Runs the starter's start path headless, thousands of times, and reports the
+p50/p99 latency of each stage. The path is the simulator's own: a
+StartSender publishing through a Publisher (its lock, queue and QoS).
+
+    show        staging the heat on screen (done on navigation)
+    capture     reading the clock (the first thing a start does)
+    send        StartSender.send: encoding and publishing the start
+    receipt     from sending to a subscriber (a camera) receiving the start
+    total       from capture to receipt
+
+Heats are taken from the sample start lists. Run against a local mosquitto
+(with the swimcam user) or, without one, an in-process stand-in broker that
+hands messages to the subscriber on another thread:
+
+    python3 start_latency_bench.py [--host localhost] [-n 5000] [--format text]
+                                   [--qos 1] [-o results.json]
+
+Every topic is published under BENCH_PREFIX so a benchmark can't start the
+cameras. Results are written as JSON to track regressions.
+'''
+
+import argparse
+import json
+import os
+import platform
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+import start_message
+import startlists
+from mqtt_publisher import Publisher
+from start_sender import StartSender
+from startlist_loader import load_cts_startlists
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "hytek-sample",
+                       "SCB_Session2")
+STAGES = ["show", "capture", "send", "receipt", "total"]
+# Prefixed to every topic so a benchmark can't start the cameras
+BENCH_PREFIX = "bench/"
+
+
+class _Stamp(NamedTuple):
+    '''A start time, like swimcamutil.Timestamp (which needs gi)'''
+    time: int
+    provisional: bool
+
+
+class _Info:
+    '''What publish() returns, like paho's MQTTMessageInfo'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, mid: int, rc: int = 0):
+        self.mid = mid
+        self.rc = rc
+
+
+class _Message:
+    '''A received message, like paho's MQTTMessage'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+        self.retain = False
+
+
+class InProcessBroker:
+    '''
+    Stand-in for a broker and the paho clients on either side of it
+
+    The starter's side is a paho client as far as Publisher is concerned.
+    publish() hands the message to a dispatcher thread which acknowledges it
+    and calls the subscriber's on_message, so receipt includes a thread hop
+    like the network client's.
+    '''
+    def __init__(self):
+        # The starter's client, set by Publisher
+        self.on_connect: Optional[Callable[..., None]] = None
+        self.on_disconnect: Optional[Callable[..., None]] = None
+        self.on_publish: Optional[Callable[..., None]] = None
+        # The camera
+        self.on_message: Optional[Callable[[Any, Any, Any], None]] = None
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._mid = 0
+        self._mid_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def _dispatch(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            mid, message = item
+            if self.on_publish is not None:
+                self.on_publish(self, None, mid)
+            if self.on_message is not None:
+                self.on_message(None, None, message)
+
+    def username_pw_set(self, username: str, password: str) -> None:
+        '''Nothing to authenticate'''
+
+    def reconnect_delay_set(self, min_delay: int, max_delay: int) -> None:
+        '''Never disconnects'''
+
+    def connect_async(self, host: str, port: int) -> None:
+        '''Connected by loop_start()'''
+
+    def loop_start(self) -> None:
+        '''Connect'''
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self) -> None:
+        '''Nothing to stop until close()'''
+
+    def disconnect(self) -> None:
+        '''Disconnect the starter's client'''
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, None, 0)
+
+    def publish(self, topic: str, payload: Union[str, bytes], qos: int = 0,
+                retain: bool = False) -> _Info:
+        '''Queue a message for the subscriber'''
+        # pylint: disable=unused-argument
+        with self._mid_lock:
+            self._mid += 1
+            mid = self._mid
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._queue.put((mid, _Message(topic, payload)))
+        return _Info(mid)
+
+    def close(self) -> None:
+        '''Stop the dispatcher'''
+        self._queue.put(None)
+        self._thread.join()
+
+
+class _Camera:
+    '''A subscriber to the benchmark's topics on a real broker'''
+    def __init__(self, host: str, port: int):
+        import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+        self.on_message: Optional[Callable[[Any, Any, Any], None]] = None
+        subscribed = threading.Event()
+        self._client = mqtt.Client("swimcam-bench-camera")
+        self._client.username_pw_set(username="swimcam", password="swimming")
+        self._client.on_message = lambda c, u, m: self.on_message and self.on_message(c, u, m)
+        self._client.on_subscribe = lambda *_: subscribed.set()
+        self._client.connect(host, port)
+        self._client.subscribe(BENCH_PREFIX + "#")
+        self._client.loop_start()
+        if not subscribed.wait(5):
+            raise TimeoutError(f"No subscription from the broker at {host}:{port}")
+
+    def close(self) -> None:
+        '''Disconnect'''
+        self._client.loop_stop()
+        self._client.disconnect()
+
+
+def _clock() -> Callable[[], int]:
+    '''The clock a start reads: GStreamer's if available'''
+    try:
+        import gi  # pylint: disable=import-outside-toplevel
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst  # pylint: disable=import-outside-toplevel
+        Gst.init(None)
+        return Gst.SystemClock.obtain().get_time
+    except (ImportError, ValueError):
+        return time.time_ns
+
+
+def _heats() -> List[startlists.Heat]:
+    try:
+        events = load_cts_startlists(SAMPLES)
+    except OSError:
+        events = []
+    heats = [heat for event in events for heat in event.heats]
+    if not heats:
+        lanes = [startlists.Lane(name=f"SWIMMER, LANE {i}", team=f"TEAM{i}") for i in range(10)]
+        heats = [startlists.Heat(event="1", event_desc="MIXED 50 FREE", heat=1, lanes=lanes)]
+    return heats
+
+
+def publisher(host: str, port: int, qos: int, client: Any = None) -> Publisher:
+    '''The starter's Publisher, with its QoS for starts and heats'''
+    return Publisher(host, port, "swimcam", "swimming", client_id="swimcam-bench-starter",
+                     qos={BENCH_PREFIX + start_message.RACE_TOPIC: qos,
+                          BENCH_PREFIX + start_message.START_TOPIC: qos,
+                          BENCH_PREFIX + start_message.HEAT_TOPIC: qos,
+                          BENCH_PREFIX + start_message.LANE_TOPIC: qos},
+                     client=client)
+
+
+def percentiles(samples: List[int]) -> Dict[str, float]:
+    '''p50/p99/mean/max of samples (ns), in microseconds'''
+    ordered = sorted(samples)
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] / 1000
+    return {"p50_us": pick(0.50), "p99_us": pick(0.99),
+            "mean_us": round(sum(ordered) / len(ordered) / 1000, 3), "max_us": ordered[-1] / 1000}
+
+
+def run(connection: Publisher, camera, starts: int, interval: float = 0.0,
+        fmt: str = "binary") -> Dict[str, Any]:
+    '''
+    Send starts through connection, returns the latencies of each stage
+
+    camera is the subscriber, whose on_message is set to time the starts.
+    '''
+    now = _clock()
+    heats = _heats()
+    # The text start is sent after the binary one, so time that
+    topic = BENCH_PREFIX + (start_message.START_TOPIC if fmt == "text"
+                            else start_message.RACE_TOPIC)
+    received: "queue.Queue[int]" = queue.Queue()
+    def on_message(_client, _userdata, message) -> None:
+        # Retained starts from an earlier run arrive as the camera subscribes
+        if message.topic == topic and not message.retain:
+            received.put(time.perf_counter_ns())
+    camera.on_message = on_message
+    def publish(topic: str, payload: Union[str, bytes], retain: bool = False):
+        return connection.publish(BENCH_PREFIX + topic, payload, retain)
+    sender = StartSender(publish, None, legacy=fmt == "text")
+    timings: Dict[str, List[int]] = {stage: [] for stage in STAGES}
+    for i in range(starts):
+        t_show = time.perf_counter_ns()
+        sender.show(heats[i % len(heats)])
+        t_start = time.perf_counter_ns()
+        stamp = _Stamp(now(), False)
+        t_captured = time.perf_counter_ns()
+        sender.send(stamp)
+        t_sent = time.perf_counter_ns()
+        t_received = received.get(timeout=5)
+        timings["show"].append(t_start - t_show)
+        timings["capture"].append(t_captured - t_start)
+        timings["send"].append(t_sent - t_captured)
+        timings["receipt"].append(t_received - t_captured)
+        timings["total"].append(t_received - t_start)
+        if interval:
+            time.sleep(interval)
+    results = {stage: percentiles(samples) for stage, samples in timings.items()}
+    results["ack"] = connection.ack_latency()
+    return results
+
+
+def main():
+    '''Run the benchmark and write the results'''
+    parser = argparse.ArgumentParser(description="Start latency benchmark")
+    parser.add_argument("--host", default="",
+                        help="MQTT broker to use (default: in-process stand-in)")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("-n", "--starts", type=int, default=5000, help="Number of starts")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="Seconds between starts")
+    parser.add_argument("--format", choices=["binary", "text"], default="binary",
+                        help="Start message format (text also sends the binary start)")
+    parser.add_argument("--qos", type=int, choices=[0, 1, 2], default=1,
+                        help="MQTT QoS of starts and heats")
+    parser.add_argument("-o", "--output", default="", help="JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.host:
+        camera = _Camera(args.host, args.port)
+        connection = publisher(args.host, args.port, args.qos)
+    else:
+        camera = InProcessBroker()
+        connection = publisher("in-process", 0, args.qos, client=camera)
+    connection.start()
+    try:
+        stages = run(connection, camera, args.starts, args.interval, args.format)
+    finally:
+        connection.stop()
+        camera.close()
+    results = {
+        "benchmark": "start_latency",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "broker": f"{args.host}:{args.port}" if args.host else "in-process",
+        "starts": args.starts,
+        "format": args.format,
+        "qos": args.qos,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stages": stages,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
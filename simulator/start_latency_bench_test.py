@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+#
+
+"""Tests for start_latency_bench.py"""
+
+import start_latency_bench
+
+
+def test_bench_in_process():
+    """Starts go through the Publisher and reach the camera, acknowledged"""
+    broker = start_latency_bench.InProcessBroker()
+    connection = start_latency_bench.publisher("in-process", 0, 1, client=broker)
+    connection.start()
+    try:
+        assert connection.connected
+        results = start_latency_bench.run(connection, broker, 20, fmt="text")
+    finally:
+        connection.stop()
+        broker.close()
+    assert set(results) == set(start_latency_bench.STAGES) | {"ack"}
+    assert results["ack"]["count"] > 20
+    assert results["total"]["p50_us"] >= results["capture"]["p50_us"]
@@ -0,0 +1,326 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Start messages sent to the cameras
+
+Binary messages
+---------------
+Every message starts with a header (network byte order):
+
+    magic      "SC"
+    version    1
+    type       1 = START, 2 = RESET, 3 = LANE, 4 = HEAT
+    length     length of the body that follows
+
+The heat is staged as soon as the starter shows it, so the start itself only
+carries the time. Each heat shown gets a new heat id. On LANE_TOPIC + lane
+number (retained), only published when the lane changes:
+
+    LANE   lane       lane number
+           name       string, empty when the lane is empty
+           team       string
+
+then on HEAT_TOPIC (retained):
+
+    HEAT   heat_id    id of the heat, 32 bits, wrapping
+           heat       heat number
+           event      string
+           event_desc string
+
+and at the gun, on RACE_TOPIC (retained):
+
+    START  time       ns on the core's clock
+           flags      bit 0: the time is provisional (taken before clock sync)
+           heat_id    the heat started
+
+A RESET, also on RACE_TOPIC, has no body. A camera keeps the last HEAT and the
+lanes it shows, ready to render, and matches a START to them by heat id. The
+lanes are published before the HEAT, so they are current once it arrives.
+
+Strings are a length byte followed by up to 255 bytes of UTF-8. A later
+version may only add fields to the end of a body; the length lets an older
+decoder skip them. A message with a newer version is still decoded as far as
+this version understands it.
+
+Text messages (START_TOPIC)
+---------------------------
+The original format, still sent for cameras that haven't been updated:
+
+    START|<time>|Event: <event> Heat: <heat> <description>|<lane 1>|...|<lane 10>|
+
+where each lane is "<name> (<team>)", or " " when the lane is empty.
+"""
+
+import struct
+import threading
+import time as _time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from startlists import Heat
+
+START_TOPIC = "swimcam/start"
+RACE_TOPIC = "swimcam/race/start"
+HEAT_TOPIC = "swimcam/heat/info"
+LANE_TOPIC = "swimcam/heat/lane/"
+RESET = "RESET"
+
+VERSION = 1
+_MAGIC = b"SC"
+_START = 1
+_RESET = 2
+_LANE = 3
+_HEAT = 4
+_FLAG_PROVISIONAL = 0x01
+_HEADER = struct.Struct("!2sBBH")
+_START_BODY = struct.Struct("!QBI")
+_HEAT_ID = struct.Struct("!IH")
+_MAX_STRING = 255
+_MAX_HEAT_ID = 0xFFFFFFFF
+
+LaneEntry = Tuple[str, str]
+
+
+class MessageError(Exception):
+    """Exception for a message that can't be decoded."""
+
+
+class StartMessage(NamedTuple):
+    '''A start of the heat with heat_id at time'''
+    time: int
+    heat_id: int
+    provisional: bool = False
+
+
+class ResetMessage(NamedTuple):
+    '''Cameras go back to waiting for a start'''
+
+
+class LaneMessage(NamedTuple):
+    '''Who is in a lane, name and team are empty for an empty lane'''
+    lane: int
+    name: str
+    team: str
+
+
+class HeatMessage(NamedTuple):
+    '''The heat the next start will be for'''
+    heat_id: int
+    event: str
+    event_desc: str
+    heat: int
+
+
+class TextStartMessage(NamedTuple):
+    '''What a camera recovers from a text start message'''
+    time: int
+    heat_line: str
+    # lane number -> (name, team), lanes with a swimmer only
+    lanes: Dict[int, LaneEntry]
+
+    def lane(self, number: int) -> LaneEntry:
+        '''The (name, team) in lane number, ("", "") if empty'''
+        return self.lanes.get(number, ("", ""))
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) > _MAX_STRING:
+        # Don't leave half a character behind
+        data = data[:_MAX_STRING].decode("utf-8", errors="ignore").encode("utf-8")
+    return bytes((len(data),)) + data
+
+
+def _message(kind: int, body: bytes) -> bytes:
+    return _HEADER.pack(_MAGIC, VERSION, kind, len(body)) + body
+
+
+def heat_lanes(heat: Heat) -> Dict[int, LaneEntry]:
+    '''The lanes of heat with a swimmer, by lane number'''
+    return {i + 1: (lane.name, lane.team)
+            for i, lane in enumerate(heat.lanes) if not lane.is_empty()}
+
+
+def encode_heat(heat_id: int, heat: Heat) -> bytes:
+    '''A binary HEAT staging heat as heat_id'''
+    return _message(_HEAT, _HEAT_ID.pack(heat_id, heat.heat) +
+                    _string(heat.event) + _string(heat.event_desc))
+
+
+def encode_start(time: int, heat_id: int, provisional: bool = False) -> bytes:
+    '''A binary START at time for the heat staged as heat_id'''
+    return _message(_START, _START_BODY.pack(time, _FLAG_PROVISIONAL if provisional else 0,
+                                             heat_id))
+
+
+def encode_reset() -> bytes:
+    '''A binary RESET'''
+    return _message(_RESET, b"")
+
+
+def encode_lane(number: int, name: str = "", team: str = "") -> bytes:
+    '''A binary LANE, an empty lane if there's no name'''
+    return _message(_LANE, bytes((number,)) + _string(name) + _string(team))
+
+
+class HeatStager:
+    '''
+    Publishes each heat as it is shown, ahead of its start
+
+    Parameters:
+        publish: Called with (topic, payload, retain) for every message
+        first_id: The first heat id; by default taken from the time so ids
+            aren't reused when the starter restarts
+    '''
+    def __init__(self, publish: Callable[..., Any], first_id: Optional[int] = None):
+        self._publish = publish
+        self._next_id = int(_time.time()) if first_id is None else first_id
+        # lane number -> (name, team) last published
+        self._published: Dict[int, LaneEntry] = {}
+        self._staged: Optional[Tuple[Tuple, int]] = None
+        # The Tk and capture threads both stage heats
+        self._lock = threading.Lock()
+
+    def _update_lanes(self, heat: Heat) -> List[int]:
+        lanes = {number: (lane.name, lane.team) if not lane.is_empty() else ("", "")
+                 for number, lane in enumerate(heat.lanes, 1)}
+        changed = []
+        for number in sorted(lanes.keys() | self._published.keys()):
+            entry = lanes.get(number, ("", ""))
+            if self._published.get(number) != entry:
+                self._publish(LANE_TOPIC + str(number), encode_lane(number, *entry),
+                              retain=True)
+                self._published[number] = entry
+                changed.append(number)
+        return changed
+
+    def stage(self, heat: Heat) -> int:
+        '''
+        Publish heat, unless it is already staged, returns its heat id
+
+        Only the lanes that differ from the last heat are published.
+        '''
+        signature = (heat.event, heat.event_desc, heat.heat,
+                     tuple((lane.name, lane.team) for lane in heat.lanes))
+        with self._lock:
+            if self._staged is not None and self._staged[0] == signature:
+                return self._staged[1]
+            heat_id = self._next_id & _MAX_HEAT_ID
+            self._next_id = heat_id + 1
+            self._update_lanes(heat)
+            self._publish(HEAT_TOPIC, encode_heat(heat_id, heat), retain=True)
+            self._staged = (signature, heat_id)
+            return heat_id
+
+
+class _Reader:
+    '''Reads fields from a message body'''
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def unpack(self, fmt: struct.Struct) -> Tuple:
+        try:
+            fields = fmt.unpack_from(self._data, self._pos)
+        except struct.error as err:
+            raise MessageError("message truncated") from err
+        self._pos += fmt.size
+        return fields
+
+    def byte(self) -> int:
+        if self._pos >= len(self._data):
+            raise MessageError("message truncated")
+        self._pos += 1
+        return self._data[self._pos - 1]
+
+    def string(self) -> str:
+        length = self.byte()
+        data = self._data[self._pos:self._pos + length]
+        if len(data) != length:
+            raise MessageError("message truncated")
+        self._pos += length
+        return str(data, "utf-8", errors="replace")
+
+
+def decode(data: bytes) -> Union[StartMessage, ResetMessage, LaneMessage, HeatMessage]:
+    '''
+    Decode a binary message
+
+    >>> decode(encode_reset())
+    ResetMessage()
+    '''
+    try:
+        magic, version, kind, length = _HEADER.unpack_from(data)
+    except struct.error as err:
+        raise MessageError("message truncated") from err
+    if magic != _MAGIC or version < 1:
+        raise MessageError("not a start message")
+    body = data[_HEADER.size:_HEADER.size + length]
+    if len(body) != length:
+        raise MessageError("message truncated")
+    if kind == _RESET:
+        return ResetMessage()
+    reader = _Reader(body)
+    if kind == _START:
+        time, flags, heat_id = reader.unpack(_START_BODY)
+        return StartMessage(time, heat_id, bool(flags & _FLAG_PROVISIONAL))
+    if kind == _LANE:
+        return LaneMessage(reader.byte(), reader.string(), reader.string())
+    if kind == _HEAT:
+        heat_id, heat = reader.unpack(_HEAT_ID)
+        return HeatMessage(heat_id, reader.string(), reader.string(), heat)
+    raise MessageError(f"unknown message type {kind}")
+
+
+def heat_text(heat: Heat) -> str:
+    '''The event/heat/lanes part of a text start message'''
+    text = f"|Event: {heat.event} Heat: {heat.heat} {heat.event_desc}|"
+    for lane in heat.lanes[:10]:
+        if not lane.is_empty():
+            text += f"{lane.name} ({lane.team})|"
+        else:
+            text += " |"
+    return text
+
+
+def start_text(time: int, heat_info: str) -> str:
+    '''A text start message for heat_text() at time'''
+    return 'START|' + str(time) + heat_info
+
+
+def decode_text(text: str) -> Optional[TextStartMessage]:
+    '''
+    Decode a text start message the way the cameras do, None for a RESET
+
+    Only the time, the heat line and lanes that survive splitting on "|" can
+    be recovered; a "|" in a name shifts every following lane.
+    '''
+    parts = text.split("|")
+    if not parts[0].startswith("START"):
+        return None
+    try:
+        time = int(parts[1])
+    except (IndexError, ValueError) as err:
+        raise MessageError("invalid start time") from err
+    lanes = {}
+    if len(parts) == 14:
+        for number, lane in enumerate(parts[3:13], 1):
+            if lane.strip():
+                name, _, team = lane.rpartition(" (")
+                lanes[number] = (name, team.rstrip(")"))
+    return TextStartMessage(time, parts[2] if len(parts) > 2 else "", lanes)
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+#
+
+"""Tests for start_message.py"""
+
+import pytest
+
+import start_message
+import startlists
+
+
+def _heat() -> startlists.Heat:
+    lanes = [startlists.EMPTY_LANE] * 10
+    lanes[3] = startlists.Lane(name="PERSON, JUST A", team="TEAM")
+    lanes[9] = startlists.Lane(name="PIPE | NAME, SOME", team="TÉAM")
+    return startlists.Heat(event="18A", event_desc="BOYS 10&U 50 FLY", heat=2, lanes=lanes)
+
+
+def test_start_text():
+    """The message has the 14 fields the cameras expect"""
+    heat = _heat()
+    heat.lanes[9] = startlists.EMPTY_LANE
+    message = start_message.start_text(1234, start_message.heat_text(heat))
+    assert message == ("START|1234|Event: 18A Heat: 2 BOYS 10&U 50 FLY| | | |"
+                       "PERSON, JUST A (TEAM)| | | | | | |")
+    assert len(message.split("|")) == 14
+    decoded = start_message.decode_text(message)
+    assert decoded.time == 1234
+    assert decoded.lanes == {4: ("PERSON, JUST A", "TEAM")}
+    assert start_message.decode_text("RESET") is None
+
+
+def test_binary_round_trip():
+    """Every field survives encoding, names may contain anything"""
+    data = start_message.encode_start(1_612_345_678_901_234_567, 0xFFFFFFFF, provisional=True)
+    assert start_message.decode(data) == start_message.StartMessage(
+        1_612_345_678_901_234_567, 0xFFFFFFFF, True)
+    assert len(data) == 19
+    assert start_message.decode(start_message.encode_heat(7, _heat())) == \
+        start_message.HeatMessage(7, "18A", "BOYS 10&U 50 FLY", 2)
+    assert start_message.decode(start_message.encode_lane(10, "PIPE | NAME, SOME", "TÉAM")) == \
+        start_message.LaneMessage(10, "PIPE | NAME, SOME", "TÉAM")
+    assert start_message.decode(start_message.encode_reset()) == start_message.ResetMessage()
+
+
+def test_binary_versions():
+    """Newer versions are read as far as known, damaged messages are rejected"""
+    data = bytearray(start_message.encode_heat(5, _heat()))
+    # A later version appending a field
+    data[2] = start_message.VERSION + 1
+    data[5] += 3
+    assert start_message.decode(bytes(data) + b"new").heat_id == 5
+    for bad in (b"", b"XX\x01\x01\x00\x00", bytes(data[:-6]),
+                start_message.encode_start(5, 1)[:-1], b"SC\x01\x09\x00\x00"):
+        with pytest.raises(start_message.MessageError):
+            start_message.decode(bad)
+
+
+def test_heat_stager():
+    """A heat is published once, with only the lanes that changed"""
+    sent = []
+    stager = start_message.HeatStager(lambda topic, payload, retain: sent.append(
+        (topic, start_message.decode(payload), retain)), first_id=0xFFFFFFFF)
+    heat = _heat()
+    assert stager.stage(heat) == 0xFFFFFFFF
+    assert len(sent) == 11
+    assert sent[3] == ("swimcam/heat/lane/4",
+                       start_message.LaneMessage(4, "PERSON, JUST A", "TEAM"), True)
+    assert sent[0][1] == start_message.LaneMessage(1, "", "")
+    # The heat goes after its lanes
+    assert sent[-1] == ("swimcam/heat/info", start_message.HeatMessage(
+        0xFFFFFFFF, "18A", "BOYS 10&U 50 FLY", 2), True)
+    sent.clear()
+    assert stager.stage(_heat()) == 0xFFFFFFFF
+    assert not sent
+    heat.lanes[3] = startlists.EMPTY_LANE
+    heat.lanes[5] = startlists.Lane(name="NEW, SWIMMER", team="CLUB")
+    assert stager.stage(heat) == 0
+    assert [message for _, message, _ in sent] == [
+        start_message.LaneMessage(4, "", ""), start_message.LaneMessage(6, "NEW, SWIMMER", "CLUB"),
+        start_message.HeatMessage(0, "18A", "BOYS 10&U 50 FLY", 2)]
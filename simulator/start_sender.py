@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The starter's start path
+
+The heat on screen is staged as soon as it is shown, so sending a start only
+encodes the time and publishes it. A start taken before the network clock
+synchronised is provisional; it is kept and sent again, on the core's clock,
+once the clock has synchronised, as long as its heat is still on screen and
+no later start has gone out. Otherwise the cameras have moved on, and the
+corrected time is only kept for the log and journal.
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional, Tuple
+
+import start_message
+from startlists import Heat
+
+if TYPE_CHECKING:
+    from swimcamutil import Timestamp
+
+
+class SentStart(NamedTuple):
+    '''A start that has been published'''
+    stamp: "Timestamp"
+    heat: Heat
+    heat_id: int
+    # The text message, sent or not
+    text: str
+    # What publishing the START returned, None if it wasn't sent
+    info: Any
+
+
+class StartSender:
+    '''
+    Sends starts for the heat on screen
+
+    Parameters:
+        publish: Called with (topic, payload, retain)
+        clock: The CoreClock the starts are timed with
+        legacy: Also send the text messages
+    '''
+    _shown: Tuple[Heat, int, str]
+
+    def __init__(self, publish: Callable[..., Any], clock: Any, legacy: bool = True):
+        self._publish = publish
+        self._clock = clock
+        self._legacy = legacy
+        self._stager = start_message.HeatStager(publish)
+        # A start sent with a provisional time, sent again once the clock syncs
+        self._provisional: Optional[SentStart] = None
+        # The last start sent
+        self._last: Optional[SentStart] = None
+
+    def show(self, heat: Heat) -> int:
+        '''Stage the heat on screen, returns its heat id'''
+        # One assignment, so the capture thread never sees half an update
+        self._shown = (heat, self._stager.stage(heat), start_message.heat_text(heat))
+        return self._shown[1]
+
+    @property
+    def shown(self) -> Tuple[Heat, int]:
+        '''The heat on screen and its heat id'''
+        return self._shown[:2]
+
+    def send(self, stamp: "Timestamp", heat: Optional[Heat] = None) -> SentStart:
+        '''
+        Publish a start for the heat on screen, or for heat
+
+        Does nothing else so the start goes out as soon as possible, and may be
+        called on the capture thread.
+        '''
+        if heat is None:
+            heat, heat_id, ehl_text = self._shown
+        else:
+            heat_id, ehl_text = self._stager.stage(heat), start_message.heat_text(heat)
+        info = self._publish(start_message.RACE_TOPIC,
+                             start_message.encode_start(stamp.time, heat_id, stamp.provisional),
+                             retain=True)
+        text = start_message.start_text(stamp.time, ehl_text)
+        if self._legacy:
+            self._publish(start_message.START_TOPIC, text, retain=True)
+        self._last = SentStart(stamp, heat, heat_id, text, info)
+        return self._last
+
+    def reset(self) -> Any:
+        '''Publish a reset, returns what publishing it returned'''
+        self._provisional = self._last = None
+        info = self._publish(start_message.RACE_TOPIC, start_message.encode_reset(), retain=True)
+        if self._legacy:
+            self._publish(start_message.START_TOPIC, start_message.RESET, retain=True)
+        return info
+
+    def track(self, sent: SentStart) -> None:
+        '''Keep a provisional start to correct, replacing any earlier one'''
+        self._provisional = sent if sent.stamp.provisional else None
+
+    def correct(self) -> Optional[SentStart]:
+        '''
+        The provisional start on the core's clock, if there is one and the
+        clock has synchronised
+
+        It is sent again only while its heat is still on screen and it is the
+        last start sent; otherwise the cameras have moved on and the
+        correction is returned unsent, with no info.
+        '''
+        if self._provisional is None or not self._clock.synced:
+            return None
+        pending, self._provisional = self._provisional, None
+        stamp = self._clock.rebase(pending.stamp)
+        if pending is self._last and pending.heat_id == self._shown[1]:
+            return self.send(stamp)
+        return pending._replace(stamp=stamp, info=None)
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+#
+
+"""Tests for start_sender.py"""
+
+from typing import NamedTuple
+
+import start_message
+import startlists
+from start_sender import StartSender
+
+
+class _Stamp(NamedTuple):
+    time: int
+    provisional: bool
+
+
+class _Clock:
+    '''A CoreClock that synchronises when told, 1000 ns ahead of the local clock'''
+    synced = False
+
+    @staticmethod
+    def rebase(stamp: _Stamp) -> _Stamp:
+        return _Stamp(stamp.time + 1000, False) if stamp.provisional else stamp
+
+
+class _Cameras:
+    '''The retained messages, as a camera subscribing now would see them'''
+    def __init__(self):
+        self.retained = {}
+
+    def publish(self, topic, payload, retain=False):
+        assert retain
+        self.retained[topic] = payload
+        return topic
+
+    def message(self, topic):
+        return start_message.decode(self.retained[topic])
+
+
+def _heat(heat: int) -> startlists.Heat:
+    lanes = [startlists.EMPTY_LANE] * 10
+    lanes[heat] = startlists.Lane(name=f"SWIMMER, HEAT {heat}", team="TEAM")
+    return startlists.Heat(event="5", event_desc="BOYS 100 BACK", heat=heat, lanes=lanes)
+
+
+def test_provisional_start_corrected():
+    """A provisional start is sent again on the core's clock once it syncs"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock)
+    heat_id = sender.show(_heat(1))
+    sender.track(sender.send(_Stamp(5000, True)))
+    assert sender.correct() is None
+    clock.synced = True
+    corrected = sender.correct()
+    assert corrected.stamp == _Stamp(6000, False)
+    assert corrected.info == start_message.RACE_TOPIC
+    assert cameras.message(start_message.RACE_TOPIC) == start_message.StartMessage(6000, heat_id)
+    assert start_message.decode_text(cameras.retained[start_message.START_TOPIC]).time == 6000
+    assert sender.correct() is None
+
+
+def test_correction_after_next_heat_not_sent():
+    """Once the starter has moved on, the cameras keep the heat on screen"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock)
+    sender.show(_heat(1))
+    first = sender.send(_Stamp(5000, True))
+    sender.track(first)
+    retained = dict(cameras.retained)
+    # Next heat, then the clock syncs
+    second_id = sender.show(_heat(2))
+    clock.synced = True
+    corrected = sender.correct()
+    assert (corrected.stamp, corrected.heat_id, corrected.info) == \
+        (_Stamp(6000, False), first.heat_id, None)
+    assert sender.correct() is None
+    # Nothing about the earlier start was published again
+    assert cameras.retained[start_message.RACE_TOPIC] == retained[start_message.RACE_TOPIC]
+    assert cameras.retained[start_message.START_TOPIC] == retained[start_message.START_TOPIC]
+    assert cameras.message(start_message.HEAT_TOPIC).heat_id == second_id
+    start = sender.send(_Stamp(9000, False))
+    assert cameras.message(start_message.RACE_TOPIC).heat_id == second_id == start.heat_id
+
+
+def test_correction_after_later_start_not_sent():
+    """A start sent since, but not yet tracked, isn't overwritten"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock, legacy=False)
+    heat_id = sender.show(_heat(1))
+    sender.track(sender.send(_Stamp(5000, True)))
+    sender.send(_Stamp(7000, True))
+    clock.synced = True
+    assert sender.correct().info is None
+    assert cameras.message(start_message.RACE_TOPIC) == \
+        start_message.StartMessage(7000, heat_id, True)
+
+
+def test_provisional_start_tracked_after_sync():
+    """A start taken before sync but tracked after it is corrected at once"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock, legacy=False)
+    sender.show(_heat(1))
+    sent = sender.send(_Stamp(5000, True))
+    clock.synced = True
+    assert sender.correct() is None
+    sender.track(sent)
+    corrected = sender.correct()
+    assert corrected.stamp == _Stamp(6000, False)
+    assert corrected.heat == sent.heat
+    sender.track(corrected)
+    assert sender.correct() is None
+
+
+def test_tracked_after_sync_and_next_heat():
+    """A late report of an old heat's start doesn't send it again"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock, legacy=False)
+    sender.show(_heat(1))
+    sent = sender.send(_Stamp(5000, True))
+    sender.show(_heat(2))
+    clock.synced = True
+    sender.track(sent)
+    corrected = sender.correct()
+    assert (corrected.stamp, corrected.info) == (_Stamp(6000, False), None)
+    assert cameras.message(start_message.RACE_TOPIC).time == 5000
+
+
+def test_reset_drops_provisional_start():
+    """A reset means the provisional start is not sent again"""
+    cameras = _Cameras()
+    clock = _Clock()
+    sender = StartSender(cameras.publish, clock)
+    sender.show(_heat(1))
+    sender.track(sender.send(_Stamp(5000, True)))
+    assert start_message.decode_text(cameras.retained[start_message.START_TOPIC]).time == 5000
+    sender.reset()
+    clock.synced = True
+    assert sender.correct() is None
+    assert cameras.message(start_message.RACE_TOPIC) == start_message.ResetMessage()
+    assert cameras.retained[start_message.START_TOPIC] == start_message.RESET
@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Precompiled start list bundles
+
+A bundle is a single binary file holding every event of a start list
+directory. It can be copied to the master and every simulator and opened
+without parsing: the file is memory mapped and heats are read straight out of
+the mapping when they are accessed.
+
+The .scb files remain the source of truth. The bundle records a hash of the
+contents of every file it was built from and is ignored as soon as the
+directory no longer matches. A bundle copied on its own, to a directory
+without any .scb files, is used as is.
+
+Compile a directory with:
+
+    python3 startlist_bundle.py <start list directory> [-o bundle]
+
+Layout (little endian):
+    header    magic, version, section counts
+    sources   (path, blake2b digest) for every .scb file
+    events    (event, description, filename, first heat, heat count)
+    lanes     10 x (name, team) per heat
+    strings   offset table followed by the UTF-8 string data
+
+Every string is stored once and referenced by index; index 0 is "".
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Sequence, Union
+
+import startlists
+from startlist_loader import load_cts_startlists
+
+# Default name of the bundle within the start list directory
+BUNDLE_NAME = "startlists.scbb"
+
+_MAGIC = b"SCBB"
+_VERSION = 2
+_LANES = 10
+
+# magic, version, #sources, #events, #heats, #strings
+_HEADER = struct.Struct("<4sHIIII")
+# path, digest of the contents
+_DIGEST_SIZE = 16
+_SOURCE = struct.Struct(f"<I{_DIGEST_SIZE}s")
+# event, event_desc, filename, first heat, number of heats
+_EVENT = struct.Struct("<IIIII")
+# (name, team) for each lane of a heat
+_HEAT = struct.Struct("<" + "II" * _LANES)
+_OFFSET = struct.Struct("<I")
+
+
+class BundleError(Exception):
+    """Exception for a bundle that can't be used."""
+
+
+def _digest(path: str) -> bytes:
+    '''Hash of the contents of a file'''
+    with open(path, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=_DIGEST_SIZE).digest()
+
+
+class _StringTable:
+    '''Deduplicated strings, referenced by index'''
+    def __init__(self):
+        self.strings: List[str] = [""]
+        self._index: Dict[str, int] = {"": 0}
+
+    def add(self, string: str) -> int:
+        '''Index of string, adding it if needed'''
+        index = self._index.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self._index[string] = index
+        return index
+
+
+def compile_bundle(directory: str, bundle: str = "") -> int:
+    """
+    Compile all start lists in directory into a bundle
+
+    Parameters:
+        directory: The directory containing the *.scb files
+        bundle: The file to write (default: BUNDLE_NAME in directory)
+
+    Returns the number of events in the bundle.
+    """
+    directory = os.path.normpath(directory)
+    if bundle == "":
+        bundle = os.path.join(directory, BUNDLE_NAME)
+    events = load_cts_startlists(directory)
+    strings = _StringTable()
+    sources = []
+    for event in events:
+        sources.append(_SOURCE.pack(strings.add(os.path.basename(event.filename)),
+                                    _digest(event.filename)))
+    event_recs = []
+    heat_recs = []
+    for event in events:
+        event_recs.append(_EVENT.pack(strings.add(event.event), strings.add(event.event_desc),
+                                      strings.add(os.path.basename(event.filename)),
+                                      len(heat_recs), len(event.heats)))
+        for heat in event.heats:
+            fields = []
+            for lane in heat.lanes:
+                fields += [strings.add(lane.name), strings.add(lane.team)]
+            heat_recs.append(_HEAT.pack(*fields))
+    encoded = [s.encode("utf-8") for s in strings.strings]
+    offsets = []
+    pos = 0
+    for data in encoded:
+        offsets.append(_OFFSET.pack(pos))
+        pos += len(data)
+    offsets.append(_OFFSET.pack(pos))
+
+    tmpname = bundle + ".tmp"
+    with open(tmpname, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, len(sources), len(event_recs),
+                                len(heat_recs), len(encoded)))
+        for rec in sources + event_recs + heat_recs + offsets + encoded:
+            file.write(rec)
+    os.replace(tmpname, bundle)
+    return len(events)
+
+
+class _Bundle:
+    '''A memory mapped bundle'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self, filename: str):
+        with open(filename, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.num_sources, self.num_events, self.num_heats, \
+                self.num_strings = _HEADER.unpack_from(self.data, 0)
+        except struct.error as err:
+            raise BundleError(f"{filename}: truncated header") from err
+        if magic != _MAGIC or version != _VERSION:
+            raise BundleError(f"{filename}: not a version {_VERSION} bundle")
+        self.sources_at = _HEADER.size
+        self.events_at = self.sources_at + self.num_sources * _SOURCE.size
+        self.heats_at = self.events_at + self.num_events * _EVENT.size
+        self.offsets_at = self.heats_at + self.num_heats * _HEAT.size
+        self.strings_at = self.offsets_at + (self.num_strings + 1) * _OFFSET.size
+        if len(self.data) < self.strings_at:
+            raise BundleError(f"{filename}: truncated")
+
+    def check(self) -> None:
+        '''Check the string table and every heat, raises BundleError if corrupt'''
+        offsets = [offset for (offset,) in
+                   _OFFSET.iter_unpack(self.data[self.offsets_at:self.strings_at])]
+        if offsets[0] != 0 or offsets[-1] > len(self.data) - self.strings_at or \
+           any(start > end for start, end in zip(offsets, offsets[1:])):
+            raise BundleError("string offsets out of range")
+        strings = self.data[self.strings_at:self.strings_at + offsets[-1]]
+        try:
+            strings.decode("utf-8")
+        except UnicodeDecodeError as err:
+            raise BundleError("strings are not UTF-8") from err
+        # Every string starts on a character, so each one decodes on its own
+        if any(offset < len(strings) and strings[offset] & 0xC0 == 0x80 for offset in offsets):
+            raise BundleError("string offset within a character")
+        heats = self.data[self.heats_at:self.offsets_at]
+        if heats and max(struct.unpack(f"<{len(heats) // 4}I", heats)) >= self.num_strings:
+            raise BundleError("lane string out of range")
+
+    def string(self, index: int) -> str:
+        '''Look up a string by index, raises BundleError if the bundle is corrupt'''
+        if not 0 <= index < self.num_strings:
+            raise BundleError(f"string {index} out of range")
+        start, end = struct.unpack_from("<II", self.data, self.offsets_at + index * _OFFSET.size)
+        if not start <= end <= len(self.data) - self.strings_at:
+            raise BundleError(f"string {index} data out of range")
+        try:
+            return str(self.data[self.strings_at + start:self.strings_at + end], "utf-8")
+        except UnicodeDecodeError as err:
+            raise BundleError(f"string {index} is not UTF-8") from err
+
+
+class _BundleHeats(Sequence[startlists.Heat]):
+    '''The heats of an event, read from the bundle on access'''
+    __slots__ = ("_bundle", "_event", "_event_desc", "_first", "_count")
+
+    def __init__(self, bundle: _Bundle, event: str, event_desc: str, first: int, count: int):
+        # pylint: disable=too-many-arguments
+        self._bundle = bundle
+        self._event = event
+        self._event_desc = event_desc
+        self._first = first
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("heat index out of range")
+        fields = _HEAT.unpack_from(self._bundle.data,
+                                   self._bundle.heats_at + (self._first + index) * _HEAT.size)
+        lanes = []
+        for lane in range(_LANES):
+            name, team = fields[2 * lane], fields[2 * lane + 1]
+            if name == 0 and team == 0:
+                lanes.append(startlists.EMPTY_LANE)
+            else:
+                lanes.append(startlists.Lane(name=self._bundle.string(name),
+                                             team=self._bundle.string(team)))
+        return startlists.Heat(event=self._event, event_desc=self._event_desc,
+                               heat=index + 1, lanes=lanes)
+
+
+def open_bundle(directory: str, bundle: str = "") -> Optional[List[startlists.Event]]:
+    """
+    Open the bundle for a start list directory
+
+    Returns the events in the bundle, or None if there is no usable bundle or
+    any .scb file in directory has been added, removed or changed since the
+    bundle was compiled. If directory has no .scb files the bundle is used
+    without checking.
+    """
+    directory = os.path.normpath(directory)
+    if bundle == "":
+        bundle = os.path.join(directory, BUNDLE_NAME)
+    try:
+        data = _Bundle(bundle)
+    except (OSError, ValueError, BundleError):
+        return None
+
+    try:
+        # Checked now, so reading a heat later can't fail
+        data.check()
+        with os.scandir(directory) as files:
+            current = {file.name: file.path for file in files if file.name.endswith(".scb")}
+        if current and not _sources_match(data, current):
+            return None
+
+        events = []
+        for i in range(data.num_events):
+            code, desc, filename, first, count = _EVENT.unpack_from(
+                data.data, data.events_at + i * _EVENT.size)
+            if first + count > data.num_heats:
+                raise BundleError(f"{bundle}: heats out of range")
+            event = startlists.Event(event=data.string(code), event_desc=data.string(desc),
+                                     num_heats=count,
+                                     filename=os.path.join(directory, data.string(filename)))
+            event.heats = _BundleHeats(data, event.event, event.event_desc, first, count)
+            events.append(event)
+    except (OSError, BundleError):
+        return None
+    return events
+
+
+def _sources_match(data: _Bundle, current: Dict[str, str]) -> bool:
+    '''Whether the .scb files (name: path) are the ones the bundle was built from'''
+    if len(current) != data.num_sources:
+        return False
+    for i in range(data.num_sources):
+        path, digest = _SOURCE.unpack_from(data.data, data.sources_at + i * _SOURCE.size)
+        name = data.string(path)
+        if name not in current or _digest(current[name]) != digest:
+            return False
+    return True
+
+
+def main():
+    '''Compile a start list directory into a bundle'''
+    parser = argparse.ArgumentParser(description="Compile CTS start lists into a bundle")
+    parser.add_argument("directory", help="Directory containing the *.scb files")
+    parser.add_argument("-o", "--output", default="",
+                        help=f"Bundle to write (default: <directory>/{BUNDLE_NAME})")
+    args = parser.parse_args()
+    count = compile_bundle(args.directory, args.output)
+    print(f"Compiled {count} events")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+#
+
+"""Tests for startlist_bundle.py"""
+
+import os
+import shutil
+import struct
+
+import pytest
+
+import startlist_bundle
+import startlist_loader
+import startlist_source
+import startlists
+
+SESSION = os.path.join(os.path.dirname(__file__), "..", "hytek-sample", "SCB_Session2")
+
+
+def test_bundle_roundtrip(tmp_path):
+    """A bundle holds exactly what parsing the directory produces"""
+    directory = str(tmp_path / "session")
+    shutil.copytree(SESSION, directory)
+    assert startlist_bundle.open_bundle(directory) is None
+    assert startlist_bundle.compile_bundle(directory) == 20
+
+    bundled = startlist_bundle.open_bundle(directory)
+    parsed = startlist_loader.load_cts_startlists(directory)
+    assert bundled is not None
+    assert [e.event for e in bundled] == [e.event for e in parsed]
+    for b_evt, p_evt in zip(bundled, parsed):
+        assert b_evt.event_desc == p_evt.event_desc
+        assert b_evt.filename == p_evt.filename
+        assert len(b_evt.heats) == len(p_evt.heats)
+        for b_heat, p_heat in zip(b_evt.heats, p_evt.heats):
+            assert b_heat.heat == p_heat.heat
+            for b_lane, p_lane in zip(b_heat.lanes, p_heat.lanes):
+                assert (b_lane.name, b_lane.team) == (p_lane.name, p_lane.team)
+    assert bundled[0].heats[0].lanes[0] is startlists.EMPTY_LANE
+
+
+def test_bundle_invalidation(tmp_path):
+    """Any change to the .scb files makes the bundle stale"""
+    directory = str(tmp_path / "session")
+    shutil.copytree(SESSION, directory)
+    startlist_bundle.compile_bundle(directory)
+    os.remove(os.path.join(directory, "E019.scb"))
+    assert startlist_bundle.open_bundle(directory) is None
+    startlist_bundle.compile_bundle(directory)
+    assert len(startlist_bundle.open_bundle(directory)) == 19
+    shutil.copy(os.path.join(SESSION, "E019.scb"), directory)
+    assert startlist_bundle.open_bundle(directory) is None
+    startlist_bundle.compile_bundle(directory)
+    # Touched but unchanged, as when a directory is copied
+    path = os.path.join(directory, "E020.scb")
+    os.utime(path, ns=(0, 0))
+    assert len(startlist_bundle.open_bundle(directory)) == 20
+    with open(path, "rb+") as file:
+        file.write(b"X")
+    assert startlist_bundle.open_bundle(directory) is None
+
+
+def test_bundle_alone(tmp_path):
+    """A bundle copied without its .scb files is used as is"""
+    directory = str(tmp_path / "session")
+    shutil.copytree(SESSION, directory)
+    startlist_bundle.compile_bundle(directory)
+    copy = tmp_path / "copy"
+    copy.mkdir()
+    shutil.copy(os.path.join(directory, startlist_bundle.BUNDLE_NAME), copy)
+    events = startlist_bundle.open_bundle(str(copy))
+    assert len(events) == 20
+    assert events[0].filename == str(copy / "E019.scb")
+
+
+def test_bundle_garbage(tmp_path):
+    """A file that isn't a bundle is ignored"""
+    directory = str(tmp_path / "session")
+    shutil.copytree(SESSION, directory)
+    with open(os.path.join(directory, startlist_bundle.BUNDLE_NAME), "wb") as file:
+        file.write(b"SCBB")
+    assert startlist_bundle.open_bundle(directory) is None
+
+
+def test_bundle_bad_string(tmp_path):
+    """A corrupt string index or table is found when the bundle is opened"""
+    directory = str(tmp_path / "session")
+    shutil.copytree(SESSION, directory)
+    startlist_bundle.compile_bundle(directory)
+    path = os.path.join(directory, startlist_bundle.BUNDLE_NAME)
+    bundle = startlist_bundle._Bundle(path)  # pylint: disable=protected-access
+    heats_at, events_at = bundle.heats_at, bundle.events_at
+    bundle.data.close()
+    with open(path, "rb+") as file:
+        file.seek(heats_at)
+        file.write(struct.pack("<I", 0xFFFFFFF0))
+    # Found at load time, not when the heat is shown
+    assert startlist_bundle.open_bundle(directory) is None
+    assert len(startlist_source.ScbDirectorySource(directory).load()) == 20
+    startlist_bundle.compile_bundle(directory)
+    bundle = startlist_bundle._Bundle(path)  # pylint: disable=protected-access
+    strings_at = bundle.strings_at
+    bundle.data.close()
+    with open(path, "rb+") as file:
+        file.seek(strings_at)
+        file.write(b"\xff")
+    assert startlist_bundle.open_bundle(directory) is None
+    with pytest.raises(startlist_bundle.BundleError):
+        startlist_bundle._Bundle(path).check()  # pylint: disable=protected-access
+    startlist_bundle.compile_bundle(directory)
+    with open(path, "rb+") as file:
+        file.seek(events_at)
+        file.write(struct.pack("<I", 0xFFFFFFF0))
+    assert startlist_bundle.open_bundle(directory) is None
@@ -28,11 +28,14 @@ Based on orignal work by :
 '''
 
 import logging
+import math
+import os
 import tkinter as tk
 from tkinter import ttk, BooleanVar, StringVar
 import tkinter.scrolledtext as ScrolledText
 import tkinter.font as tkfont
-from typing import Any, Dict, Union, Callable
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union, Callable
 import ttkwidgets  #type: ignore
 import ttkwidgets.font  #type: ignore
 
@@ -46,16 +49,60 @@ from color_button import ColorButton
 from version import SWIMCAM_VERSION
 from typing import List
 import startlists
-import paho.mqtt.client as mqtt
+import start_message
+from startlist_watcher import StartListWatcher
+import clock_monitor
+from clock_monitor import ClockMonitor
+from mqtt_publisher import Publisher
+from race_journal import JournalError, RaceJournal
+from start_capture import StartCapture, StartInputError, open_start_input
+from start_sender import SentStart, StartSender
 import gi
 gi.require_version('Gst', '1.0')
 gi.require_version('GstBase', '1.0')
 from gi.repository import GObject, Gst, GstBase, GLib
-from swimcamutil import get_core_clock
+from swimcamutil import CoreClock
 from datetime import datetime
 
 TkContainer = Any
 
+# Scaled, brightness-adjusted backgrounds, shared by every Scoreboard so that
+# resizing back and forth or a trip through the settings screen reuses them.
+# Keyed by (id of working image, canvas size, fill mode, brightness), the
+# image itself is kept with the result so a reused id can't match
+_BG_CACHE_SIZE = 8
+_bg_cache: "OrderedDict[Tuple, Tuple[Image.Image, ImageTk.PhotoImage]]" = OrderedDict()
+# Working copies of background images, keyed by (filename, mtime, max size)
+_bg_sources: Dict[Tuple, Image.Image] = {}
+
+def load_bg_image(filename: str, max_size: Optional[Tuple[int, int]]) -> Image.Image:
+    '''
+    Load a background image, reduced to the largest size it can be shown at
+
+    A 20 megapixel pool photo is mostly wasted on a 1080p screen, so the
+    image is shrunk (once) to what "cover" needs to fill max_size. JPEGs are
+    decoded in draft mode, which lets the decoder skip most of the work.
+    A max_size of None keeps the image at full size.
+    '''
+    key = (filename, os.stat(filename).st_mtime_ns, max_size)
+    image = _bg_sources.get(key)
+    if image is not None:
+        return image
+    image = Image.open(filename)
+    factor = 1.0
+    if max_size is not None:
+        factor = max(max_size[0] / image.size[0], max_size[1] / image.size[1])
+    if factor < 1:
+        needed = (math.ceil(image.size[0] * factor), math.ceil(image.size[1] * factor))
+        if image.format == "JPEG":
+            image.draft("RGB", needed)
+        image = image.resize(needed, Image.LANCZOS)
+    else:
+        image.load()
+    _bg_sources.clear()  # only the current image is worth keeping
+    _bg_sources[key] = image
+    return image
+
 # Callbacks - XXXX
 #CSVGenFn = Callable[[str, str], int]
 NoneFn = Callable[[], None]
@@ -94,6 +141,7 @@ class Scoreboard(tk.Canvas):
     # Background for the scoreboard
     _bg_image: Image = None
     _bg_image_fill: str
+    _bg_image_bright: float
     _bg_image_pimage: ImageTk.PhotoImage
     # Maximum number of lanes supported
     _max_lanes = 10
@@ -108,10 +156,19 @@ class Scoreboard(tk.Canvas):
     _font: tkfont.Font
     _font_times: tkfont.Font
     _line_height: int
+    # Text waiting to be drawn, applied in one batch when Tk is idle
+    _pending_text: Dict[str, str]
+    _flush_id: Optional[str] = None
+    # Layout is deferred until the window size settles
+    _LAYOUT_DELAY_MS = 50
+    _layout_id: Optional[str] = None
+    _layout_size: Tuple[int, int] = (0, 0)
+    _font_inputs: Tuple = ()
 
     def __init__(self, container: TkContainer, config: StarterConfig, **kwargs):
         super().__init__(container, kwargs)
         self._config = config
+        self._pending_text = {}
         self.create_image(0, 0, image=None, tag="bg_image")
         self._font = tkfont.Font()
         self._font_times = tkfont.Font()
@@ -125,17 +182,45 @@ class Scoreboard(tk.Canvas):
         self.create_line(0, 0, 0, 0, tags="header_line")
         self.bind("<Configure>", self._reconfigure)
         self.set_lanes(self._config.get_int("num_lanes"))
-        self._reconfigure(None)
+        self._layout()
         self.clear()
 
     def clear(self):
         '''Clear the scoreboard'''
         for i in range(self._max_lanes):
-            self._text_items[f"lane_{i}_name"].text = ""
-            self._text_items[f"lane_{i}_team"].text = ""
+            self._set_text(f"lane_{i}_name", "")
+            self._set_text(f"lane_{i}_team", "")
         self.event("1", "")
         self.heat(1)
 
+    def _set_text(self, item: str, text: str) -> None:
+        '''
+        Queue new text for an item
+
+        Nothing is drawn until Tk is idle, and then only the items whose
+        text differs from what is on screen are touched. Setting a lane to ""
+        and back to the same name before then costs nothing.
+        '''
+        self._pending_text[item] = text
+        if self._flush_id is None:
+            self._flush_id = self.after_idle(self._flush_text)
+
+    def _flush_text(self) -> None:
+        self._flush_id = None
+        pending, self._pending_text = self._pending_text, {}
+        for item, text in pending.items():
+            if self._text_items[item].text != text:
+                self._text_items[item].text = text
+
+    def destroy(self) -> None:
+        if self._flush_id is not None:
+            self.after_cancel(self._flush_id)
+            self._flush_id = None
+        if self._layout_id is not None:
+            self.after_cancel(self._layout_id)
+            self._layout_id = None
+        super().destroy()
+
     def event(self, event_num: Union[int, str], event_description: str):
         '''
         Set the event number and description
@@ -146,8 +231,8 @@ class Scoreboard(tk.Canvas):
         '''
         self._event_num = event_num
         self._event_description = event_description
-        self._text_items["event_heat"].text = f"E: {self._event_num} / H: {self._heat_num}"
-        self._text_items["event_desc"].text = self._event_description
+        self._set_text("event_heat", f"E: {self._event_num} / H: {self._heat_num}")
+        self._set_text("event_desc", self._event_description)
 
     def heat(self, heat_num: int):
         '''
@@ -157,7 +242,7 @@ class Scoreboard(tk.Canvas):
             heat_num: The number of the current heat
         '''
         self._heat_num = heat_num
-        self._text_items["event_heat"].text = f"E: {self._event_num} / H: {self._heat_num}"
+        self._set_text("event_heat", f"E: {self._event_num} / H: {self._heat_num}")
 
     #pylint: disable=unused-argument,too-many-arguments
     def lane(self, lane_num: int, name: str = "", team: str = ""):
@@ -169,8 +254,8 @@ class Scoreboard(tk.Canvas):
             name: The name of the swimmer
             team: The swimmer's team
         '''
-        self._text_items[f"lane_{lane_num-1}_name"].text = name
-        self._text_items[f"lane_{lane_num-1}_team"].text = team
+        self._set_text(f"lane_{lane_num-1}_name", name)
+        self._set_text(f"lane_{lane_num-1}_team", team)
 
     def set_lanes(self, lanes: int):
         '''
@@ -180,8 +265,9 @@ class Scoreboard(tk.Canvas):
             lanes: The number of lanes to display
         '''
         self._num_lanes = min(lanes, self._max_lanes)
+        self._schedule_layout(force=True)
 
-    def bg_image(self, image: Image, fill: str = "fit"):
+    def bg_image(self, image: Image, fill: str = "fit", brightness: float = 1.0):
         '''
         Set a background image for the scoreboard
 
@@ -192,17 +278,41 @@ class Scoreboard(tk.Canvas):
                 "stretch": Stretch the image to fill the entire scoreboard
                 "fit": Uniformly scale to fit it on the scoreboard
                 "cover": Uniformly scale to fully cover the scoreboard
+            brightness: Brightness of the image (0-1), applied after scaling
         '''
         self._bg_image = image
         self._bg_image_fill = fill
-
-    def _reconfigure(self, event):
-        self.update()
-        self._draw_bg(event)
-        self._update_font()
+        self._bg_image_bright = brightness
+        self._schedule_layout(force=True)
+
+    def _reconfigure(self, _event):
+        # A window drag or maximize sends a burst of these; only lay out
+        # once the size has stopped changing
+        self._schedule_layout()
+
+    def _schedule_layout(self, force: bool = False) -> None:
+        if force:
+            self._layout_size = (0, 0)
+        if self._layout_id is not None:
+            self.after_cancel(self._layout_id)
+        self._layout_id = self.after(self._LAYOUT_DELAY_MS, self._layout)
+
+    def _layout(self) -> None:
+        '''Lay out the scoreboard, redoing only what the size change affects'''
+        self._layout_id = None
+        size = (self.winfo_width(), self.winfo_height())
+        if size == self._layout_size:
+            return
+        self._layout_size = size
+        self._draw_bg(None)
+        # The font only depends on the height, not the width
+        font_inputs = (size[1], self._num_lanes, self._config.get_float("font_scale"),
+                       self._config.get_str("normal_font"))
+        if font_inputs != self._font_inputs:
+            self._font_inputs = font_inputs
+            self._update_font()
         self._draw_header()
         self._draw_lanes()
-        self._update_font()
 
     def _update_font(self):
         line_height = int(self.winfo_height() *
@@ -230,6 +340,13 @@ class Scoreboard(tk.Canvas):
         self._text_items["event_desc"].move_to(rpos, vpos)
         self._text_items["event_desc"].width = desc_width
 
+    def _lane_item(self, name: str) -> BoundedText:
+        '''Get a lane text item, creating it on first use'''
+        if name not in self._text_items:
+            self._text_items[name] = BoundedText(self, 0, 0, fill=self._config.get_str("color_fg"),
+                                                 width=1, tags="normal_font", font=self._font)
+        return self._text_items[name]
+
     def _draw_lanes(self): #pylint: disable=too-many-statements
         lpos = int(self.winfo_width() * self._border_pct)
         rpos = int(self.winfo_width() * (1-self._border_pct))
@@ -259,9 +376,7 @@ class Scoreboard(tk.Canvas):
         self.coords("header_line", hlx1, lane_top, hlx2, lane_top)
         for i in range(self._max_lanes):
             # Lane number
-            txt = self._text_items.setdefault(f"lane_{i}_idx",
-                BoundedText(self, 0, 0, fill=self._config.get_str("color_fg"),
-                            width=1, tags="normal_font"))
+            txt = self._lane_item(f"lane_{i}_idx")
             txt.configure(anchor="s")
             txt.move_to(lpos + idx_width/3, lane_top + (i+1) * self._line_height)
             txt.width = idx_width
@@ -270,18 +385,14 @@ class Scoreboard(tk.Canvas):
             else:
                 txt.text = ""
             # Name
-            txt = self._text_items.setdefault(f"lane_{i}_name",
-                BoundedText(self, 0, 0, fill=self._config.get_str("color_fg"),
-                            width=1, tags="normal_font"))
+            txt = self._lane_item(f"lane_{i}_name")
             txt.configure(anchor="sw")
             txt.move_to(lpos + idx_width + pl_width, lane_top + (i+1) * self._line_height)
             txt.width = name_width
             if i >= self._num_lanes:
                 txt.text = ""
             # Team
-            txt = self._text_items.setdefault(f"lane_{i}_team",
-                BoundedText(self, 0, 0, fill=self._config.get_str("color_fg"),
-                            width=1, tags="normal_font"))
+            txt = self._lane_item(f"lane_{i}_team")
             txt.configure(anchor="se")
             txt.move_to(rpos, lane_top + (i+1) * self._line_height)
             txt.width = time_width
@@ -291,22 +402,37 @@ class Scoreboard(tk.Canvas):
     def _draw_bg(self, _):
         self.configure(bg=self._config.get_str("color_bg"))
         if self._bg_image is not None:
-            i_size = self._bg_image.size
             c_size = (self.winfo_width(), self.winfo_height())
-            if self._bg_image_fill == "stretch":
-                scaled = self._bg_image.resize(c_size)
-            elif self._bg_image_fill == "fit":
-                factor = min(c_size[0]/i_size[0], c_size[1]/i_size[1])
-                scaled = self._bg_image.resize((int(i_size[0]*factor), int(i_size[1]*factor)))
-            elif self._bg_image_fill == "cover":
-                factor = max(c_size[0]/i_size[0], c_size[1]/i_size[1])
-                scaled = self._bg_image.resize((int(i_size[0]*factor), int(i_size[1]*factor)))
+            key = (id(self._bg_image), c_size, self._bg_image_fill, self._bg_image_bright)
+            entry = _bg_cache.get(key)
+            if entry is None or entry[0] is not self._bg_image:
+                pimage = ImageTk.PhotoImage(self._render_bg(c_size))
+                _bg_cache[key] = (self._bg_image, pimage)
+                if len(_bg_cache) > _BG_CACHE_SIZE:
+                    _bg_cache.popitem(last=False)
             else:
-                scaled = self._bg_image
-            self._bg_image_pimage = ImageTk.PhotoImage(scaled)
+                pimage = entry[1]
+                _bg_cache.move_to_end(key)
+            self._bg_image_pimage = pimage
             self.coords("bg_image", c_size[0]//2, c_size[1]//2)
             self.itemconfigure("bg_image", image=self._bg_image_pimage)
 
+    def _render_bg(self, c_size: Tuple[int, int]) -> Image:
+        i_size = self._bg_image.size
+        if self._bg_image_fill == "stretch":
+            scaled = self._bg_image.resize(c_size)
+        elif self._bg_image_fill == "fit":
+            factor = min(c_size[0]/i_size[0], c_size[1]/i_size[1])
+            scaled = self._bg_image.resize((int(i_size[0]*factor), int(i_size[1]*factor)))
+        elif self._bg_image_fill == "cover":
+            factor = max(c_size[0]/i_size[0], c_size[1]/i_size[1])
+            scaled = self._bg_image.resize((int(i_size[0]*factor), int(i_size[1]*factor)))
+        else:
+            scaled = self._bg_image
+        if self._bg_image_bright != 1.0:
+            scaled = Brightness(scaled).enhance(self._bg_image_bright)
+        return scaled
+
 class Starter(ttk.Frame):  # pylint: disable=too-many-ancestors
     '''Starter Simulator window'''
 
@@ -314,16 +440,26 @@ class Starter(ttk.Frame):  # pylint: disable=too-many-ancestors
     _events: List[startlists.Event]
     _event_index: int
     _heat_index: int
-    _current_ehl_text: str
     _config: StarterConfig
+    _watcher: Optional[StartListWatcher]
+    _index: startlists.SessionIndex
+    _goto_text: StringVar
+    # How often (ms) the Tk thread picks up start list changes
+    _RELOAD_POLL_MS = 500
+    # How often (ms) to check whether the network clock has synchronised
+    _CLOCK_POLL_MS = 250
+    # How often (ms) the Tk thread picks up starts from the start input
+    _START_POLL_MS = 50
 #   Add other variables... _connection:, _masterclock, etc. 
 
     # pylint: disable=too-many-arguments,too-many-locals
     def __init__(self, container: TkContainer, config: StarterConfig,
-                 event_list: List[startlists.Event], **kwargs):
+                 event_list: List[startlists.Event],
+                 source: Optional[startlists.StartListSource] = None, **kwargs):
         super().__init__(container, padding=5)
         self._config = config
         self._events = event_list
+        self._index = startlists.SessionIndex(self._events)
         self._event_index = 0
         self._heat_index = 0
         self.grid(column=0, row=0, sticky="news")
@@ -348,6 +484,16 @@ class Starter(ttk.Frame):  # pylint: disable=too-many-ancestors
         prev_heat_btn.grid(column=0, row=1, sticky="news")
         ToolTip(prev_heat_btn, text="Previous Heat")
 
+        self._goto_text = StringVar()
+        goto_entry = ttk.Entry(fr0, textvariable=self._goto_text, justify="center")
+        goto_entry.grid(column=1, row=0, sticky="news")
+        goto_entry.bind("<Return>", self._handle_goto)
+        ToolTip(goto_entry, text="Event to jump to: 18A, 18A/3 (heat 3) "
+                "or #57 (57th heat of the session)")
+        goto_btn = ttk.Button(fr0, text="Go to", command=self._handle_goto)
+        goto_btn.grid(column=1, row=1, sticky="news")
+        ToolTip(goto_btn, text="Jump to the event/heat entered above")
+
         start_btn = ttk.Button(fr0, text="Start", command=self._handle_start_btn)
         start_btn.grid(column=2, row=0, sticky="news")
         ToolTip(start_btn, text="Send a simulated start signal")
@@ -388,6 +534,7 @@ class Starter(ttk.Frame):  # pylint: disable=too-many-ancestors
         fr6.rowconfigure(0, weight=1)
         fr6.columnconfigure(0, weight=1)
         fr6.columnconfigure(1, weight=0)
+        fr6.columnconfigure(2, weight=0)
         link_label = ttkwidgets.LinkLabel(fr6,
             text="Documentation: https://swimcam.readthedocs.io/",
             link="https://swimcam.readthedocs.io/?utm_source=swimcam&"
@@ -397,83 +544,260 @@ class Starter(ttk.Frame):  # pylint: disable=too-many-ancestors
         link_label.grid(column=0, row=0, sticky="news")
         version_label = ttk.Label(fr6, text=SWIMCAM_VERSION, justify="right",
                                   padding=2, relief="sunken")
-        version_label.grid(column=1, row=0, sticky="nes")
+        version_label.grid(column=2, row=0, sticky="nes")
+        self._clock_status = StringVar(value="Clock: provisional")
+        clock_label = ttk.Label(fr6, textvariable=self._clock_status, padding=2,
+                                relief="sunken")
+        clock_label.grid(column=1, row=0, sticky="nes")
+        ToolTip(clock_label, text="Until the network clock synchronises, start times are "
+                                  "provisional and are corrected once it does")
 
         logging.info("Starter simulator initializing")
 
         # Start MQTT
 
-        self._connection = mqtt.Client("swimcam-starter-simulator")
-        self._connection.username_pw_set(username="swimcam", password="swimming")
-        self._connection.connect(self._config.get_str("core_host"))
-        self._connection.loop_start()
+        qos_start = self._config.get_int("qos_start")
+        qos_heat = self._config.get_int("qos_heat")
+        self._connection = Publisher(self._config.get_str("core_host"),
+                                     self._config.get_int("core_broker_port"),
+                                     self._config.get_str("broker_username"),
+                                     self._config.get_str("broker_password"),
+                                     "swimcam-starter-simulator",
+                                     qos={start_message.RACE_TOPIC: qos_start,
+                                          start_message.START_TOPIC: qos_start,
+                                          start_message.HEAT_TOPIC: qos_heat,
+                                          start_message.LANE_TOPIC: qos_heat,
+                                          clock_monitor.TOPIC: self._config.get_int("qos_status")},
+                                     queue_size=self._config.get_int("publish_queue"))
+        self._connection.start()
         logging.info("MQTT Started")
 
-        # Get Network Clock
-
-        self._masterClock = get_core_clock(self._config.get_str("core_host"))
-        logging.info("Synchronized to network clock")
+        # Get Network Clock, synchronised in the background so the UI never waits on it
+
+        # Polls that reschedule themselves, by name, cancelled by destroy()
+        self._poll_ids: Dict[str, str] = {}
+        self._core_clock = CoreClock(self._config.get_str("core_host"),
+                                     self._config.get_int("core_clock_port"))
+        # Each heat is published as it is shown, so a start only sends the time.
+        # The text start message also goes to cameras that haven't been updated
+        self._sender = StartSender(self._connection.publish, self._core_clock,
+                                   self._config.get_bool("legacy_start"))
+        self._clock_monitor = ClockMonitor(self._core_clock.clock, "starter",
+                                           self._connection.publish)
+        self._clock_monitor.start()
+        self._schedule_poll(self._CLOCK_POLL_MS, self._poll_clock)
+
+        # Every start and reset is journalled for replay
+        self._journal = None
+        if self._config.get_str("journal"):
+            try:
+                self._journal = RaceJournal(self._config.get_str("journal"))
+            except (OSError, JournalError) as err:
+                logging.error("Unable to open the race journal: %s", err)
+
+        # Starts from the start system are captured and sent on their own thread
+        self._capture = None
+        try:
+            start_input = open_start_input(self._config.get_str("start_input"),
+                                           self._config.get_int("GPIO_pin"))
+        except (OSError, StartInputError) as err:
+            logging.error("Unable to open the start input: %s", err)
+            start_input = None
+        if start_input is not None:
+            self._capture = StartCapture(start_input, self._core_clock.now, self._sender.send)
+            self._capture.start()
+            self._schedule_poll(self._START_POLL_MS, self._poll_starts)
 
         # Display
         self._set_ehl_data()
 
+        # Pick up start lists as they are re-exported
+        self._watcher = None
+        if source is not None:
+            self._watcher = StartListWatcher(source)
+            self._watcher.start()
+            self._schedule_poll(self._RELOAD_POLL_MS, self._poll_startlists)
+
+    def destroy(self) -> None:
+        for after_id in self._poll_ids.values():
+            self.after_cancel(after_id)
+        self._poll_ids.clear()
+        if self._watcher is not None:
+            self._watcher.stop()
+        if self._capture is not None:
+            self._capture.stop()
+        self._clock_monitor.stop()
+        self._core_clock.stop()
+        self._connection.stop()
+        if self._journal is not None:
+            self._journal.close()
+        super().destroy()
+
+    def _schedule_poll(self, delay_ms: int, poll: Callable[[], None]) -> None:
+        """Run poll after delay_ms, replacing its previous after id"""
+        self._poll_ids[poll.__name__] = self.after(delay_ms, poll)
+
+    def _poll_clock(self) -> None:
+        """Wait for the network clock to sync, then correct any provisional start"""
+        if not self._core_clock.synced:
+            self._schedule_poll(self._CLOCK_POLL_MS, self._poll_clock)
+            return
+        del self._poll_ids[self._poll_clock.__name__]
+        self._clock_status.set("Clock: synchronized")
+        logging.info("Synchronized to network clock")
+        self._correct_start()
+
+    def _poll_starts(self) -> None:
+        """Report the starts sent by the capture thread"""
+        while not self._capture.captured.empty():
+            self._report_start(self._capture.captured.get_nowait()[1])
+        self._schedule_poll(self._START_POLL_MS, self._poll_starts)
+
+    def _poll_startlists(self) -> None:
+        """Apply any start list changes found by the watcher"""
+        while not self._watcher.changes.empty():
+            self._apply_startlist_changes(self._watcher.changes.get_nowait())
+        self._schedule_poll(self._RELOAD_POLL_MS, self._poll_startlists)
+
+    @staticmethod
+    def _heat_signature(heat: startlists.Heat) -> Tuple:
+        """Everything about a heat that appears on screen"""
+        return (heat.event, heat.event_desc, heat.heat,
+                tuple((lane.name, lane.team) for lane in heat.lanes))
+
+    def _apply_startlist_changes(self, changes: startlists.StartListChanges) -> None:
+        """Swap re-exported events into the event list, keeping our place"""
+        shown = self._events[self._event_index]
+        shown_sig = self._heat_signature(shown.heats[self._heat_index])
+        by_file = {e.filename: e for e in self._events}
+        for event in changes.changed:
+            logging.info("Reloaded start list for event %s", event.event)
+            by_file[event.filename] = event
+        for filename in changes.removed:
+            by_file.pop(filename, None)
+        if not by_file:
+            logging.warning("All start lists were removed, keeping current list")
+            return
+        self._events[:] = sorted(by_file.values(),
+                                 key=lambda e: startlists.event_sort_key(e.event))
+        self._index = startlists.SessionIndex(self._events)
+        # Stay on the same event/heat if it still exists
+        for index, event in enumerate(self._events):
+            if event.event == shown.event:
+                self._event_index = index
+                break
+        else:
+            self._event_index = min(self._event_index, len(self._events) - 1)
+            self._heat_index = 0
+        working = self._events[self._event_index]
+        self._heat_index = min(self._heat_index, len(working.heats) - 1)
+        if self._heat_signature(working.heats[self._heat_index]) != shown_sig:
+            self._set_ehl_data()
+
     def _set_ehl_data(self) -> None:
         """Update the display and set the message structure element"""
         working = self._events[self._event_index].heats[self._heat_index]
         self.startlist.clear()
         self.startlist.event(working.event, working.event_desc)
         self.startlist.heat(working.heat)
-        self._current_ehl_text=f"|Event: {working.event} Heat: {working.heat} {working.event_desc}|"
+        self._sender.show(working)
         for i in range(0, 10):
             if not working.lanes[i].is_empty():
                 self.startlist.lane(i+1, working.lanes[i].name, working.lanes[i].team)
-                self._current_ehl_text += f"{working.lanes[i].name} ({working.lanes[i].team})|"
-            else:
-                self._current_ehl_text += " |"
 
     def _handle_start_btn(self) -> None:
-        _currenttime = Gst.Clock.get_time(self._masterClock)
-        _ct_datetime = datetime.fromtimestamp(_currenttime / Gst.SECOND)
+        self._report_start(self._sender.send(self._core_clock.now()))
+
+    def _report_start(self, sent: SentStart) -> None:
+        """Log a start sent by the StartSender"""
+        stamp = sent.stamp
+        # Replaces any earlier start still waiting for the clock
+        self._sender.track(sent)
+        _ct_datetime = datetime.fromtimestamp(stamp.time / Gst.SECOND)
         _ct_datetime_text = _ct_datetime.strftime('%Y-%m-%d %H:%M:%S.%f%z')
-        _message = 'START|'+str(_currenttime)+self._current_ehl_text
-        logging.info("CAPTURED START TIME: %r" % _ct_datetime_text)
-        _ret = self._connection.publish("swimcam/start", _message,retain=True)
-        logging.info("START MESSAGE %r" % _message)
-        logging.info("MQTT Message ID: %r" % _ret.mid)
-
+        if sent.info is None:
+            # The cameras have moved on from this start
+            logging.warning("CORRECTED START TIME NOT SENT (heat no longer shown): %r"
+                            % _ct_datetime_text)
+        elif stamp.provisional:
+            logging.warning("CAPTURED PROVISIONAL START TIME (clock not synchronized): %r"
+                            % _ct_datetime_text)
+        else:
+            logging.info("CAPTURED START TIME: %r" % _ct_datetime_text)
+        if sent.info is not None:
+            logging.info("START MESSAGE %r" % sent.text)
+            self._log_sent(sent.info)
+        if self._journal is not None:
+            self._journal.record_start(stamp.time, stamp.provisional, sent.heat, sent.heat_id,
+                                       self._core_clock.offset(),
+                                       None if sent.info is None else sent.info.mid)
+        # Taken before the clock synchronised but only reported now, after
+        # _poll_clock has stopped polling
+        self._correct_start()
+
+    def _correct_start(self) -> None:
+        """
+        Correct a provisional start once the clock has synchronised
+
+        The StartSender only re-sends it while its heat is still on screen;
+        otherwise the corrected time is just logged and journaled.
+        """
+        corrected = self._sender.correct()
+        if corrected is not None:
+            logging.info("Correcting the provisional start time")
+            self._report_start(corrected)
 
     def _handle_reset_btn(self) -> None:
-        _ret = self._connection.publish("swimcam/start", "RESET",retain=True)
+        _ret = self._sender.reset()
         logging.info("RESET SENT")
-        logging.info("MQTT Message ID: %r" % _ret.mid)
+        self._log_sent(_ret)
+        if self._journal is not None:
+            heat, heat_id = self._sender.shown
+            self._journal.record_reset(heat, heat_id, self._core_clock.offset(), _ret.mid)
+
+    def _log_sent(self, ret) -> None:
+        """Log how a message went out, and how quickly the broker has been acknowledging"""
+        if ret.mid is None:
+            logging.warning("MQTT broker unavailable, queued until it is back")
+            return
+        logging.info("MQTT Message ID: %r" % ret.mid)
+        latency = self._connection.ack_latency()
+        if latency:
+            logging.info("MQTT ack latency: p50 %.0f us, p99 %.0f us"
+                         % (latency["p50_us"], latency["p99_us"]))
+
+    def _goto(self, event_index: int, heat_index: int) -> None:
+        """Display the given heat"""
+        self._event_index = event_index
+        self._heat_index = heat_index
+        self._set_ehl_data()
+
+    def _step_heat(self, step: int) -> None:
+        """Move through the flattened session order, wrapping at either end"""
+        ordinal = self._index.ordinal(self._event_index, self._heat_index)
+        target = self._index.position(ordinal + step)
+        if target is not None:
+            self._goto(*target)
+
+    def _handle_goto(self, *_) -> None:
+        target = self._index.parse(self._goto_text.get())
+        if target is None:
+            logging.warning("No such event/heat: %r", self._goto_text.get())
+            return
+        self._goto_text.set("")
+        self._goto(*target)
 
     def _handle_prev_event_btn(self) -> None:
-        if self._event_index == 0:
-           self._event_index = len(self._events) - 1
-           self._heat_index = 0
-        else:
-           self._event_index -= 1
-           self._heat_index = 0
-        self._set_ehl_data()
+        self._goto((self._event_index - 1) % len(self._events), 0)
 
     def _handle_prev_heat_btn(self) -> None:
-        if (self._heat_index == 0):
-           self._handle_prev_event_btn()
-        else:
-           self._heat_index -= 1
-           self._set_ehl_data()
+        self._step_heat(-1)
 
     def _handle_next_event_btn(self) -> None:
-        self._event_index = (self._event_index + 1) % len(self._events)
-        self._heat_index = 0
-        self._set_ehl_data()
+        self._goto((self._event_index + 1) % len(self._events), 0)
 
     def _handle_next_heat_btn(self) -> None:
-        self._heat_index += 1
-        if (self._heat_index % len(self._events[self._event_index].heats) == 0):
-           self._handle_next_event_btn()
-        else:
-           self._set_ehl_data()
+        self._step_heat(1)
 
 def show_mockup(board: Scoreboard):
     '''
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Load a directory of CTS start lists
+
+Parsed events are kept in an on-disk cache keyed by path, modification time and size. Unchanged files
+are taken straight from the cache, so reloading a session only parses the
+events that Meet Manager has re-exported since the last load.
+
+Tests:  startlist_loader_test.py
+"""
+
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import startlists
+
+# (mtime in ns, size in bytes) of a start list file
+FileKey = Tuple[int, int]
+
+
+def file_key(stat: os.stat_result) -> FileKey:
+    '''The cache key for a file'''
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class StartListCache:
+    '''
+    On-disk cache of parsed start lists
+
+    Parameters:
+        filename: Where the cache is stored. An empty name disables
+            persistence and the cache only lives in memory.
+    '''
+    # Bump whenever the pickled data model changes
+    _VERSION = 3
+
+    def __init__(self, filename: str = ""):
+        self._filename = filename
+        self._entries: Dict[str, Tuple[FileKey, startlists.Event]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if self._filename == "":
+            return
+        try:
+            with open(self._filename, "rb") as file:
+                version, entries = pickle.load(file)
+        except (OSError, EOFError, ValueError, TypeError,
+                AttributeError, pickle.UnpicklingError):
+            return
+        if version == self._VERSION:
+            self._entries = entries
+
+    def get(self, path: str, key: FileKey) -> Optional[startlists.Event]:
+        '''Return the cached event for path if the file is unchanged'''
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def put(self, path: str, key: FileKey, event: startlists.Event) -> None:
+        '''Add or replace the cached event for path'''
+        self._entries[path] = (key, event)
+        self._dirty = True
+
+    def prune(self, directory: str, paths: List[str]) -> None:
+        '''Drop entries for files in directory that are not in paths'''
+        keep = set(paths)
+        for path in [p for p in self._entries
+                     if os.path.dirname(p) == directory and p not in keep]:
+            del self._entries[path]
+            self._dirty = True
+
+    def save(self) -> None:
+        '''Write the cache back to disk if it has changed'''
+        if self._filename == "" or not self._dirty:
+            return
+        tmpname = self._filename + ".tmp"
+        try:
+            with open(tmpname, "wb") as file:
+                pickle.dump((self._VERSION, self._entries), file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, self._filename)
+        except OSError:
+            # The cache is only an optimization
+            return
+        self._dirty = False
+
+
+def parse_scb(path: str) -> startlists.Event:
+    '''Parse a single start list file (runs in a worker process)'''
+    event = startlists.Event()
+    event.from_scb(path)
+    return event
+
+
+def load_cts_startlists(directory: str,
+                        cache: Optional[StartListCache] = None) -> List[startlists.Event]:
+    """
+    Load and pre-process all of the CTS formatted start lists
+
+    Parameters:
+        directory: The directory containing the *.scb files
+        cache: Previously parsed events. Files whose path, mtime and size
+            match an entry are not parsed again.
+    """
+    directory = os.path.normpath(directory)
+    if cache is None:
+        cache = StartListCache()
+    found: Dict[str, startlists.Event] = {}
+    todo: Dict[str, FileKey] = {}
+    with os.scandir(directory) as files:
+        for file in files:
+            if not file.name.endswith(".scb"):
+                continue
+            key = file_key(file.stat())
+            event = cache.get(file.path, key)
+            if event is None:
+                todo[file.path] = key
+            else:
+                found[file.path] = event
+
+    # Parsed serially: a file takes microseconds, far less than starting a
+    # worker process would
+    paths = list(todo)
+    parsed = [parse_scb(path) for path in paths]
+    for path, event in zip(paths, parsed):
+        cache.put(path, todo[path], event)
+        found[path] = event
+
+    cache.prune(directory, list(found))
+    cache.save()
+    events = list(found.values())
+    events.sort(key=lambda e: startlists.event_sort_key(e.event))
+    return events
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+#
+
+"""Tests for startlist_loader.py"""
+
+import os
+import shutil
+
+import startlist_loader
+
+SESSION = os.path.join(os.path.dirname(__file__), "..", "hytek-sample", "SCB_Session1")
+
+
+def _copy_session(tmp_path):
+    directory = tmp_path / "session"
+    shutil.copytree(SESSION, directory)
+    return str(directory)
+
+
+def test_load_session(tmp_path):
+    """Every file is loaded, in event order"""
+    directory = _copy_session(tmp_path)
+    events = startlist_loader.load_cts_startlists(directory)
+    assert len(events) == len(os.listdir(directory))
+    assert [e.event for e in events] == sorted((e.event for e in events), key=int)
+    assert all(e.num_heats == len(e.heats) for e in events)
+
+
+def test_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    """Only new or modified files are parsed once the cache is warm"""
+    directory = _copy_session(tmp_path)
+    cache_file = str(tmp_path / "startlists.cache")
+    first = startlist_loader.load_cts_startlists(
+        directory, startlist_loader.StartListCache(cache_file))
+    assert os.path.exists(cache_file)
+
+    parsed = []
+    real_parse = startlist_loader.parse_scb
+    def counting_parse(path):
+        parsed.append(os.path.basename(path))
+        return real_parse(path)
+    monkeypatch.setattr(startlist_loader, "parse_scb", counting_parse)
+
+    # Re-export one event with an extra (empty) heat, remove another
+    changed = os.path.join(directory, "E004.scb")
+    with open(changed, "a") as file:
+        file.write("                    --                \r\n" * 10)
+    os.remove(os.path.join(directory, "E005.scb"))
+
+    second = startlist_loader.load_cts_startlists(
+        directory, startlist_loader.StartListCache(cache_file))
+    assert parsed == ["E004.scb"]
+    assert len(second) == len(first) - 1
+    before = {e.event: e.num_heats for e in first}
+    after = {e.event: e.num_heats for e in second}
+    assert after["4"] == before["4"] + 1
+    assert "5" not in after
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    """A damaged cache file just causes a full reparse"""
+    directory = _copy_session(tmp_path)
+    cache_file = tmp_path / "startlists.cache"
+    cache_file.write_bytes(b"not a pickle")
+    events = startlist_loader.load_cts_startlists(
+        directory, startlist_loader.StartListCache(str(cache_file)))
+    assert len(events) == len(os.listdir(directory))
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Start list sources
+
+A start list can come from a directory of CTS .scb files exported by Meet
+Manager or directly from the Meet Manager database. open_source() picks the
+right StartListSource for a location.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import startlists
+import startlist_bundle
+from startlist_loader import FileKey, StartListCache, file_key, load_cts_startlists, parse_scb
+
+
+class ScbDirectorySource(startlists.StartListSource):
+    '''
+    A directory of CTS .scb start list files
+
+    Parameters:
+        directory: The directory containing the *.scb files
+        cache_file: Where to cache parsed events ("" for no cache)
+    '''
+    def __init__(self, directory: str, cache_file: str = ""):
+        self._directory = os.path.normpath(directory)
+        self._cache_file = cache_file
+        self._known: Dict[str, FileKey] = {}
+
+    def _scan(self) -> Dict[str, FileKey]:
+        found = {}
+        try:
+            with os.scandir(self._directory) as files:
+                for file in files:
+                    if file.name.endswith(".scb"):
+                        try:
+                            found[file.path] = file_key(file.stat())
+                        except FileNotFoundError:
+                            pass  # deleted between listing and stat
+        except OSError as err:
+            logging.warning("Unable to scan start lists: %s", err)
+            return self._known
+        return found
+
+    def load(self) -> List[startlists.Event]:
+        # Scan first so anything re-exported while loading is seen by poll()
+        self._known = self._scan()
+        events = startlist_bundle.open_bundle(self._directory)
+        if events is not None:
+            return events
+        return load_cts_startlists(self._directory, StartListCache(self._cache_file))
+
+    def poll(self) -> Optional[startlists.StartListChanges]:
+        current = self._scan()
+        changed = []
+        for path, key in current.items():
+            if self._known.get(path) == key:
+                continue
+            try:
+                changed.append(parse_scb(path))
+            except (OSError, startlists.FileParseError) as err:
+                # Most likely caught mid-export; the next write retries it
+                logging.warning("Unable to reload start list %s: %s", path, err)
+        removed = [path for path in self._known if path not in current]
+        self._known = current
+        if changed or removed:
+            return startlists.StartListChanges(changed, removed)
+        return None
+
+    def watch_path(self) -> str:
+        return self._directory
+
+
+def open_source(location: str, cache_file: str = "",
+                session: int = 0) -> startlists.StartListSource:
+    """
+    Open the start list source at location
+
+    Parameters:
+        location: A directory of .scb files or a Meet Manager (.mdb) database
+        cache_file: Where to cache parsed .scb files ("" for no cache)
+        session: Meet Manager session to load (0 for all sessions)
+    """
+    if location.lower().endswith(".mdb"):
+        # Only needed (and its optional dependencies loaded) for databases
+        from hytek_source import HyTekSource  # pylint: disable=import-outside-toplevel
+        return HyTekSource(location, session)
+    return ScbDirectorySource(location, cache_file)
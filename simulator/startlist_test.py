@@ -3,9 +3,22 @@
 
 """Tests for results.py"""
 
+import pytest
 import startlists
 
 
+def _synthetic_scb(num_heats: int) -> str:
+    """Build a CTS start list with a swimmer in every odd lane"""
+    lines = ["#1500 MIXED 1500 FREE"]
+    for heat in range(1, num_heats + 1):
+        for lane in range(1, 11):
+            if lane % 2:
+                lines.append(f"{'H%d L%d' % (heat, lane):<20}--T{lane:<17}")
+            else:
+                lines.append(f"{'':<20}--{'':<18}")
+    return "\r\n".join(lines) + "\r\n"
+
+
 def test_parse_scb():
     """Ensure we can parse the scb format correctly"""
     lines = """#18 BOYS 10&U 50 FLY
@@ -54,5 +67,94 @@ AAAAA, B            --X
 
     print("--- All Tests Passed ---")
 
+def test_parse_large_scb(tmp_path):
+    """A long distance event parses in order, eagerly and lazily"""
+    scb = tmp_path / "E1500.scb"
+    scb.write_bytes(_synthetic_scb(60).encode())
+
+    eager = startlists.Event()
+    eager.from_scb(str(scb))
+    lazy = startlists.Event()
+    lazy.from_scb(str(scb), lazy=True)
+
+    for evt in [eager, lazy]:
+        assert evt.event == "1500"
+        assert evt.event_desc == "MIXED 1500 FREE"
+        assert evt.num_heats == 60
+        assert len(evt.heats) == 60
+    for idx in [0, 1, 29, 59, -1]:
+        e_heat = eager.heats[idx]
+        l_heat = lazy.heats[idx]
+        assert e_heat.heat == l_heat.heat
+        for lane in range(10):
+            assert e_heat.lanes[lane].name == l_heat.lanes[lane].name
+            assert e_heat.lanes[lane].team == l_heat.lanes[lane].team
+    assert lazy.heats[59].heat == 60
+    assert lazy.heats[59].lanes[0].name == "H60 L1"
+    assert lazy.heats[59].lanes[0].team == "T1"
+    assert lazy.heats[59].lanes[1].is_empty()
+    assert lazy.heats[3] is lazy.heats[3]
+    assert [h.heat for h in lazy.heats[57:]] == [58, 59, 60]
+
+def test_iter_heats_streams():
+    """Heats are produced before the rest of the file is read"""
+    lines = iter(_synthetic_scb(40).splitlines())
+    evt = startlists.Event()
+    heats = evt.iter_heats(lines)
+    first = next(heats)
+    assert evt.event == "1500"
+    assert first.heat == 1
+    assert first.lanes[2].name == "H1 L3"
+    assert len(list(lines)) == 39 * 10
+
+def test_parse_truncated_scb(tmp_path):
+    """A file with a partial heat is rejected in both modes"""
+    scb = tmp_path / "E001.scb"
+    scb.write_text("\n".join(_synthetic_scb(3).splitlines()[:-4]))
+    for lazy in [False, True]:
+        with pytest.raises(startlists.FileParseError) as err:
+            startlists.Event().from_scb(str(scb), lazy=lazy)
+        assert err.value.filename == str(scb)
+
+def test_compact_lanes():
+    """Empty lanes are shared and team names are interned"""
+    evt = startlists.Event()
+    evt.from_lines(_synthetic_scb(3).splitlines())
+    assert evt.heats[0].lanes[1] is startlists.EMPTY_LANE
+    assert evt.heats[2].lanes[9] is startlists.EMPTY_LANE
+    assert evt.heats[0].lanes[0].team is evt.heats[2].lanes[0].team
+    assert not hasattr(evt.heats[0].lanes[0], "__dict__")
+    with pytest.raises(AttributeError):
+        startlists.EMPTY_LANE.name = "SWIMMER, SOME"
+    # Lanes created by hand are still independent and writable
+    heat = startlists.Heat()
+    heat.lanes[0].name = "SWIMMER, SOME"
+    assert heat.lanes[1].is_empty()
+
+def test_session_index():
+    """Events and heats can be found directly and the session wraps"""
+    events = []
+    for code, heats in [("3", 2), ("18", 1), ("18A", 3)]:
+        evt = startlists.Event()
+        evt.from_lines([f"#{code} EVENT {code}"] + _synthetic_scb(heats).splitlines()[1:])
+        events.append(evt)
+    idx = startlists.SessionIndex(events)
+    assert len(idx) == 6
+    assert idx.find("18a", 2) == (2, 1)
+    assert idx.find("003") == (0, 0)
+    assert idx.find("18", 2) is None
+    assert idx.find("99") is None
+    assert idx.position(idx.ordinal(0, 1) + 1) == (1, 0)
+    assert idx.position(idx.ordinal(2, 2) + 1) == (0, 0)
+    assert idx.position(idx.ordinal(0, 0) - 1) == (2, 2)
+    assert idx.parse("18A/3") == (2, 2)
+    assert idx.parse("18a 2") == (2, 1)
+    assert idx.parse("#4") == (2, 0)
+    assert idx.parse("#7") is None
+    assert idx.parse("") is None
+    empty = startlists.SessionIndex([])
+    assert empty.position(1) is None
+    assert empty.parse("#1") is None
+
 if __name__ == "__main__":
     test_parse_scb()
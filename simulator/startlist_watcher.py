@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+#
+# SwimCam - https://github.com/dmanusrex/swimcam
+# Copyright (C) 2020 - Darren Richer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Watch a start list source for changes
+
+Meet Manager re-exports .scb files (or updates its database) throughout a
+session as heats are reseeded. The watcher runs on its own thread and asks the
+source for changes, which only re-parses what actually changed. Changes are
+queued for the Tk thread to pick up.
+
+If the optional inotify_simple package is installed and the source has a
+directory to watch, the thread sleeps until the kernel reports a change in
+that directory. Otherwise the source is polled, which for a directory of .scb
+files only costs a stat() per file.
+"""
+
+import threading
+import queue
+
+from startlists import StartListChanges, StartListSource
+
+try:
+    import inotify_simple  #type: ignore
+except ImportError:
+    inotify_simple = None
+
+
+class StartListWatcher(threading.Thread):
+    '''
+    Background watcher for a start list source
+
+    Parameters:
+        source: The (already loaded) source to watch
+        interval: Seconds between polls (or inotify wakeups)
+    '''
+
+    changes: "queue.Queue[StartListChanges]"
+
+    def __init__(self, source: StartListSource, interval: float = 1.0):
+        super().__init__(name="startlist-watcher", daemon=True)
+        self._source = source
+        self._interval = interval
+        self._stopped = threading.Event()
+        self.changes = queue.Queue()
+
+    def check(self) -> None:
+        '''Ask the source for changes and queue them'''
+        changes = self._source.poll()
+        if changes is not None:
+            self.changes.put(changes)
+
+    def run(self) -> None:
+        directory = self._source.watch_path()
+        if inotify_simple is None or directory == "":
+            while not self._stopped.wait(self._interval):
+                self.check()
+            return
+        flags = inotify_simple.flags
+        with inotify_simple.INotify() as notifier:
+            notifier.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO |
+                               flags.MOVED_FROM | flags.DELETE)
+            while not self._stopped.is_set():
+                if notifier.read(timeout=int(self._interval * 1000)):
+                    self.check()
+
+    def stop(self) -> None:
+        '''Ask the watcher thread to exit'''
+        self._stopped.set()
@@ -26,13 +26,59 @@ Based heavily on :
 Uses Colorado Timing Systems(CTS) start list file format (.scb). Each Event (File)
 contains a number of heats. Each heat in the file always has 10 lanes.
 
+Files are parsed in a single streaming pass: each line is matched exactly once
+against pre-compiled patterns and heats are produced in order as soon as their
+ten lanes have been read. For very large events the heats can also be loaded
+lazily, in which case only the byte offset of each heat is recorded up front
+and the lanes are parsed the first time the heat is accessed.
+
+The data model is kept compact so a whole championship meet can be held in
+memory on a lane camera: the classes use __slots__, team names are interned
+and every empty lane in every heat is the same shared EMPTY_LANE object.
+
 Tests:  startlist_test.py
 
 """
 
 
 import re
-from typing import List
+import sys
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Number of lanes in each heat of a CTS start list
+_LANES_PER_HEAT = 10
+# CTS start lists are plain ASCII; latin-1 will decode any byte without failing
+_ENCODING = "latin-1"
+# Event header, e.g. "#18 BOYS 10&U 50 FLY"
+_HEADER_RE = re.compile(r"^#(\w+)\s+(.*)$")
+# Lane entry, e.g. "PERSON, JUST A      --TEAM            "
+_LANE_RE = re.compile(r"^(.*)--(.*)$")
+# Event code, e.g. "18" or "18A"
+_EVENT_CODE_RE = re.compile(r"^(\d*)(.*)$")
+# Separator between event and heat in a "go to" string, e.g. "18A/3"
+_GOTO_SPLIT_RE = re.compile(r"\s*[\s/:-]\s*")
+
+
+def _parse_header(line: str) -> Tuple[str, str]:
+    """Split an event header line into the event number and description"""
+    match = _HEADER_RE.match(line.rstrip("\r\n"))
+    if not match:
+        raise FileParseError("", "Unable to parse header")
+    return match.group(1), match.group(2)
+
+
+def _parse_lane(line: str) -> "Lane":
+    """Parse a single name/team line"""
+    match = _LANE_RE.match(line.rstrip("\r\n"))
+    if not match:
+        raise FileParseError("", "Unable to parse name/team")
+    name = match.group(1).strip()
+    team = match.group(2).strip()
+    if name == "" and team == "":
+        return EMPTY_LANE
+    return Lane(name=name, team=team)
+
 
 class FileParseError(Exception):
     """Execption for when a file cannot be parsed."""
@@ -46,12 +92,13 @@ class Lane:
     """
     Lane is the start list information for a single lane.
     """
+    __slots__ = ("name", "team")
     name: str  # Swimmer's name
-    team: str  # Swimmer's team
+    team: str  # Swimmer's team (interned, most swimmers share a handful)
 
     def __init__(self, **kwargs):
         self.name = kwargs.get("name", "")
-        self.team = kwargs.get("team", "")
+        self.team = sys.intern(kwargs.get("team", ""))
 
     def is_empty(self) -> bool:
         """
@@ -73,10 +120,28 @@ class Lane:
         print(f"Empty: {self.is_empty()}")
 
 
+class _EmptyLane(Lane):
+    """An empty lane that can be shared because it can't be modified"""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("EMPTY_LANE is shared and can not be modified")
+        super().__setattr__(name, value)
+
+    def __reduce__(self):
+        # Unpickle as the module-level sentinel, not a copy
+        return "EMPTY_LANE"
+
+# Shared by every empty lane in every heat
+EMPTY_LANE = _EmptyLane()
+
+
 class Heat:
     """
     Heat Represents the Start List for a given heat
     """
+    __slots__ = ("event", "event_desc", "heat", "lanes")
     event: str  # Event number
     event_desc: str # Event description
     heat: int  # Heat number
@@ -95,18 +160,10 @@ class Heat:
         if (len(lines)-1) % 10 or len(lines) <= self.heat * 10:
             raise FileParseError("", "Unexpected number of lines in file")
         # Extract event name
-        match = re.match(r'^#\w+\s+(.*)$', lines[0])
-        if not match:
-            raise FileParseError("", "Unable to parse event name")
-        self.event_desc = match.group(1)
+        _, self.event_desc = _parse_header(lines[0])
         # Parse heat names/teams
         heat_start = (self.heat - 1) * 10 + 1
-        for i in range(0, 10):
-            match = re.match(r'^(.*)--(.*)$', lines[heat_start + i])
-            if not match:
-                raise FileParseError("", "Unable to parse name/team")
-            self.lanes[i].name = match.group(1).strip()
-            self.lanes[i].team = match.group(2).strip()
+        self.lanes = [_parse_lane(line) for line in lines[heat_start:heat_start + 10]]
 
     def dump(self):
         """Dump the results to the screen."""
@@ -116,6 +173,49 @@ class Heat:
             print(f"Lane: {laneno}")
             i.dump()
 
+class _LazyHeats(Sequence[Heat]):
+    """
+    Read-only list of heats that are parsed on first access.
+
+    Only the byte offset of each heat within the file is kept until the heat
+    is requested; parsed heats are cached so each is read at most once.
+    """
+    __slots__ = ("_filename", "_event", "_event_desc", "_offsets", "_cache")
+
+    def __init__(self, filename: str, event: str, event_desc: str, offsets: List[int]):
+        self._filename = filename
+        self._event = event
+        self._event_desc = event_desc
+        self._offsets = offsets
+        self._cache: Dict[int, Heat] = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: Union[int, slice]):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("heat index out of range")
+        heat = self._cache.get(index)
+        if heat is None:
+            heat = self._load(index)
+            self._cache[index] = heat
+        return heat
+
+    def _load(self, index: int) -> Heat:
+        with open(self._filename, "rb") as file:
+            file.seek(self._offsets[index])
+            lines = [file.readline().decode(_ENCODING) for _ in range(_LANES_PER_HEAT)]
+        try:
+            lanes = [_parse_lane(line) for line in lines]
+        except FileParseError as err:
+            raise FileParseError(self._filename, err.error) from err
+        return Heat(event=self._event, event_desc=self._event_desc,
+                    heat=index + 1, lanes=lanes)
+
 class Event:
     """
     Event represents a swimming event.
@@ -125,42 +225,83 @@ class Event:
         ev = Event()
         # Load the scoreboard data
         ev.from_scb("E129.scb")
+        # ... or only parse each heat when it is first used
+        ev.from_scb("E129.scb", lazy=True)
     """
+    __slots__ = ("event", "event_desc", "num_heats", "heats", "filename")
     event: str             # Event Number
     event_desc: str        # Event Description
     num_heats: int         # Number of Heats
-    heats: List[Heat]  # List of Heats for Event
+    heats: Sequence[Heat]  # List of Heats for Event
+    filename: str          # File the event was loaded from
 
     def __init__(self, **kwargs):
         self.event = kwargs.get("event", "")
         self.event_desc = kwargs.get("event_desc", "")
         self.num_heats = kwargs.get("num_heats", 0)
         self.heats = []
+        self.filename = kwargs.get("filename", "")
 
-    def from_scb(self, filename: str) -> None:
+    def from_scb(self, filename: str, lazy: bool = False) -> None:
         """
         Loads event and heat data from a CTS start list *.scb file.
+
+        The file is streamed rather than read into memory. When lazy is set,
+        heats are only parsed the first time they are accessed.
         """
-        file = open(filename, "r")
-        lines = file.readlines()
-        file.close()
+        self.filename = filename
         try:
-            self.from_lines(lines)
+            if lazy:
+                self._index_scb(filename)
+            else:
+                with open(filename, "r", encoding=_ENCODING) as file:
+                    self.from_lines(file)
         except FileParseError as err:
             raise FileParseError(filename, err.error) from err
 
-    def from_lines(self, lines: List[str]) -> None:
+    def from_lines(self, lines: Iterable[str]) -> None:
         '''Parse event information'''
-        match = re.match(r"^#(\w+)\s+(.*)$", lines[0])
-        if not match:
-            raise FileParseError("", "Unable to parse header")
-        self.event = match.group(1)
-        self.event_desc = match.group(2)
-        self.num_heats = (len(lines)-1)//10
-        for heatnum in range(1, self.num_heats+1):
-            heat = Heat(event=self.event, heat=heatnum)
-            heat.parse_scb(lines)
-            self.heats.append(heat)
+        self.heats = list(self.iter_heats(lines))
+        self.num_heats = len(self.heats)
+
+    def iter_heats(self, lines: Iterable[str]) -> Iterator[Heat]:
+        """
+        Stream the heats of a CTS start list in order.
+
+        The header is consumed first (setting event and event_desc), then a
+        Heat is yielded for every ten lane lines. Each line is parsed once.
+        """
+        it = iter(lines)
+        self.event, self.event_desc = _parse_header(next(it, ""))
+        heat_num = 0
+        lanes: List[Lane] = []
+        for line in it:
+            lanes.append(_parse_lane(line))
+            if len(lanes) == _LANES_PER_HEAT:
+                heat_num += 1
+                yield Heat(event=self.event, event_desc=self.event_desc,
+                           heat=heat_num, lanes=lanes)
+                lanes = []
+        if lanes:
+            raise FileParseError("", "Unexpected number of lines in file")
+
+    def _index_scb(self, filename: str) -> None:
+        """Record where each heat starts without parsing any lanes"""
+        offsets: List[int] = []
+        with open(filename, "rb") as file:
+            header = file.readline()
+            self.event, self.event_desc = _parse_header(header.decode(_ENCODING))
+            pos = len(header)
+            count = 0
+            for line in file:
+                if count % _LANES_PER_HEAT == 0:
+                    offsets.append(pos)
+                pos += len(line)
+                count += 1
+        if count % _LANES_PER_HEAT:
+            raise FileParseError("", "Unexpected number of lines in file")
+        self.heats = _LazyHeats(filename, self.event, self.event_desc, offsets)
+        self.num_heats = len(offsets)
 
     def dump(self):
         """Dump the results to the screen."""
@@ -169,3 +310,125 @@ class Event:
         print(f"# of Heats: {self.num_heats}")
         for i in self.heats:
             i.dump()
+
+
+class StartListChanges(NamedTuple):
+    """A batch of changes to a start list source"""
+    changed: List[Event]  # New or updated events
+    removed: List[str]    # Event.filename of events that no longer exist
+
+
+class StartListSource(ABC):
+    """
+    Somewhere start lists can be loaded from.
+
+    Implementations:
+        startlist_source.ScbDirectorySource - a directory of CTS .scb files
+        hytek_source.HyTekSource - a Hy-Tek Meet Manager database
+    """
+
+    @abstractmethod
+    def load(self) -> List[Event]:
+        """Load every event, sorted by event number"""
+
+    @abstractmethod
+    def poll(self) -> Optional[StartListChanges]:
+        """
+        Check for changes since the last load() or poll().
+
+        Returns None if nothing has changed. Events are matched up between
+        calls by their filename, which must be unique within the source.
+        """
+
+    def watch_path(self) -> str:
+        """Directory that can be watched for changes ("" to just poll)"""
+        return ""
+
+
+def event_sort_key(event: str) -> Tuple[int, str]:
+    """
+    Sort key that orders event numbers numerically, then by suffix
+
+    >>> sorted(["18A", "3", "18", "10"], key=event_sort_key)
+    ['3', '10', '18', '18A']
+    """
+    match = _EVENT_CODE_RE.match(event.strip().upper())
+    if not match or match.group(1) == "":
+        return (sys.maxsize, event)
+    return (int(match.group(1)), match.group(2))
+
+
+class SessionIndex:
+    """
+    Index over the events of a session for direct navigation.
+
+    Every heat in the session is given a global ordinal (its position in the
+    flattened session order), and events can be looked up by their event
+    number or alphanumeric code ("18A") without walking the list.
+
+    Usage:
+        idx = SessionIndex(events)
+        event_index, heat_index = idx.find("18A", 2)
+        event_index, heat_index = idx.position(idx.ordinal(event_index, heat_index) + 1)
+    """
+    __slots__ = ("_by_event", "_order", "_first")
+
+    def __init__(self, events: Sequence[Event]):
+        self._by_event: Dict[str, int] = {}
+        self._order: List[Tuple[int, int]] = []
+        self._first: List[int] = []
+        for event_index, event in enumerate(events):
+            self._by_event.setdefault(self.normalize(event.event), event_index)
+            self._first.append(len(self._order))
+            self._order.extend((event_index, heat_index)
+                               for heat_index in range(len(event.heats)))
+
+    @staticmethod
+    def normalize(event: str) -> str:
+        """Canonical form of an event code: upper case, no leading zeros"""
+        return event.strip().upper().lstrip("0") or "0"
+
+    def __len__(self) -> int:
+        """Total number of heats in the session"""
+        return len(self._order)
+
+    def find(self, event: str, heat: int = 1) -> Optional[Tuple[int, int]]:
+        """(event index, heat index) of an event/heat number, None if absent"""
+        event_index = self._by_event.get(self.normalize(event))
+        if event_index is None:
+            return None
+        heat_index = heat - 1
+        ordinal = self._first[event_index] + heat_index
+        if heat_index < 0 or ordinal >= len(self._order) or \
+           self._order[ordinal][0] != event_index:
+            return None
+        return event_index, heat_index
+
+    def ordinal(self, event_index: int, heat_index: int) -> int:
+        """Position of a heat in the flattened session order"""
+        return self._first[event_index] + heat_index
+
+    def position(self, ordinal: int) -> Optional[Tuple[int, int]]:
+        """(event index, heat index) of a session ordinal, wrapping around, None if no heats"""
+        if not self._order:
+            return None
+        return self._order[ordinal % len(self._order)]
+
+    def parse(self, target: str) -> Optional[Tuple[int, int]]:
+        """
+        Look up a "go to" string.
+
+        Accepts an event ("18A"), an event and heat ("18A/3", "18A 3",
+        "18A-3") or a session heat ordinal ("#57").
+        """
+        target = target.strip()
+        if target.startswith("#"):
+            if not target[1:].isdigit() or not 0 < int(target[1:]) <= len(self):
+                return None
+            return self.position(int(target[1:]) - 1)
+        parts = _GOTO_SPLIT_RE.split(target)
+        if len(parts) == 1 and parts[0] != "":
+            return self.find(parts[0])
+        if len(parts) == 2 and parts[1].isdigit():
+            return self.find(parts[0], int(parts[1]))
+        return None
@@ -17,26 +17,91 @@
 
 ''' Common utility functions'''
 
-import socket
+import threading
+import time
+from typing import NamedTuple, Optional
+
 import gi
 gi.require_version('Gst', '1.0')
 gi.require_version('GstNet', '1.0')
 from gi.repository import Gst, GstNet
 
+from discovery import wait_for_core  # pylint: disable=unused-import
+
 
-def get_core_clock(core_ip="localhost", core_clock_port=9998):
-    '''Get the network GStreamer clock '''
+def get_core_clock(core_ip="localhost", core_clock_port=9998, timeout: Optional[float] = None):
+    '''Get the network GStreamer clock, waiting up to timeout seconds (None for ever) for sync'''
     clock = GstNet.NetClientClock.new('swimcam', core_ip, core_clock_port, 0)
-    clock.wait_for_sync(Gst.CLOCK_TIME_NONE)
+    clock.wait_for_sync(Gst.CLOCK_TIME_NONE if timeout is None else int(timeout * Gst.SECOND))
     return clock
 
-def wait_for_core():
-    '''Look for the network broadcast from the core'''
-    _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    _socket.bind(('', 54545))
-    while True:
-        data, addr = _socket.recvfrom(2048)
-        break
-    _socket.close()
-    return addr
+
+class Timestamp(NamedTuple):
+    '''A time (ns) on the core's clock, provisional if taken before sync'''
+    time: int
+    provisional: bool
+
+
+class CoreClock:
+    '''
+    The core's network clock, synchronised in the background
+
+    Nothing waits for the core: until the clock first synchronises, times are
+    taken from the local real time clock and flagged provisional. Once it
+    has synchronised, rebase() moves provisional times onto the core's
+    clock using the offset measured at that moment.
+
+    Parameters:
+        core_ip: The core's address
+        core_clock_port: The core's clock port
+    '''
+    def __init__(self, core_ip: str = "localhost", core_clock_port: int = 9998):
+        self.clock = GstNet.NetClientClock.new('swimcam', core_ip, core_clock_port, 0)
+        # core clock - local real time clock, measured at sync
+        self._offset = 0
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        threading.Thread(target=self._sync, name="clock-sync", daemon=True).start()
+
+    def _sync(self) -> None:
+        while not self._stopped.is_set():
+            if self.clock.wait_for_sync(Gst.SECOND):
+                self._offset = self.clock.get_time() - time.time_ns()
+                self._synced.set()
+                return
+
+    @property
+    def synced(self) -> bool:
+        '''The clock has synchronised with the core'''
+        return self._synced.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        '''Wait up to timeout seconds for sync, returns synced'''
+        return self._synced.wait(timeout)
+
+    def now(self) -> Timestamp:
+        '''The current time'''
+        if self._synced.is_set():
+            return Timestamp(self.clock.get_time(), False)
+        return Timestamp(time.time_ns(), True)
+
+    def offset(self) -> int:
+        '''The core's clock - the local real time clock (ns), 0 until synchronised'''
+        if not self._synced.is_set():
+            return 0
+        return self.clock.get_time() - time.time_ns()
+
+    def rebase(self, stamp: Timestamp) -> Timestamp:
+        '''
+        A provisional time on the core's clock, once it is synchronised
+
+        Only the time is corrected; StartSender.correct() decides whether the
+        cameras still need it.
+        '''
+        if not stamp.provisional or not self._synced.is_set():
+            return stamp
+        return Timestamp(stamp.time + self._offset, False)
+
+    def stop(self) -> None:
+        '''Stop trying to synchronise'''
+        self._stopped.set()
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+#
+
+"""Tests for swimcamutil.py"""
+
+import socket
+
+import pytest
+
+pytest.importorskip("gi")
+
+# pylint: disable=wrong-import-position
+from swimcamutil import CoreClock, Gst, GstNet, Timestamp
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_core_clock_unsynchronised():
+    """Until it synchronises times are local and provisional"""
+    Gst.init(None)
+    clock = CoreClock("127.0.0.1", _free_port())
+    try:
+        stamp = clock.now()
+        assert stamp.provisional
+        assert clock.offset() == 0
+        assert clock.rebase(stamp) == stamp
+    finally:
+        clock.stop()
+
+
+def test_core_clock_rebase():
+    """Once synchronised, provisional times move onto the core's clock"""
+    Gst.init(None)
+    port = _free_port()
+    provider = GstNet.NetTimeProvider.new(Gst.SystemClock.obtain(), "127.0.0.1", port)
+    clock = CoreClock("127.0.0.1", port)
+    try:
+        provisional = Timestamp(clock.now().time, True)
+        assert clock.wait(5)
+        assert not clock.now().provisional
+        rebased = clock.rebase(provisional)
+        assert not rebased.provisional
+        # Off by the offset measured at sync, which the clocks keep to
+        assert abs(rebased.time - provisional.time - clock.offset()) < Gst.SECOND // 10
+        assert clock.rebase(rebased) == rebased
+    finally:
+        clock.stop()
+        del provider
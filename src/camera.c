@@ -25,6 +25,7 @@
 #include <arpa/inet.h>
 #include <gst/gst.h>
 #include <gst/rtsp-server/rtsp-server.h>
+#include <json-glib/json-glib.h>
 #include <locale.h>
 #include <netinet/in.h>
 #include <mosquitto.h>
@@ -47,6 +48,10 @@ struct _SwimCamRaceInfo
 {
   /* Configuration and state Info */
   gchar *core_ip;
+  gchar *config_topic;
+  gchar *shared_config_topic;
+  JsonObject *shared_config;
+  JsonObject *own_config;
   GstRTSPMedia *sharedmedia;
   GstElement *textoverlay;
 
@@ -96,6 +101,9 @@ static GOptionEntry entries[] = {
 };
 
 void connect_callback (struct mosquitto *mosq, void *obj, int result);
+static gint lane_index (gint lane);
+static void apply_config (SwimCamRaceInfo * info, gboolean shared,
+    const gchar * payload, gint len);
 void message_callback (struct mosquitto *mosq, void *obj,
     const struct mosquitto_message *message);
 
@@ -231,6 +239,106 @@ media_configure (GstRTSPMediaFactory * factory, GstRTSPMedia * media,
   gst_object_unref (element);
 }
 
+/* The index of a lane in the starter message, lane 0 means unused */
+static gint
+lane_index (gint lane)
+{
+  if (lane == 0)
+    return 13;
+  return lane + 2;
+}
+
+/* Overlay a lane setting from a configuration on lane */
+static void
+config_lane (JsonObject * config, const gchar * name, gint * lane)
+{
+  JsonNode *node;
+  gint64 value;
+
+  node = json_object_get_member (config, name);
+  if (node == NULL || json_node_get_value_type (node) != G_TYPE_INT64)
+    return;
+  value = json_node_get_int (node);
+  if (value >= 0 && value <= 10)
+    *lane = value;
+}
+
+/* Work out the settings: the command line, overlaid with the settings for
+ * every camera, overlaid with this camera's own */
+static void
+update_config (SwimCamRaceInfo * info)
+{
+  JsonObject *layers[2] = { info->shared_config, info->own_config };
+  JsonNode *node;
+  gint left = swimcam_left_lane;
+  gint right = swimcam_right_lane;
+  gboolean frames = add_frame_counter;
+  guint i;
+
+  for (i = 0; i < G_N_ELEMENTS (layers); i++) {
+    if (layers[i] == NULL)
+      continue;
+    config_lane (layers[i], "left", &left);
+    config_lane (layers[i], "right", &right);
+    node = json_object_get_member (layers[i], "frames");
+    if (node != NULL && json_node_get_value_type (node) == G_TYPE_BOOLEAN)
+      frames = json_node_get_boolean (node);
+  }
+
+  info->left_lane_number = lane_index (left);
+  info->right_lane_number = lane_index (right);
+  info->race_test_mode = frames;
+}
+
+/* Apply settings published by the master (master/CameraConfigService.py)
+ *
+ * Only settings that have been set on the master are published, anything
+ * else stays as given on the command line. The lanes and frame counter take
+ * effect at the next start. The pipeline is only taken from the command
+ * line for now, as the media factory is set up before the broker is
+ * connected. */
+static void
+apply_config (SwimCamRaceInfo * info, gboolean shared, const gchar * payload,
+    gint len)
+{
+  JsonParser *parser;
+  JsonNode *node;
+  JsonObject **layer;
+  GError *error = NULL;
+
+  parser = json_parser_new ();
+  if (!json_parser_load_from_data (parser, payload, len, &error)) {
+    GST_WARNING ("Invalid camera configuration: %s", error->message);
+    g_error_free (error);
+    g_object_unref (parser);
+    return;
+  }
+
+  /* {"op": "config", "camera": ..., "generation": ..., "config": {...}} */
+  node = json_parser_get_root (parser);
+  if (node == NULL || !JSON_NODE_HOLDS_OBJECT (node)) {
+    GST_WARNING ("Invalid camera configuration");
+    g_object_unref (parser);
+    return;
+  }
+  node = json_object_get_member (json_node_get_object (node), "config");
+  if (node == NULL || !JSON_NODE_HOLDS_OBJECT (node)) {
+    GST_WARNING ("Camera configuration has no settings");
+    g_object_unref (parser);
+    return;
+  }
+
+  /* Replaces the settings last published on the same topic */
+  layer = shared ? &info->shared_config : &info->own_config;
+  if (*layer != NULL)
+    json_object_unref (*layer);
+  *layer = json_object_ref (json_node_get_object (node));
+  update_config (info);
+
+  GST_INFO ("Applied %s camera configuration", shared ? "shared" : "own");
+  g_object_unref (parser);
+}
+
 void
 connect_callback (struct mosquitto *mosq, void *obj, int result)
 {
@@ -245,6 +353,15 @@ connect_callback (struct mosquitto *mosq, void *obj, int result)
     exit (1);
   }
 
+  /* Retained by the broker, so the configuration arrives now */
+  if (mosquitto_subscribe (mosq, NULL,
+          ((SwimCamRaceInfo *) obj)->shared_config_topic, 1) ||
+      mosquitto_subscribe (mosq, NULL,
+          ((SwimCamRaceInfo *) obj)->config_topic, 1)) {
+    g_print ("Unable to subscribe to the camera configuration\n");
+    exit (1);
+  }
+
 }
 
 void
@@ -260,6 +377,16 @@ message_callback (struct mosquitto *mosq, void *obj,
   GST_INFO ("got message '%.*s' for topic '%s'\n", message->payloadlen,
       (char *) message->payload, message->topic);
 
+  info = (SwimCamRaceInfo *) obj;
+
+  if (g_strcmp0 (message->topic, info->shared_config_topic) == 0 ||
+      g_strcmp0 (message->topic, info->config_topic) == 0) {
+    apply_config (info,
+        g_strcmp0 (message->topic, info->shared_config_topic) == 0,
+        message->payload, message->payloadlen);
+    return;
+  }
+
   msg_parts = g_strsplit (message->payload, "|", 0);
   partslen = g_strv_length(msg_parts);
 
@@ -269,8 +396,6 @@ message_callback (struct mosquitto *mosq, void *obj,
     return;
   }
 
-  info = (SwimCamRaceInfo *) obj;
-
   if (g_str_has_prefix (msg_parts[0], "START")) {
     if (g_ascii_string_to_unsigned (msg_parts[1], 10, 0, G_MAXUINT64, &temptime,
             &errorcode)) {
@@ -372,16 +497,8 @@ main (int argc, char *argv[])
   raceinfo->race_test_mode = add_frame_counter;
   raceinfo->race_info_text = g_strdup ("Waiting for start...");
   raceinfo->frame_counter = 0;
-  /* set the index offset for starter messages, lane 0 means unused */
-  if (swimcam_left_lane == 0) 
-      raceinfo->left_lane_number = 13;
-  else
-      raceinfo->left_lane_number = swimcam_left_lane + 2;
-
-  if (swimcam_right_lane == 0)
-      raceinfo->right_lane_number = 13;
-  else
-      raceinfo->right_lane_number = swimcam_right_lane + 2;
+  raceinfo->left_lane_number = lane_index (swimcam_left_lane);
+  raceinfo->right_lane_number = lane_index (swimcam_right_lane);
 
   /* Wait for the network core (config server, timing source, etc) */
   if (ignore_master)
@@ -400,6 +517,10 @@ main (int argc, char *argv[])
   /* Enable receipt of start commands via MQTT */
   clientid = g_strdup_printf ("%s-%d", g_get_host_name (), swimcam_instance);
   GST_INFO ("MQTT clientid: %s", clientid);
+  /* The master publishes the settings for every camera under "*" and this
+   * camera's own under its client id */
+  raceinfo->shared_config_topic = g_strdup ("swimcam/camera/*/config");
+  raceinfo->config_topic = g_strdup_printf ("swimcam/camera/%s/config", clientid);
   mosq = mosquitto_new (clientid, true, raceinfo);
 
   if (mosq == NULL) {